@@ -0,0 +1,223 @@
+# apkg.py
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import tempfile
+import time
+import zipfile
+
+from config import NOTE_TYPE_FIELDS
+from note_types import COLUMNS, NoteType
+from profiling import phase
+from utils import CardModel, row_note
+
+SCHEMA_VERSION = 11
+DEFAULT_DECK_ID = 1
+BATCH_SIZE = 5000
+
+CLOZE_RE = re.compile(r'\{\{c(\d+)::')
+HTML_RE = re.compile(r'<[^>]*>')
+
+# Collection schema 11, the one every Anki version imports from a .apkg
+SCHEMA = """
+CREATE TABLE col (
+    id integer primary key, crt integer not null, mod integer not null, scm integer not null,
+    ver integer not null, dty integer not null, usn integer not null, ls integer not null,
+    conf text not null, models text not null, decks text not null, dconf text not null, tags text not null
+);
+CREATE TABLE notes (
+    id integer primary key, guid text not null, mid integer not null, mod integer not null,
+    usn integer not null, tags text not null, flds text not null, sfld integer not null,
+    csum integer not null, flags integer not null, data text not null
+);
+CREATE TABLE cards (
+    id integer primary key, nid integer not null, did integer not null, ord integer not null,
+    mod integer not null, usn integer not null, type integer not null, queue integer not null,
+    due integer not null, ivl integer not null, factor integer not null, reps integer not null,
+    lapses integer not null, left integer not null, odue integer not null, odid integer not null,
+    flags integer not null, data text not null
+);
+CREATE TABLE revlog (
+    id integer primary key, cid integer not null, usn integer not null, ease integer not null,
+    ivl integer not null, lastIvl integer not null, factor integer not null, time integer not null,
+    type integer not null
+);
+CREATE TABLE graves (usn integer not null, oid integer not null, type integer not null);
+CREATE INDEX ix_notes_usn on notes (usn);
+CREATE INDEX ix_cards_usn on cards (usn);
+CREATE INDEX ix_revlog_usn on revlog (usn);
+CREATE INDEX ix_cards_nid on cards (nid);
+CREATE INDEX ix_cards_sched on cards (did, queue, due);
+CREATE INDEX ix_revlog_cid on revlog (cid);
+CREATE INDEX ix_notes_csum on notes (csum);
+"""
+
+TEMPLATES = {
+    CardModel.BASIC: ("{{Front}}", "{{FrontSide}}\n\n<hr id=answer>\n\n{{Back}}{{#Ref}}<br><br>{{Ref}}{{/Ref}}"),
+    CardModel.CLOZE: ("{{cloze:Text}}", "{{cloze:Text}}<br>{{Back Extra}}{{#Ref}}<br><br>{{Ref}}{{/Ref}}"),
+}
+
+CSS = ".card {\n font-family: arial;\n font-size: 20px;\n text-align: center;\n color: black;\n background-color: white;\n}\n"
+
+DECK_CONF = {
+    'id': 1, 'name': 'Default', 'mod': 0, 'usn': 0, 'maxTaken': 60, 'autoplay': True, 'timer': 0,
+    'replayq': True, 'dyn': False,
+    'new': {'delays': [1, 10], 'ints': [1, 4, 7], 'initialFactor': 2500, 'order': 1, 'perDay': 20,
+            'bury': False, 'separate': True},
+    'rev': {'perDay': 200, 'ease4': 1.3, 'fuzz': 0.05, 'ivlFct': 1, 'maxIvl': 36500, 'minSpace': 1,
+            'bury': False},
+    'lapse': {'delays': [10], 'mult': 0, 'minInt': 1, 'leechFails': 8, 'leechAction': 0},
+}
+
+
+def stable_id(kind, name):
+    """Id derived from a name, so every package built here uses the same ids for the same note types and decks."""
+    return int(hashlib.sha1(f"{kind}:{name}".encode('utf-8')).hexdigest()[:12], 16) >> 1
+
+
+def note_guid(note):
+    """Anki matches notes of an imported package to existing ones by guid; base the guid on the row ID or front."""
+    key = note["row_id"] or f"{note['model']}\x1f{note['front']}"
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()[:20]
+
+
+def field_checksum(text):
+    return int(hashlib.sha1(text.encode('utf-8')).hexdigest()[:8], 16)
+
+
+def cloze_ordinals(text):
+    """Card ordinals of a cloze note: one per distinct cloze number (c1 -> 0); at least one."""
+    return sorted({int(n) - 1 for n in CLOZE_RE.findall(text) if int(n) > 0}) or [0]
+
+
+def package_note_type(name, now):
+    """(compiled NoteType, model JSON) for Basic or Cloze, with fields in NOTE_TYPE_FIELDS order."""
+    if name not in TEMPLATES:
+        raise ValueError(f"Note type '{name}' cannot be packaged, only {', '.join(TEMPLATES)}")
+    fields = [NOTE_TYPE_FIELDS[name][column] for column in COLUMNS]
+    qfmt, afmt = TEMPLATES[name]
+    model_id = stable_id('model', name)
+    model = {
+        'id': model_id, 'name': name, 'type': 1 if name == CardModel.CLOZE else 0, 'mod': now, 'usn': -1,
+        'sortf': 0, 'did': DEFAULT_DECK_ID, 'css': CSS, 'tags': [], 'vers': [],
+        'latexPre': "\\documentclass[12pt]{article}\n\\special{papersize=3in,5in}\n\\usepackage{amssymb,amsmath}\n"
+                    "\\pagestyle{empty}\n\\setlength{\\parindent}{0in}\n\\begin{document}\n",
+        'latexPost': "\\end{document}",
+        'flds': [{'name': field, 'ord': i, 'sticky': False, 'rtl': False, 'font': 'Arial', 'size': 20, 'media': []}
+                 for i, field in enumerate(fields)],
+        'tmpls': [{'name': 'Cloze' if name == CardModel.CLOZE else 'Card 1', 'ord': 0, 'qfmt': qfmt, 'afmt': afmt,
+                   'did': None, 'bqfmt': '', 'bafmt': ''}],
+        'req': [[0, 'any', [0]]],
+    }
+    return NoteType(name, NOTE_TYPE_FIELDS[name], fields), model
+
+
+def package_decks(names, now):
+    """decks JSON for names and all their parents, plus Default."""
+    full = {'Default'}
+    for name in names:
+        parts = name.split('::')
+        full.update('::'.join(parts[:i]) for i in range(1, len(parts) + 1))
+    decks = {}
+    for name in sorted(full):
+        deck_id = DEFAULT_DECK_ID if name == 'Default' else stable_id('deck', name)
+        decks[str(deck_id)] = {
+            'id': deck_id, 'name': name, 'mod': now, 'usn': -1, 'desc': '', 'dyn': 0, 'conf': 1,
+            'collapsed': False, 'extendNew': 0, 'extendRev': 0,
+            'newToday': [0, 0], 'revToday': [0, 0], 'lrnToday': [0, 0], 'timeToday': [0, 0],
+        }
+    return decks
+
+
+def write_collection(db_path, rows, base_deck=None):
+    """Write rows as new notes and cards into a fresh schema-11 collection; returns (notes, cards, errors)."""
+    now = int(time.time())
+    note_types = {}
+    deck_ids = {}
+    next_note = next_card = int(time.time() * 1000)
+    notes, cards = [], []
+    counts = [0, 0, 0]
+
+    db = sqlite3.connect(db_path)
+    try:
+        db.executescript(SCHEMA)
+
+        def flush():
+            db.executemany("INSERT INTO notes VALUES (?,?,?,?,?,?,?,?,?,?,?)", notes)
+            db.executemany("INSERT INTO cards VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)", cards)
+            notes.clear()
+            cards.clear()
+
+        for idx, row in enumerate(rows, start=1):
+            try:
+                note = row_note(row, idx, base_deck)
+                model = note["model"]
+                if model not in note_types:
+                    note_types[model] = package_note_type(model, now)
+                note_type, model_json = note_types[model]
+                values = note_type.build_fields(note["front"], note["back"], note["ref"], note["tags"])
+                flds = [values.get(field['name'], '') for field in model_json['flds']]
+            except Exception as e:
+                counts[2] += 1
+                print(f"❌ Error processing card {idx}: {e}")
+                continue
+            deck_id = deck_ids.setdefault(note["deck"], stable_id('deck', note["deck"]))
+            sort_field = HTML_RE.sub('', flds[0])
+            tags = f" {' '.join(note['tags'])} " if note["tags"] else ''
+            notes.append((next_note, note_guid(note), model_json['id'], now, -1, tags, '\x1f'.join(flds),
+                          sort_field, field_checksum(sort_field), 0, ''))
+            ordinals = cloze_ordinals(flds[0]) if model == CardModel.CLOZE else [0]
+            for ordinal in ordinals:
+                # New cards, due in row order
+                cards.append((next_card, next_note, deck_id, ordinal, now, -1, 0, 0, idx, 0, 0, 0, 0, 0, 0, 0, 0, ''))
+                next_card += 1
+            next_note += 1
+            counts[0] += 1
+            counts[1] += len(ordinals)
+            if len(notes) >= BATCH_SIZE:
+                flush()
+        flush()
+
+        models = {str(model['id']): model for _, model in note_types.values()}
+        current_model = next(iter(models), None)
+        conf = {'nextPos': len(rows) + 1, 'estTimes': True, 'activeDecks': [DEFAULT_DECK_ID], 'sortType': 'noteFld',
+                'timeLim': 0, 'sortBackwards': False, 'addToCur': True, 'curDeck': DEFAULT_DECK_ID, 'newBury': True,
+                'newSpread': 0, 'dueCounts': True, 'curModel': current_model, 'collapseTime': 1200}
+        db.execute("INSERT INTO col VALUES (1,?,?,?,?,0,0,0,?,?,?,?,?)",
+                   (now - now % 86400, now * 1000, now * 1000, SCHEMA_VERSION, json.dumps(conf), json.dumps(models),
+                    json.dumps(package_decks(deck_ids, now)), json.dumps({'1': DECK_CONF}), json.dumps({})))
+        db.commit()
+    finally:
+        db.close()
+    return tuple(counts)
+
+
+def build_apkg(rows, path, base_deck=None, media=None):
+    """Write rows, and the media files they reference ({name: local path}), to an .apkg at path.
+
+    Every row becomes a new note; there is no duplicate check against a
+    collection, so this is meant for first-time imports of large banks.
+    Anki imports the whole package in one step, matching notes it already
+    has by guid (see note_guid). Returns the number of notes written."""
+    media = media or {}
+    print(f"\n📦 Packaging {len(rows)} cards into {path}...")
+    with phase('write'), tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'collection.anki2')
+        notes, cards, errors = write_collection(db_path, rows, base_deck)
+        tmp_path = f"{path}.tmp"
+        with zipfile.ZipFile(tmp_path, 'w', zipfile.ZIP_DEFLATED) as package:
+            package.write(db_path, 'collection.anki2')
+            index = {}
+            for number, (name, file_path) in enumerate(sorted(media.items())):
+                # Images and sounds are compressed already
+                package.write(file_path, str(number), compress_type=zipfile.ZIP_STORED)
+                index[str(number)] = name
+            package.writestr('media', json.dumps(index))
+        os.replace(tmp_path, path)
+    print(f"✅ Packaged {notes} notes ({cards} cards, {len(media)} media files) into {path}")
+    if errors:
+        print(f"⚠️ {errors} rows could not be packaged")
+    return notes
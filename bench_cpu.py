@@ -0,0 +1,179 @@
+# bench_cpu.py
+"""CPU microbenchmarks for the pure-Python hot paths, checked against stored baselines.
+
+    python bench_cpu.py              # compare with bench_baselines.json, exit 1 on regression
+    python bench_cpu.py --update     # record new baselines for this machine
+
+Each timing is divided by a fixed calibration loop timed right after it, which
+evens out clock speed and load drift during the run, but not CPU or
+interpreter differences. So
+baselines are kept per machine: this machine's are compared at --tolerance,
+and when it has none, another machine's are compared at the much wider
+CROSS_MACHINE_TOLERANCE, which only catches gross regressions.
+"""
+
+import argparse
+import contextlib
+import csv
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+import utils
+from bench_import import make_rows
+
+BASELINES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_baselines.json")
+DEFAULT_SIZES = (1000, 10000)
+DEFAULT_TOLERANCE = 0.25
+CROSS_MACHINE_TOLERANCE = 1.0
+REPEATS = 5
+
+
+def cpu_model():
+    try:
+        with open('/proc/cpuinfo', encoding='utf-8') as f:
+            for line in f:
+                if line.startswith('model name'):
+                    return line.split(':', 1)[1].strip()
+    except OSError:
+        pass
+    return platform.processor() or 'unknown cpu'
+
+
+def machine_id():
+    """What the timings depend on: platform, CPU model and Python version."""
+    return f"{platform.system()} {platform.machine()}, {cpu_model()}, {platform.python_implementation()} " \
+           f"{'.'.join(platform.python_version_tuple()[:2])}"
+
+
+def load_baselines(path):
+    """{machine id: {benchmark: normalized time}}."""
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def pick_baselines(baselines, machine, tolerance):
+    """(baselines, tolerance, machine they were recorded on) to compare this machine against."""
+    if machine in baselines:
+        return baselines[machine], tolerance, machine
+    other = next(iter(sorted(baselines)))
+    return baselines[other], max(tolerance, CROSS_MACHINE_TOLERANCE), other
+
+
+def calibrate():
+    start = time.perf_counter()
+    total = 0
+    for n in range(200000):
+        total += len(str(n))
+    return time.perf_counter() - start
+
+
+def best_of(func, repeats=REPEATS):
+    """Best time of func over repeats, in calibration loops timed right after each run."""
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        best = min(best, (time.perf_counter() - start) / calibrate())
+    return best
+
+
+def write_csv(path, rows):
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def quiet(func, *args, **kwargs):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return func(*args, **kwargs)
+
+
+def make_index(rows):
+    """Existing-notes index holding every other row, half of them with a different back."""
+    index = {utils.CardModel.BASIC: {}, utils.CardModel.CLOZE: {}}
+    for n, row in enumerate(rows[::2]):
+        front = row['Front']
+        back = row['Back'] if n % 2 else f"Old {row['Back']}"
+        index[utils.detect_model(front)][front] = {'back': back, 'id': n + 1}
+    return index
+
+
+def run_benchmarks(sizes=DEFAULT_SIZES):
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in sizes:
+            rows = make_rows(size)
+            path = os.path.join(tmp, f"bench_{size}.csv")
+            write_csv(path, rows)
+            _, parsed = utils.preview_csv(path)
+            fronts = [r['Front'] for r in parsed]
+            index = make_index(parsed)
+
+            results[f"preview_csv[{size}]"] = best_of(lambda: utils.preview_csv(path))
+            results[f"summarize_deck[{size}]"] = best_of(lambda: quiet(utils.summarize_deck, parsed))
+            results[f"detect_model[{size}]"] = best_of(lambda: [utils.detect_model(f) for f in fronts])
+            results[f"check_deck_prefixes[{size}]"] = best_of(lambda: utils.check_deck_prefixes(parsed, "Bench"))
+            results[f"plan_import[{size}]"] = best_of(
+                lambda: quiet(utils.plan_import, parsed, "ATPL", index=index, existing_decks=()))
+    return results
+
+
+def find_regressions(current, baselines, tolerance=DEFAULT_TOLERANCE):
+    """Return (name, baseline, current) for every benchmark slower than baseline * (1 + tolerance)."""
+    return [(name, baselines[name], value) for name, value in sorted(current.items())
+            if name in baselines and value > baselines[name] * (1 + tolerance)]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run CPU microbenchmarks and compare them with stored baselines.")
+    parser.add_argument("--sizes", type=int, nargs='+', default=list(DEFAULT_SIZES), help="Synthetic CSV sizes")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE, help="Allowed slowdown, e.g. 0.25 = 25%%")
+    parser.add_argument("--baselines", default=BASELINES_PATH, help="Baselines JSON file")
+    parser.add_argument("--update", action="store_true", help="Store the results as the new baselines")
+    args = parser.parse_args(argv)
+
+    current = run_benchmarks(args.sizes)
+    machine = machine_id()
+    try:
+        recorded = load_baselines(args.baselines)
+    except FileNotFoundError:
+        recorded = {}
+
+    if args.update:
+        recorded[machine] = {name: round(value, 6) for name, value in sorted(current.items())}
+        with open(args.baselines, "w", encoding="utf-8") as f:
+            json.dump(recorded, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"✅ Baselines for {machine} written to {args.baselines}")
+        return 0
+
+    if not recorded:
+        print(f"⚠️ No baselines at {args.baselines}; run with --update first.")
+        return 1
+    baselines, tolerance, recorded_on = pick_baselines(recorded, machine, args.tolerance)
+    if recorded_on != machine:
+        print(f"⚠️ No baselines for {machine}; comparing with those of {recorded_on} at {tolerance:.0%} tolerance. "
+              f"Run with --update to record this machine's.")
+
+    print(f"{'benchmark':<30} {'baseline':>9} {'current':>9} {'change':>8}")
+    for name, value in sorted(current.items()):
+        if name in baselines:
+            change = value / baselines[name] - 1
+            print(f"{name:<30} {baselines[name]:>9.3f} {value:>9.3f} {change:>+8.0%}")
+        else:
+            print(f"{name:<30} {'-':>9} {value:>9.3f}")
+
+    regressions = find_regressions(current, baselines, tolerance)
+    for name, baseline, value in regressions:
+        print(f"❌ {name} regressed: {value:.3f} vs baseline {baseline:.3f} (tolerance {tolerance:.0%})")
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,106 @@
+# bench_import.py
+"""End-to-end import benchmark against an in-process AnkiConnect stand-in.
+
+Each case runs in a fresh subprocess so peak RSS belongs to that case alone:
+
+    python bench_import.py --sizes 1000 10000 100000 --existing 0 10000 --latency-ms 1
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+import utils
+from fake_ankiconnect import FakeAnkiConnect
+from import_log import run_log
+
+
+def make_rows(count, decks=20, tags=50):
+    return [{
+        'Deck': f"Bench::Deck {n % decks}",
+        'Front': f"{{{{c1::Term {n}}}}} is defined as ..." if n % 5 == 0 else f"Question {n}?",
+        'Back': f"Answer {n}",
+        'Ref': f"Ref {n % 97}",
+        'Tags': f"tag{n % tags} bench",
+    } for n in range(count)]
+
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def run_case(size, existing=0, latency=0.0):
+    rows = make_rows(size)
+    with FakeAnkiConnect(latency=latency) as server:
+        server.collection.seed(existing)
+        utils.ANKI_CONNECT_URL = server.url
+        start = time.perf_counter()
+        # The run log goes to a scratch folder, not over the user's own
+        with tempfile.TemporaryDirectory() as tmp, run_log(os.path.join(tmp, "anki_import_log.jsonl")), \
+                contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+            utils.import_from_rows(rows, dry_run=False)
+        elapsed = time.perf_counter() - start
+        imported = len(server.collection.notes) - existing
+    return {
+        'cards': size,
+        'existing': existing,
+        'latency_ms': latency * 1000,
+        'imported': imported,
+        'seconds': round(elapsed, 3),
+        'cards_per_s': round(size / elapsed, 1) if elapsed else None,
+        'requests': server.requests,
+        'peak_rss_mb': peak_rss_mb(),
+    }
+
+
+def run_in_subprocess(size, existing, latency):
+    output = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), '--case', str(size), str(existing), str(latency)],
+        capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark import_from_rows end to end against a fake AnkiConnect.")
+    parser.add_argument("--sizes", type=int, nargs='+', default=[1000, 10000, 100000], help="CSV sizes to import")
+    parser.add_argument("--existing", type=int, nargs='+', default=[0, 10000], help="Notes already in the collection")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Simulated AnkiConnect latency per request")
+    parser.add_argument("--json", help="Also write the results to this JSON file")
+    parser.add_argument("--case", nargs=3, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.case:
+        size, existing, latency = args.case
+        print(json.dumps(run_case(int(size), int(existing), float(latency))))
+        return
+
+    results = []
+    print(f"{'cards':>8} {'existing':>9} {'seconds':>9} {'cards/s':>9} {'requests':>9} {'peak RSS MB':>12}")
+    for existing in args.existing:
+        for size in args.sizes:
+            result = run_in_subprocess(size, existing, args.latency_ms / 1000)
+            results.append(result)
+            print(f"{result['cards']:>8} {result['existing']:>9} {result['seconds']:>9} "
+                  f"{result['cards_per_s']:>9} {result['requests']:>9} {result['peak_rss_mb']!s:>12}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+# cassette.py
+
+import collections
+import copy
+import gzip
+import hashlib
+import json
+import threading
+import time
+
+CASSETTE_VERSION = 1
+
+
+def request_key(payload):
+    params = json.dumps(payload.get('params', {}), sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(f"{payload['action']}\x1f{params}".encode('utf-8')).hexdigest()[:16]
+
+
+class CassetteRecorder:
+    """Transport that forwards to `inner` and logs each exchange to a gzipped JSONL cassette.
+
+    Requests are stored as an action plus a digest of their parameters, which
+    keeps the file small while still identifying the exact request on replay.
+    """
+
+    def __init__(self, path, inner, url=None):
+        self.path = path
+        self.inner = inner
+        self._lock = threading.Lock()
+        self._file = gzip.open(path, "wt", encoding="utf-8")
+        self._write({'cassette': CASSETTE_VERSION, 'url': url,
+                     'recorded_at': time.strftime('%Y-%m-%dT%H:%M:%S')})
+
+    def __call__(self, payload):
+        start = time.perf_counter()
+        reply = self.inner(payload)
+        elapsed = time.perf_counter() - start
+        self._write({'a': payload['action'], 'k': request_key(payload), 't': round(elapsed, 6), 'r': reply})
+        return reply
+
+    def _write(self, entry):
+        line = json.dumps(entry, ensure_ascii=False, separators=(',', ':')) + "\n"
+        with self._lock:
+            self._file.write(line)
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+class CassettePlayer:
+    """Transport that answers from a recorded cassette instead of a running Anki.
+
+    Identical requests are answered in recording order (the last answer is
+    repeated once they run out). Each answer is delayed by its recorded
+    latency times `latency_scale`; 0 replays as fast as possible.
+    """
+
+    def __init__(self, path, latency_scale=1.0):
+        self.latency_scale = latency_scale
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._answers = collections.defaultdict(collections.deque)
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            header = json.loads(f.readline())
+            if header.get('cassette') != CASSETTE_VERSION:
+                raise ValueError(f"Unsupported cassette version: {header.get('cassette')}")
+            for line in f:
+                entry = json.loads(line)
+                self._answers[entry['k']].append(entry)
+
+    def __call__(self, payload):
+        with self._lock:
+            answers = self._answers.get(request_key(payload))
+            if not answers:
+                self.misses += 1
+                return {'result': None, 'error': f"cassette has no answer for {payload['action']}"}
+            entry = answers.popleft() if len(answers) > 1 else answers[0]
+        if self.latency_scale:
+            time.sleep(entry['t'] * self.latency_scale)
+        return copy.deepcopy(entry['r'])
+
+    def close(self):
+        pass
@@ -0,0 +1,122 @@
+# collection_reader.py
+
+import json
+import os
+import pathlib
+import shutil
+import sqlite3
+import tempfile
+
+from note_types import REGISTRY as NOTE_TYPES, NoteType
+
+
+def _unicase(a, b):
+    a, b = a.casefold(), b.casefold()
+    return (a > b) - (a < b)
+
+
+class CollectionReader:
+    """Read-only view of an Anki collection file (collection.anki2), for when Anki itself is closed.
+
+    Opened with mode=ro, so nothing is ever written. copy=True reads a
+    temporary copy instead, e.g. of a collection an open Anki holds locked.
+    Both the legacy col.models JSON and the notetypes/fields tables of
+    newer collections are understood.
+    """
+
+    def __init__(self, path, copy=False):
+        if not os.path.isfile(path):
+            raise FileNotFoundError(f"No Anki collection at '{path}'")
+        self._tmp = None
+        if copy:
+            self._tmp = tempfile.TemporaryDirectory()
+            copied = os.path.join(self._tmp.name, os.path.basename(path))
+            for suffix in ('', '-wal'):
+                if os.path.exists(path + suffix):
+                    shutil.copy2(path + suffix, copied + suffix)
+            path = copied
+        self.db = sqlite3.connect(f"{pathlib.Path(path).resolve().as_uri()}?mode=ro", uri=True)
+        # Newer collections sort note type names with Anki's own collation
+        self.db.create_collation('unicase', _unicase)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.db.close()
+        if self._tmp:
+            self._tmp.cleanup()
+            self._tmp = None
+
+    def _has_table(self, name):
+        return self.db.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (name,)).fetchone() is not None
+
+    def note_types(self):
+        """{model id: (name, field names in order)}."""
+        if self._has_table('notetypes'):
+            names = dict(self.db.execute("SELECT id, name FROM notetypes"))
+            fields = {}
+            for ntid, name in self.db.execute("SELECT ntid, name FROM fields ORDER BY ntid, ord"):
+                fields.setdefault(ntid, []).append(name)
+            return {mid: (name, fields.get(mid, [])) for mid, name in names.items()}
+        models = json.loads(self.db.execute("SELECT models FROM col").fetchone()[0])
+        return {int(mid): (model['name'], [f['name'] for f in sorted(model['flds'], key=lambda f: f['ord'])])
+                for mid, model in models.items()}
+
+    def model_names(self):
+        return [name for name, _ in self.note_types().values()]
+
+    def deck_names(self):
+        """Deck names with '::' between levels, as deckNames gives them."""
+        if self._has_table('decks'):
+            # Newer collections separate the levels with \x1f
+            return [name.replace('\x1f', '::') for (name,) in self.db.execute("SELECT name FROM decks")]
+        decks = json.loads(self.db.execute("SELECT decks FROM col").fetchone()[0])
+        return [deck['name'] for deck in decks.values()]
+
+    def existing_index(self, models=None):
+        """{model: {front: {'back', 'id', 'tags'}}} like get_all_existing_fronts_by_model, in one pass over notes.
+
+        models limits the scan to those note type names; every matching
+        note type gets an entry, even without notes."""
+        positions = {}
+        index = {}
+        for mid, (name, fields) in self.note_types().items():
+            if models is not None and name not in models:
+                continue
+            # Compiled from the collection's own field order; the registry's mapping still applies
+            note_type = NoteType(name, NOTE_TYPES.mapping.get(name, {}), fields)
+            index.setdefault(name, {})
+            if note_type.front_field:
+                back = fields.index(note_type.back_field) if note_type.back_field else None
+                positions[mid] = (index[name], fields.index(note_type.front_field), back)
+        if not positions:
+            return index
+        query = f"SELECT id, mid, flds, tags FROM notes WHERE mid IN ({','.join('?' * len(positions))})"
+        for note_id, mid, flds, tags in self.db.execute(query, list(positions)):
+            existing, front, back = positions[mid]
+            values = flds.split('\x1f')
+            existing[values[front].strip() if front < len(values) else ''] = {
+                'back': values[back].strip() if back is not None and back < len(values) else '',
+                'id': note_id,
+                'tags': tags.split(),
+            }
+        return index
+
+
+def read_existing_index(path, models=None, copy=False):
+    with CollectionReader(path, copy) as reader:
+        return reader.existing_index(models)
+
+
+def read_model_names(path):
+    with CollectionReader(path) as reader:
+        return reader.model_names()
+
+
+def read_deck_names(path):
+    with CollectionReader(path) as reader:
+        return reader.deck_names()
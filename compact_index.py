@@ -0,0 +1,106 @@
+# compact_index.py
+
+import hashlib
+from array import array
+from bisect import bisect_left
+
+from records import intern_tags
+
+
+def text_digest(text):
+    """64-bit digest of a stripped field, as a signed int so it fits an array('q')."""
+    return int.from_bytes(hashlib.blake2b(text.encode('utf-8'), digest_size=8).digest(), 'little', signed=True)
+
+
+def same_back(existing, back):
+    """Whether an index entry (CompactIndex or plain dict) has this back."""
+    digest = existing.get('back_digest')
+    return existing['back'] == back if digest is None else digest == text_digest(back)
+
+
+def forget_note(index, note_id):
+    """Drop the entry of note_id from an index (CompactIndex or plain dict), whatever its front."""
+    if isinstance(index, CompactIndex):
+        index.discard_id(note_id)
+        return
+    for front, entry in index.items():
+        if entry['id'] == note_id:
+            del index[front]
+            return
+
+
+class CompactIndex:
+    """Existing notes of one model by front, holding digests instead of text.
+
+    Front digests are kept sorted in an array and looked up by bisection,
+    with the back digest, note id and tags of each note at the same
+    position, so a note costs about 24 bytes plus a shared tags tuple. get()
+    answers like the dicts of get_all_existing_fronts_by_model, except that
+    entries have 'back_digest' in place of 'back'; compare with same_back().
+    """
+
+    def __init__(self, entries=()):
+        """entries: (front, back, note id, tags) tuples; of equal fronts the last one wins, as in a dict."""
+        fronts, backs, ids, tags = array('q'), array('q'), array('q'), []
+        for front, back, note_id, note_tags in entries:
+            fronts.append(text_digest(front))
+            backs.append(text_digest(back))
+            ids.append(note_id)
+            tags.append(intern_tags(' '.join(note_tags)))
+        # Stable, so the last of several equal fronts is last in its run
+        order = sorted(range(len(fronts)), key=fronts.__getitem__)
+        keep = [i for n, i in enumerate(order) if n + 1 == len(order) or fronts[order[n + 1]] != fronts[i]]
+        self._fronts = array('q', (fronts[i] for i in keep))
+        self._backs = array('q', (backs[i] for i in keep))
+        self._ids = array('q', (ids[i] for i in keep))
+        self._tags = [tags[i] for i in keep]
+
+    def __len__(self):
+        return len(self._fronts)
+
+    @property
+    def nbytes(self):
+        """Memory held by the index itself, not counting the shared tags tuples."""
+        return sum(a.itemsize * len(a) for a in (self._fronts, self._backs, self._ids)) + 8 * len(self._tags)
+
+    def _find(self, digest):
+        i = bisect_left(self._fronts, digest)
+        return i, i < len(self._fronts) and self._fronts[i] == digest
+
+    def __contains__(self, front):
+        return self._find(text_digest(front))[1]
+
+    def get(self, front, default=None):
+        i, found = self._find(text_digest(front))
+        if not found:
+            return default
+        return {'back_digest': self._backs[i], 'id': self._ids[i], 'tags': list(self._tags[i])}
+
+    def __getitem__(self, front):
+        entry = self.get(front)
+        if entry is None:
+            raise KeyError(front)
+        return entry
+
+    def discard_id(self, note_id):
+        """Remove the note with this id, if there is one; a linear scan of the ids array."""
+        try:
+            i = self._ids.index(note_id)
+        except ValueError:
+            return
+        for column in (self._fronts, self._backs, self._ids, self._tags):
+            del column[i]
+
+    def __setitem__(self, front, entry):
+        """Add or replace the note for front; entry has 'id', 'tags' and 'back' or 'back_digest'."""
+        digest = text_digest(front)
+        back = entry['back_digest'] if 'back_digest' in entry else text_digest(entry['back'])
+        tags = intern_tags(' '.join(entry.get('tags') or ()))
+        i, found = self._find(digest)
+        if found:
+            self._backs[i], self._ids[i], self._tags[i] = back, entry['id'], tags
+        else:
+            self._fronts.insert(i, digest)
+            self._backs.insert(i, back)
+            self._ids.insert(i, entry['id'])
+            self._tags.insert(i, tags)
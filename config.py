@@ -4,5 +4,58 @@ DEFAULT_CSV_ROOT = 'P:/@SYNC/@_ATPL/@SUMMARIES'
 DEFAULT_BASE_DECK = 'ATPL'
 
 ANKI_CONNECT_URL = 'http://localhost:8765'
+# name -> AnkiConnect URL of other instances, selectable with --target NAME
+ANKI_TARGETS = {}
+# collection.anki2 to build the duplicate index from when Anki is closed (None: ask AnkiConnect)
+ANKI_COLLECTION_PATH = None
 REQUIRED_HEADERS = {'Deck', 'Front', 'Back', 'Ref', 'Tags'}
-LOG_FILE_PATH = "anki_import_log.txt"
\ No newline at end of file
+LOG_FILE_PATH = "anki_import_log.jsonl"
+LOG_KEEP_RUNS = 5
+LOG_FLUSH_INTERVAL = 1.0
+JOURNAL_BATCH_SIZE = 50
+
+ID_COLUMN = 'ID'
+MODEL_COLUMN = 'Model'
+ID_MAP_PATH = "anki_id_map.json"
+
+PROFILE_TOP_N = 25
+
+RUN_REPORT_PATH = "anki_run_report.json"
+RUN_HISTORY_PATH = "anki_run_history.jsonl"
+
+WATCH_DEBOUNCE = 0.5
+WATCH_POLL_INTERVAL = 1.0
+
+DAEMON_PORT = 8766
+# Finished jobs are forgotten once more than this many have finished, or this many seconds after finishing
+DAEMON_KEEP_JOBS = 100
+DAEMON_JOB_TTL = 3600
+
+MEDIA_FIELDS = ('Front', 'Back', 'Ref')
+MEDIA_WORKERS = 4
+
+# CSV column -> field for the built-in note types; others are read with modelFieldNames
+NOTE_TYPE_FIELDS = {
+    'Basic': {'Front': 'Front', 'Back': 'Back', 'Ref': 'Ref', 'Tags': 'Tags'},
+    'Cloze': {'Front': 'Text', 'Back': 'Back Extra', 'Ref': 'Ref', 'Tags': 'Tags'},
+}
+
+EXPORT_PAGE_SIZE = 500
+EXPORT_PATH = "anki_export.csv"
+
+# Three-way merge (--merge): per class of change, write the CSV version ("source") or leave Anki alone ("keep")
+MERGE_POLICY = {
+    'source-changed': 'source',
+    'anki-changed': 'keep',
+    'both-changed': 'keep',
+    'deleted': 'keep',
+}
+
+# Progress output: redraw at most every PROGRESS_INTERVAL s, or every PROGRESS_LOG_INTERVAL s when not on a terminal
+PROGRESS_INTERVAL = 0.25
+PROGRESS_LOG_INTERVAL = 10.0
+# Dry runs list every row only for files up to this size
+PROGRESS_VERBOSE_ROWS = 200
+
+# Notes per notesInfo request while building the duplicate index
+INDEX_PAGE_SIZE = 1000
@@ -0,0 +1,68 @@
+import itertools
+import pytest
+from unittest.mock import MagicMock
+import import_log
+import utils
+from fake_ankiconnect import FakeAnkiConnect, FakeCollection
+
+@pytest.fixture(autouse=True)
+def run_log_path(tmp_path, monkeypatch):
+    """Runs opened by tests log to their own folder, not over anki_import_log.jsonl in the working directory."""
+    path = tmp_path / "anki_import_log.jsonl"
+    monkeypatch.setattr(import_log, "LOG_FILE_PATH", str(path))
+    return path
+
+@pytest.fixture
+def fake_collection():
+    """The collection the server fixture serves; override per module for other note types."""
+    return FakeCollection()
+
+@pytest.fixture
+def server(monkeypatch, fake_collection):
+    with FakeAnkiConnect(fake_collection) as server:
+        monkeypatch.setattr(utils, "ANKI_CONNECT_URL", server.url)
+        yield server
+
+@pytest.fixture
+def fake_post(monkeypatch):
+    """Replace requests.post with a mock answering each AnkiConnect action with reply(action, params)."""
+    def install(reply):
+        def post(url, json=None, **kwargs):
+            response = MagicMock()
+            response.json.return_value = reply(json.get("action"), json.get("params", {}))
+            return response
+
+        mock_post = MagicMock(side_effect=post)
+        monkeypatch.setattr("requests.post", mock_post)
+        return mock_post
+    return install
+
+@pytest.fixture
+def anki_notes():
+    """notesInfo entries of the notes anki_post pretends Anki already has; override per module."""
+    return []
+
+@pytest.fixture
+def anki_decks():
+    return []
+
+@pytest.fixture
+def anki_post(fake_post, anki_notes, anki_decks):
+    """requests.post answering like an Anki holding anki_notes and anki_decks; added notes get ids from 100."""
+    note_ids = itertools.count(100)
+
+    def reply(action, params):
+        if action == "findNotes":
+            field = params["query"].split(':')[0]
+            return {"result": [n["noteId"] for n in anki_notes if field in n["fields"]], "error": None}
+        if action == "notesInfo":
+            return {"result": [n for n in anki_notes if n["noteId"] in params["notes"]], "error": None}
+        if action == "deckNames":
+            return {"result": list(anki_decks), "error": None}
+        if action == "modelNames":
+            return {"result": ["Basic", "Cloze"], "error": None}
+        if action == "addNote":
+            return {"result": next(note_ids), "error": None}
+        return {"result": None, "error": None}
+
+    return fake_post(reply)
@@ -0,0 +1,342 @@
+# daemon.py
+
+import itertools
+import json
+import os
+import queue
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from config import DAEMON_JOB_TTL, DAEMON_KEEP_JOBS, DAEMON_PORT
+from media import collect_media, media_uploads
+from metrics import METRICS
+from note_types import REGISTRY as NOTE_TYPES
+from utils import CardModel, anki_request, anki_url, plan_summary, preview_csv, set_transport
+from watcher import WatchSession
+
+
+class Job:
+    """One queued import; its events can be followed while it runs."""
+
+    def __init__(self, job_id, path=None, rows=None, base_deck=None, refresh=False):
+        if not path and rows is None:
+            raise ValueError("a job needs a 'path' or 'rows'")
+        self.id = job_id
+        self.path = path
+        self.rows = rows
+        self.base_deck = base_deck
+        self.refresh = refresh
+        self.status = 'queued'
+        self.total = 0
+        self.written = 0
+        self.result = None
+        self.error = None
+        self.metrics = None
+        self.finished_at = None
+        self.events = []
+        self._changed = threading.Condition()
+        self.emit('queued')
+
+    @property
+    def source(self):
+        return self.path or f"job {self.id}"
+
+    @property
+    def finished(self):
+        return self.status in ('done', 'failed')
+
+    def emit(self, event, status=None, **fields):
+        with self._changed:
+            if status:
+                self.status = status
+                if self.finished:
+                    self.finished_at = time.time()
+            self.events.append({'event': event, 'job': self.id, 'ts': round(time.time(), 3), **fields})
+            self._changed.notify_all()
+
+    def follow(self):
+        """Yield every event from the first, waiting for new ones until the job has finished."""
+        seen = 0
+        while True:
+            with self._changed:
+                while seen == len(self.events) and not self.finished:
+                    self._changed.wait()
+                batch = self.events[seen:]
+                seen = len(self.events)
+                done = self.finished and seen == len(self.events)
+            yield from batch
+            if done:
+                return
+
+    def summary(self):
+        return {
+            'id': self.id,
+            'status': self.status,
+            'source': self.source,
+            'total': self.total,
+            'written': self.written,
+            'result': self.result,
+            'error': self.error,
+            'metrics': self.metrics,
+        }
+
+
+class DaemonSession(WatchSession):
+    """WatchSession that reports planning and every written note to the running job."""
+
+    job = None
+
+    def planned(self, plan):
+        super().planned(plan)
+        self.job.total = len(plan["notes"])
+        self.job.emit('planned', counts=plan_summary(plan))
+
+    def remember(self, note, note_id):
+        super().remember(note, note_id)
+        self.job.written += 1
+        self.job.emit('written', row=note["row"], note=note_id, done=self.job.written, total=self.job.total)
+
+
+class KeepAliveTransport:
+    """http_transport over one requests.Session, so jobs reuse the connection to Anki."""
+
+    def __init__(self):
+        import requests
+        self.session = requests.Session()
+
+    def __call__(self, payload):
+        return self.session.post(anki_url(), json=payload).json()
+
+    def close(self):
+        self.session.close()
+
+
+class ImportDaemon:
+    """Localhost HTTP job API in front of a single import worker.
+
+    Jobs run one at a time, in the order submitted, against a session that
+    keeps the existing-notes index, deck list and model names between jobs:
+
+        POST /jobs               {"path": ..., or "rows": [...], "base_deck": ..., "refresh": false}
+        GET  /jobs, /jobs/<id>   job summaries
+        GET  /jobs/<id>/events   newline-delimited JSON events, streamed until the job ends
+        GET  /status             queue length and cache state
+
+    Finished jobs, events and all, are kept for keep_jobs jobs or job_ttl
+    seconds, whichever runs out first. METRICS is reset for every job and
+    its report kept on the job.
+    """
+
+    def __init__(self, base_deck=None, policy=None, id_map_path=None, host='127.0.0.1', port=DAEMON_PORT,
+                 keep_jobs=DAEMON_KEEP_JOBS, job_ttl=DAEMON_JOB_TTL):
+        self.session = DaemonSession(base_deck, policy, id_map_path)
+        self.models = None
+        self.keep_jobs = keep_jobs
+        self.job_ttl = job_ttl
+        self.jobs = {}
+        self._jobs_lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._queue = queue.Queue()
+        self._server = ThreadingHTTPServer((host, port), _make_handler(self))
+        self._server.daemon_threads = True
+        self._worker = threading.Thread(target=self._run, name="import-daemon", daemon=True)
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def start(self):
+        self._worker.start()
+        self._thread = threading.Thread(target=self._server.serve_forever, name="import-daemon-http", daemon=True)
+        self._thread.start()
+        return self.url
+
+    def serve_forever(self):
+        self._worker.start()
+        try:
+            self._server.serve_forever()
+        finally:
+            self.stop()
+
+    def stop(self):
+        self._queue.put(None)
+        self._server.shutdown()
+        self._server.server_close()
+        self._worker.join()
+
+    def submit(self, payload):
+        job = Job(next(self._ids), payload.get('path'), payload.get('rows'), payload.get('base_deck'),
+                  bool(payload.get('refresh')))
+        with self._jobs_lock:
+            self.jobs[job.id] = job
+        self._queue.put(job)
+        return job
+
+    def prune(self, now=None):
+        """Forget finished jobs past the retention count or age."""
+        now = time.time() if now is None else now
+        with self._jobs_lock:
+            finished = [job for job in self.jobs.values() if job.finished]
+            expired = finished[:max(len(finished) - self.keep_jobs, 0)]
+            expired += [job for job in finished if now - job.finished_at > self.job_ttl]
+            if expired:
+                # A new dict, so readers iterating the old one are not disturbed
+                dropped = {job.id for job in expired}
+                self.jobs = {job_id: job for job_id, job in self.jobs.items() if job_id not in dropped}
+
+    def status(self):
+        return {
+            'jobs': len(self.jobs),
+            'queued': self._queue.qsize(),
+            'index_warm': self.session.index is not None,
+            'models': sorted(self.models) if self.models is not None else None,
+        }
+
+    def check_models(self):
+        if self.models is None:
+            self.models = set(anki_request('modelNames').get('result') or [])
+        missing = {CardModel.BASIC, CardModel.CLOZE} - self.models
+        if missing:
+            self.models = None
+            raise RuntimeError(f"Required Anki models not found: {', '.join(sorted(missing))}")
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            self.run_job(job)
+            self.prune()
+
+    def run_job(self, job):
+        METRICS.reset()
+        job.emit('started', status='running')
+        self.session.job = job
+        try:
+            if job.refresh:
+                self.session.index = self.models = None
+                NOTE_TYPES.clear()
+            self.check_models()
+            rows = job.rows
+            if rows is None:
+                _, rows = preview_csv(job.path)
+                if not rows:
+                    raise ValueError(f"No rows to import in '{job.path}'")
+            # Inline rows have no CSV folder, so their media paths are relative to the daemon's
+            base_dir = os.path.dirname(os.path.abspath(job.path)) if job.path else os.getcwd()
+            with media_uploads(collect_media(rows, base_dir)):
+                plan = self.session.import_rows(rows, job.source, base_deck=job.base_deck)
+            job.result = dict(plan_summary(plan), written=job.written, failed=job.total - job.written)
+            job.metrics = METRICS.report(source=job.source)
+            job.emit('done', status='done', result=job.result)
+        except Exception as e:
+            job.error = str(e)
+            job.metrics = METRICS.report(source=job.source)
+            job.emit('failed', status='failed', error=job.error)
+        finally:
+            self.session.job = None
+
+
+def _make_handler(daemon):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            parts = self.path.strip('/').split('/')
+            if parts == ['status']:
+                return self._reply(200, daemon.status())
+            if parts == ['jobs']:
+                return self._reply(200, [job.summary() for job in daemon.jobs.values()])
+            job = self._job(parts)
+            if job is None:
+                return self._reply(404, {'error': f"not found: {self.path}"})
+            if len(parts) == 2:
+                return self._reply(200, job.summary())
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/x-ndjson')
+            self.end_headers()
+            for event in job.follow():
+                self.wfile.write((json.dumps(event, ensure_ascii=False) + "\n").encode('utf-8'))
+                self.wfile.flush()
+
+        def do_POST(self):
+            if self.path.strip('/') != 'jobs':
+                return self._reply(404, {'error': f"not found: {self.path}"})
+            try:
+                payload = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+                job = daemon.submit(payload)
+            except (ValueError, AttributeError) as e:
+                return self._reply(400, {'error': str(e)})
+            self._reply(202, job.summary())
+
+        def _job(self, parts):
+            if len(parts) not in (2, 3) or parts[0] != 'jobs' or not parts[1].isdigit():
+                return None
+            if len(parts) == 3 and parts[2] != 'events':
+                return None
+            return daemon.jobs.get(int(parts[1]))
+
+        def _reply(self, code, body):
+            payload = json.dumps(body, ensure_ascii=False).encode('utf-8')
+            self.send_response(code)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def serve(port=DAEMON_PORT, base_deck=None, policy=None, id_map_path=None, keep_alive=True):
+    """Run the daemon in the foreground until Ctrl+C."""
+    transport = KeepAliveTransport() if keep_alive else None
+    if transport:
+        set_transport(transport)
+    try:
+        daemon = ImportDaemon(base_deck, policy, id_map_path, port=port)
+        print(f"🛰️ Import daemon listening on {daemon.url} (Ctrl+C to stop)")
+        daemon.serve_forever()
+    except KeyboardInterrupt:
+        print("\n👋 Import daemon stopped.")
+    finally:
+        if transport:
+            set_transport(None)
+            transport.close()
+
+
+def submit_and_follow(url, path, base_deck=None):
+    """Queue path on a running daemon and print its progress; returns the final event."""
+    import requests
+    job = requests.post(f"{url}/jobs", json={'path': os.path.abspath(path), 'base_deck': base_deck}).json()
+    if 'id' not in job:
+        print(f"❌ Daemon rejected '{path}': {job.get('error')}")
+        return None
+    print(f"📨 Queued '{path}' as job {job['id']}")
+    event = None
+    with requests.get(f"{url}/jobs/{job['id']}/events", stream=True) as response:
+        for line in response.iter_lines():
+            if not line:
+                continue
+            event = json.loads(line)
+            if event['event'] == 'started':
+                print(f"▶️ Job {job['id']} started")
+            elif event['event'] == 'planned':
+                print(f"🗺️ {event['counts'].get('add', 0)} to add, {event['counts'].get('update', 0)} to update")
+            elif event['event'] == 'written' and (event['done'] == event['total'] or event['done'] % 100 == 0):
+                print(f"   {event['done']}/{event['total']} cards written")
+            elif event['event'] == 'done':
+                print(f"✅ Job {job['id']} done: {event['result']['written']} written, {event['result']['failed']} failed")
+            elif event['event'] == 'failed':
+                print(f"❌ Job {job['id']} failed: {event['error']}")
+    return event
@@ -0,0 +1,91 @@
+# export.py
+
+import contextvars
+import csv
+
+from config import EXPORT_PAGE_SIZE, MODEL_COLUMN
+from note_types import REGISTRY as NOTE_TYPES
+from utils import anki_request, detect_model, get_deck_names
+
+EXPORT_HEADERS = ['Deck', 'Front', 'Back', 'Ref', 'Tags', MODEL_COLUMN]
+
+
+def search_term(deck):
+    """Escape a deck name for an Anki search; * and _ are wildcards there."""
+    for char in ('\\', '"', '*', '_'):
+        deck = deck.replace(char, f"\\{char}")
+    return deck
+
+
+def deck_subtree(root):
+    return sorted(d for d in get_deck_names() if d == root or d.startswith(f"{root}::"))
+
+
+def notes_in_deck(deck):
+    """Ids of notes with cards directly in deck, not in its subdecks."""
+    term = search_term(deck)
+    return anki_request('findNotes', query=f'deck:"{term}" -deck:"{term}::*"').get('result') or []
+
+
+def fetch_pages(note_ids, page_size=EXPORT_PAGE_SIZE):
+    """Yield notesInfo for note_ids a page at a time, fetching the next page while the caller handles this one."""
+    from concurrent.futures import ThreadPoolExecutor
+
+    def fetch(start):
+        return anki_request('notesInfo', notes=note_ids[start:start + page_size]).get('result') or []
+
+    with ThreadPoolExecutor(max_workers=1, thread_name_prefix="export-prefetch") as pool:
+        pending = None
+        for start in range(0, len(note_ids), page_size):
+            # Run in a copy of this context so the request goes to the same endpoint
+            upcoming = pool.submit(contextvars.copy_context().run, fetch, start)
+            if pending is not None:
+                yield pending.result()
+            pending = upcoming
+        if pending is not None:
+            yield pending.result()
+
+
+def note_row(note, deck):
+    """A CSV row for one notesInfo entry; Model is only filled in when detection would pick another type."""
+    note_type = NOTE_TYPES.for_note(note)
+    model = note['modelName']
+    row = dict.fromkeys(EXPORT_HEADERS, '')
+    for column in ('Front', 'Back', 'Ref'):
+        row[column] = note_type.value(note['fields'], column)
+    row['Deck'] = deck
+    row['Tags'] = ' '.join(note.get('tags', []))
+    if model != detect_model(row['Front']):
+        row[MODEL_COLUMN] = model
+    return row
+
+
+def export_deck(root, path, base_deck=None, page_size=EXPORT_PAGE_SIZE):
+    """Write every note under deck root to a CSV in the import schema; returns the number of notes written.
+
+    Notes are streamed page by page, so memory does not grow with the
+    collection. Deck names lose their base_deck:: prefix, so the file can be
+    imported again with the same base deck."""
+    prefix = f"{base_deck}::" if base_deck else None
+    decks = deck_subtree(root)
+    if not decks:
+        print(f"⚠️ No deck named '{root}'")
+        return 0
+
+    seen = set()
+    written = 0
+    print(f"\n📤 Exporting {len(decks)} decks under '{root}' to {path}...")
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=EXPORT_HEADERS)
+        writer.writeheader()
+        for deck in decks:
+            # A note with cards in several decks is exported with the first one
+            note_ids = [nid for nid in notes_in_deck(deck) if nid not in seen]
+            seen.update(note_ids)
+            name = deck[len(prefix):] if prefix and deck.startswith(prefix) else deck
+            for page in fetch_pages(note_ids, page_size):
+                rows = [note_row(note, name) for note in page if note]
+                writer.writerows(rows)
+                written += len(rows)
+    print(f"✅ Exported {written} notes to {path}")
+    return written
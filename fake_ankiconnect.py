@@ -0,0 +1,207 @@
+# fake_ankiconnect.py
+
+import base64
+import fnmatch
+import itertools
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+FAKE_MODELS = {
+    "Basic": ["Front", "Back", "Ref", "Tags"],
+    "Cloze": ["Text", "Back Extra", "Ref", "Tags"],
+}
+
+
+class FakeCollection:
+    """In-memory stand-in for the parts of an Anki collection the importer touches."""
+
+    def __init__(self, models=None):
+        self.models = dict(models or FAKE_MODELS)
+        self.notes = {}
+        self.decks = {"Default"}
+        self.media = {}
+        self._ids = itertools.count(int(time.time() * 1000))
+        self._lock = threading.Lock()
+
+    def add(self, deck, model, fields, tags=()):
+        if model not in self.models:
+            raise ValueError(f"model was not found: {model}")
+        if deck not in self.decks:
+            raise ValueError(f"deck was not found: {deck}")
+        with self._lock:
+            note_id = next(self._ids)
+            self.notes[note_id] = {
+                'noteId': note_id,
+                'modelName': model,
+                'deck': deck,
+                'tags': list(tags),
+                'fields': {name: fields.get(name, '') for name in self.models[model]},
+            }
+        return note_id
+
+    def seed(self, count, deck="Seed", model="Basic"):
+        """Fill the collection with `count` notes whose fronts are 'Seed question N'."""
+        self.create_deck(deck)
+        key, back = self.models[model][:2]
+        for n in range(count):
+            self.add(deck, model, {key: f"Seed question {n}", back: f"Seed answer {n}"})
+
+    def create_deck(self, name):
+        with self._lock:
+            parts = name.split("::")
+            self.decks.update("::".join(parts[:i]) for i in range(1, len(parts) + 1))
+
+    def find(self, query):
+        if match := re.fullmatch(r'"?([^"]+):\*"?', query):
+            field = match.group(1)
+            return [nid for nid, note in self.notes.items() if field in note['fields']]
+        if match := re.fullmatch(r'deck:"([^"]*)" -deck:"\1::\*"', query):
+            deck = match.group(1)
+            return [nid for nid, note in self.notes.items() if note['deck'] == deck]
+        if match := re.fullmatch(r'deck:"?([^"]*?)"?', query):
+            deck = match.group(1)
+            return [nid for nid, note in self.notes.items()
+                    if note['deck'] == deck or note['deck'].startswith(f"{deck}::")]
+        # "Field:text" terms joined by ' or ', with \ escapes
+        terms = re.findall(r'"([^":]+):((?:[^"\\]|\\.)*)"', query)
+        if terms and " or ".join(f'"{field}:{text}"' for field, text in terms) == query:
+            wanted = {(field, re.sub(r'\\(.)', r'\1', text)) for field, text in terms}
+            return [nid for nid, note in self.notes.items()
+                    if any(note['fields'].get(field) == text for field, text in wanted)]
+        if match := re.fullmatch(r'nid:([\d,]+)', query):
+            wanted = {int(n) for n in match.group(1).split(',')}
+            return [nid for nid in self.notes if nid in wanted]
+        raise ValueError(f"unsupported query: {query}")
+
+    def info(self, note_ids):
+        result = []
+        for nid in note_ids:
+            note = self.notes.get(nid)
+            if note is None:
+                result.append({})
+                continue
+            result.append({
+                'noteId': nid,
+                'modelName': note['modelName'],
+                'tags': list(note['tags']),
+                'fields': {name: {'value': value, 'order': order}
+                           for order, (name, value) in enumerate(note['fields'].items())},
+            })
+        return result
+
+
+class FakeAnkiConnect:
+    """AnkiConnect-compatible HTTP server on localhost backed by a FakeCollection.
+
+    `latency` seconds are slept before answering each request, to mimic a
+    busy Anki. Use as a context manager; `url` is valid once started.
+    """
+
+    def __init__(self, collection=None, latency=0.0, host='127.0.0.1', port=0):
+        self.collection = collection or FakeCollection()
+        self.latency = latency
+        self.requests = 0
+        self._server = ThreadingHTTPServer((host, port), _make_handler(self))
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-ankiconnect", daemon=True)
+        self._thread.start()
+        return self.url
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def handle(self, action, params):
+        col = self.collection
+        if action == 'version':
+            return 6
+        if action == 'modelNames':
+            return list(col.models)
+        if action == 'modelFieldNames':
+            return list(col.models[params['modelName']])
+        if action == 'deckNames':
+            return sorted(col.decks)
+        if action == 'createDeck':
+            col.create_deck(params['deck'])
+            return 1
+        if action == 'findNotes':
+            return col.find(params['query'])
+        if action == 'notesInfo':
+            return col.info(params['notes'])
+        if action == 'addNote':
+            note = params['note']
+            return col.add(note['deckName'], note['modelName'], note['fields'], note.get('tags', ()))
+        if action in ('addTags', 'removeTags'):
+            tags = params['tags'].split()
+            for nid in params['notes']:
+                note = col.notes[nid]
+                if action == 'addTags':
+                    note['tags'] += [tag for tag in tags if tag not in note['tags']]
+                else:
+                    note['tags'] = [tag for tag in note['tags'] if tag not in tags]
+            return None
+        if action == 'getMediaFilesNames':
+            return [name for name in col.media if fnmatch.fnmatch(name, params.get('pattern', '*'))]
+        if action == 'storeMediaFile':
+            col.media[params['filename']] = base64.b64decode(params['data'])
+            return params['filename']
+        if action == 'deleteNotes':
+            for nid in params['notes']:
+                col.notes.pop(nid, None)
+            return None
+        if action == 'updateNoteFields':
+            note = col.notes.get(params['note']['id'])
+            if note is None:
+                raise ValueError("Note was not found")
+            for name, value in params['note']['fields'].items():
+                if name in note['fields']:
+                    note['fields'][name] = value
+            return None
+        raise ValueError(f"unsupported action: {action}")
+
+
+def _make_handler(fake):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            self._reply(b"AnkiConnect v.6")
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+            if fake.latency:
+                time.sleep(fake.latency)
+            fake.requests += 1
+            try:
+                reply = {'result': fake.handle(body.get('action'), body.get('params', {})), 'error': None}
+            except Exception as e:
+                reply = {'result': None, 'error': str(e)}
+            self._reply(json.dumps(reply).encode('utf-8'))
+
+        def _reply(self, payload):
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
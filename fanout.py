@@ -0,0 +1,108 @@
+# fanout.py
+
+import os
+
+from config import ANKI_TARGETS
+from idmap import IdMap
+from import_log import log_target
+from media import media_uploads
+from metrics import RunMetrics, scoped_metrics, write_run_report
+from utils import (
+    CardModel,
+    anki_request,
+    apply_plan,
+    open_journal,
+    plan_import,
+    plan_summary,
+    record_plan_metrics,
+    resolve_conflicts,
+    use_endpoint,
+)
+
+
+def parse_targets(specs, known=ANKI_TARGETS):
+    """Turn ['alice=http://localhost:8765', 'bob', ...] into {name: url}; a bare name is looked up in known."""
+    targets = {}
+    for spec in specs:
+        name, sep, url = spec.partition('=')
+        name, url = name.strip(), url.strip()
+        if not sep:
+            url = known.get(name)
+        if not name or not url:
+            raise ValueError(f"Expected NAME=URL or a name from ANKI_TARGETS, got '{spec}'")
+        if name in targets:
+            raise ValueError(f"Target '{name}' given twice")
+        targets[name] = url
+    return targets
+
+
+def target_path(path, name):
+    """Per-target variant of a state file: anki_id_map.json -> anki_id_map.alice.json."""
+    root, ext = os.path.splitext(path)
+    return f"{root}.{name}{ext}"
+
+
+def import_target(name, url, rows, metrics, base_deck=None, policy=None, id_map_path=None, journal_path=None,
+                  resume=False, media=None, dry_run=False, only_rows=None):
+    """Plan and write rows against one endpoint; every request, metric and log record stays with that target."""
+    with use_endpoint(url), scoped_metrics(metrics), log_target(name):
+        # Unlike anki_model_exists, lets an unreachable endpoint fail with its own error
+        models = anki_request('modelNames').get('result') or []
+        if CardModel.BASIC not in models or CardModel.CLOZE not in models:
+            raise RuntimeError("Required Anki models ('Basic' and/or 'Cloze') are not found")
+        journal = open_journal(rows, target_path(journal_path, name), resume) if journal_path and not dry_run else None
+        id_map = IdMap(target_path(id_map_path, name)) if id_map_path else None
+        try:
+            plan = plan_import(rows, base_deck, journal=journal, id_map=id_map, only_rows=only_rows)
+            resolve_conflicts(plan, policy)
+            record_plan_metrics(plan)
+            if not dry_run and (plan["notes"] or plan["decks"] or plan["adopt"] or plan["tag_changes"]):
+                with media_uploads(media):
+                    apply_plan(plan, journal, id_map)
+            return plan
+        finally:
+            if journal:
+                journal.close()
+            if id_map and not dry_run:
+                id_map.save()
+
+
+def fanout_import(rows, targets, base_deck=None, policy=None, id_map_path=None, journal_path=None, resume=False,
+                  media=None, dry_run=False, only_rows=None, report_path=None):
+    """Import already parsed rows into every target concurrently, one thread per target.
+
+    Each target gets its own duplicate index, id map and journal (named by
+    target_path) and, with report_path, its own run report. Returns
+    {name: result} with the plan summary or the error of each target."""
+    from concurrent.futures import ThreadPoolExecutor
+
+    print(f"\n📡 Importing {len(rows)} rows into {len(targets)} Anki instances: {', '.join(targets)}")
+    metrics = {name: RunMetrics() for name in targets}
+    results = {}
+    with ThreadPoolExecutor(max_workers=len(targets), thread_name_prefix="fanout") as pool:
+        futures = {
+            name: pool.submit(import_target, name, url, rows, metrics[name], base_deck, policy, id_map_path,
+                              journal_path, resume, media, dry_run, only_rows)
+            for name, url in targets.items()
+        }
+        for name, future in futures.items():
+            try:
+                results[name] = {'url': targets[name], 'ok': True, 'plan': plan_summary(future.result())}
+            except Exception as e:
+                results[name] = {'url': targets[name], 'ok': False, 'error': str(e)}
+
+    print("\n=== Targets ===")
+    for name, result in results.items():
+        counters = metrics[name].counters
+        if result['ok']:
+            print(f"  ✅ {name}: {counters['written']} written, {counters['failed']} failed, "
+                  f"{result['plan'].get('exact', 0)} already present")
+        else:
+            print(f"  ❌ {name}: {result['error']}")
+        if report_path:
+            try:
+                write_run_report(target_path(report_path, name), metrics=metrics[name], target=name,
+                                 url=result['url'], dry_run=dry_run, plan=result.get('plan'), error=result.get('error'))
+            except OSError as e:
+                print(f"⚠️ Could not write run report for {name}: {e}")
+    return results
@@ -0,0 +1,61 @@
+# idmap.py
+
+import hashlib
+import json
+import os
+
+
+def note_digest(front, back, ref):
+    content = "\x1f".join([front, back, ref])
+    return hashlib.sha1(content.encode('utf-8')).hexdigest()
+
+
+class IdMap:
+    """Persisted mapping from a CSV row's ID column to its Anki note, and
+    from every note the importer wrote to the tags it applied.
+
+    A row entry keeps the note id and a digest of the fields last written,
+    so unchanged rows are skipped and edited rows are updated in place
+    without consulting the collection. The applied tags are kept per note
+    id, with or without an ID column, so a retag only removes tags this
+    importer put on the note.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.dirty = False
+        try:
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            data = {}
+        self.entries = data.get('rows', {})
+        self.applied = data.get('tags', {})
+
+    def get(self, row_id):
+        return self.entries.get(row_id) if row_id else None
+
+    def set(self, row_id, note_id, digest, tags):
+        self.entries[row_id] = {'note': note_id, 'digest': digest}
+        self.set_tags(note_id, tags)
+
+    def tags(self, note_id):
+        """Tags the importer last applied to note_id, or None if it never wrote the note."""
+        return self.applied.get(str(note_id))
+
+    def set_tags(self, note_id, tags):
+        self.applied[str(note_id)] = list(tags)
+        self.dirty = True
+
+    def forget(self, note_id):
+        if self.applied.pop(str(note_id), None) is not None:
+            self.dirty = True
+
+    def save(self):
+        if not self.dirty:
+            return
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({'rows': self.entries, 'tags': self.applied}, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+        self.dirty = False
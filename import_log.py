@@ -0,0 +1,165 @@
+# import_log.py
+
+import contextlib
+import contextvars
+import hashlib
+import json
+import os
+import queue
+import threading
+import time
+
+from config import LOG_FILE_PATH, LOG_KEEP_RUNS, LOG_FLUSH_INTERVAL
+
+_current = None
+# Name tagged onto records logged in this context, e.g. the fan-out target
+_target = contextvars.ContextVar('log_target', default=None)
+
+
+def front_digest(front):
+    return hashlib.sha1(front.encode('utf-8')).hexdigest()[:12]
+
+
+def rotate_logs(path, keep=LOG_KEEP_RUNS):
+    """Shift path -> path.1 -> path.2 ..., dropping anything older than `keep` runs."""
+    for n in range(keep - 1, 0, -1):
+        older = f"{path}.{n}"
+        if os.path.exists(older):
+            os.replace(older, f"{path}.{n + 1}")
+    if os.path.exists(path):
+        os.replace(path, f"{path}.1")
+
+
+class ImportLog:
+    """Structured JSONL log for one run, written by a background thread.
+
+    Callers only enqueue records; the writer batches them into a buffered
+    file and flushes every `flush_interval` seconds and on close. The file is
+    only rotated and opened for the first record, so a run that imports
+    nothing leaves the previous run's log in place.
+    """
+
+    def __init__(self, path=None, keep=LOG_KEEP_RUNS, flush_interval=LOG_FLUSH_INTERVAL):
+        self.path = path or LOG_FILE_PATH
+        self.keep = keep
+        self.run = os.urandom(6).hex()
+        self.source = None
+        self.errors = 0
+        self.records = 0
+        self._flush_interval = flush_interval
+        self._queue = queue.SimpleQueue()
+        self._file = None
+        self._thread = threading.Thread(target=self._run, name="import-log", daemon=True)
+        self._thread.start()
+
+    def log(self, action, row=None, deck=None, front=None, error=None, latency=None, **extra):
+        if error:
+            self.errors += 1
+        self.records += 1
+        target = _target.get()
+        if target is not None:
+            extra['target'] = target
+        self._queue.put({
+            'ts': round(time.time(), 3),
+            'run': self.run,
+            'source': self.source,
+            'row': row,
+            'deck': deck,
+            'front': front_digest(front) if front else None,
+            'action': action,
+            'error': str(error) if error else None,
+            'latency_ms': round(latency * 1000, 3) if latency is not None else None,
+            **extra,
+        })
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+        if self._file:
+            self._file.close()
+
+    def _run(self):
+        last_flush = time.monotonic()
+        while True:
+            try:
+                record = self._queue.get(timeout=self._flush_interval)
+            except queue.Empty:
+                record = False
+            if record is None:
+                if self._file:
+                    self._file.flush()
+                return
+            if record:
+                if self._file is None:
+                    rotate_logs(self.path, self.keep)
+                    self._file = open(self.path, "w", encoding="utf-8", buffering=1 << 16)
+                self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+            if self._file and time.monotonic() - last_flush >= self._flush_interval:
+                self._file.flush()
+                last_flush = time.monotonic()
+
+
+@contextlib.contextmanager
+def run_log(path=None):
+    """Open the run log at path, by default LOG_FILE_PATH, unless one is already open, e.g. by main.main.
+
+    The previous run's log is rotated away once this run logs its first record."""
+    global _current
+    if _current is not None:
+        yield _current
+        return
+    _current = ImportLog(path)
+    try:
+        yield _current
+    finally:
+        _current.close()
+        _current = None
+
+
+@contextlib.contextmanager
+def log_target(name):
+    token = _target.set(name)
+    try:
+        yield
+    finally:
+        _target.reset(token)
+
+
+def log_event(action, **fields):
+    if _current is not None:
+        _current.log(action, **fields)
+
+
+def set_source(source):
+    if _current is not None:
+        _current.source = source
+
+
+def error_count():
+    return _current.errors if _current is not None else 0
+
+
+def read_log(path=LOG_FILE_PATH, action=None, errors_only=False, source=None):
+    """Yield the records of a run log, optionally filtered."""
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if action and record['action'] != action:
+                continue
+            if errors_only and not record['error']:
+                continue
+            if source and record['source'] != source:
+                continue
+            yield record
+
+
+def failed_rows(path=LOG_FILE_PATH):
+    """{source: [row, ...]} for every row that failed in the logged run, for a bulk retry."""
+    failed = {}
+    for record in read_log(path, errors_only=True):
+        if record['row']:
+            failed.setdefault(record['source'], set()).add(record['row'])
+    return {source: sorted(rows) for source, rows in failed.items()}
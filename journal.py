@@ -0,0 +1,104 @@
+# journal.py
+
+import hashlib
+import json
+import os
+
+from config import JOURNAL_BATCH_SIZE
+from records import NOTE_FIELDS, ROW_FIELDS
+
+
+def rows_fingerprint(rows):
+    """Digest of the columns rows (CSV rows or planned notes) are imported from, in a fixed order.
+
+    Other columns, such as the surplus cells csv keeps under None, are left out."""
+    digest = hashlib.sha1()
+    for row in rows:
+        columns = NOTE_FIELDS if 'front' in row else ROW_FIELDS
+        digest.update(json.dumps([row.get(column) for column in columns], ensure_ascii=False).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def _read_journal(path, fingerprint):
+    committed = {}
+    good_length = 0
+    try:
+        with open(path, 'rb') as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    break
+                if 'source' in entry:
+                    if fingerprint and entry['source'] != fingerprint:
+                        return {}, 0
+                else:
+                    committed.update((row, note_id) for row, note_id in entry['rows'])
+                good_length += len(line)
+    except FileNotFoundError:
+        pass
+    return committed, good_length
+
+
+def load_journal(path, fingerprint=None):
+    """Return {row: note_id} for every batch fully written to the journal.
+
+    A torn last line (crash mid-write) is ignored. If the journal was written
+    for a different source (fingerprint mismatch) nothing is returned.
+    """
+    return _read_journal(path, fingerprint)[0]
+
+
+class ImportJournal:
+    """Durable record of which source rows have been committed to Anki.
+
+    Committed rows are buffered and written as one JSON line per batch, each
+    followed by an fsync, so a crash loses at most the batch in flight.
+    """
+
+    def __init__(self, path, fingerprint, resume=False, batch_size=JOURNAL_BATCH_SIZE):
+        self.path = path
+        self.fingerprint = fingerprint
+        self.batch_size = batch_size
+        self.committed, good_length = _read_journal(path, fingerprint) if resume else ({}, 0)
+        self._pending = []
+        self._file = open(path, "a" if self.committed else "w", encoding="utf-8")
+        if self.committed:
+            self._file.truncate(good_length)
+        else:
+            self._file.write(json.dumps({'source': fingerprint}) + "\n")
+            self._sync()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __contains__(self, row):
+        return row in self.committed
+
+    def record(self, row, note_id):
+        self._pending.append([row, note_id])
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self._pending:
+            return
+        self._file.write(json.dumps({'rows': self._pending}) + "\n")
+        self._sync()
+        self.committed.update(self._pending)
+        self._pending = []
+
+    def close(self):
+        if self._file.closed:
+            return
+        self.flush()
+        self._file.close()
+
+    def _sync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
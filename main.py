@@ -1,10 +1,6 @@
 import argparse
 import json
 import os
-import sys
-from pathlib import Path
-from tkinter import Tk
-from tkinter.filedialog import askopenfilename
 
 from utils import (
     preview_csv,
@@ -12,35 +8,158 @@ from utils import (
     suggest_base_deck,
     anki_model_exists,
     import_from_rows,
+    import_plan_file,
+    assign_row_ids,
+    http_transport,
+    set_transport,
+    set_collection,
     LOG_FILE_PATH,
     safe_input
 )
+from config import ID_MAP_PATH, ANKI_COLLECTION_PATH, ANKI_CONNECT_URL, RUN_REPORT_PATH, RUN_HISTORY_PATH, DAEMON_PORT, EXPORT_PATH
+from metrics import METRICS, write_run_report
+from cassette import CassettePlayer, CassetteRecorder
+from import_log import error_count, failed_rows, run_log, set_source
+from pipeline import pipelined_import
+from profiling import PHASES, profile_run
+from progress import MODES as PROGRESS_MODES, set_progress_mode
+from policy import ConflictPolicy, load_policy
+from note_types import REGISTRY as NOTE_TYPES, load_note_types
+from media import collect_media, media_uploads
+from fanout import fanout_import, parse_targets
 
 DEFAULT_CSV_ROOT = 'P:/@SYNC/@_ATPL/@SUMMARIES'
 DEFAULT_BASE_DECK = 'ATPL'
+DEFAULT_PROFILE_PREFIX = 'anki_import_profile'
 
 def get_cache_path(csv_path: str) -> str:
     return f"{os.path.splitext(csv_path)[0]}_approved.json"
 
+def get_journal_path(csv_path: str) -> str:
+    return f"{os.path.splitext(csv_path)[0]}_journal.jsonl"
+
+def get_plan_path(csv_path: str) -> str:
+    return f"{os.path.splitext(csv_path)[0]}_plan.json"
+
+def get_snapshot_path(csv_path: str) -> str:
+    return f"{os.path.splitext(csv_path)[0]}_snapshot.json"
+
+def get_apkg_path(csv_path: str) -> str:
+    return f"{os.path.splitext(csv_path)[0]}.apkg"
+
+def get_conflict_policy(args):
+    if args.policy:
+        return load_policy(args.policy)
+    if args.overwrite_all:
+        return ConflictPolicy(default='replace')
+    if args.headless:
+        return ConflictPolicy(default='add')
+    return None
+
+def get_transport(args):
+    if args.replay:
+        print(f"📼 Replaying AnkiConnect traffic from '{args.replay}' (latency x{args.replay_latency_scale})")
+        return CassettePlayer(args.replay, args.replay_latency_scale)
+    if args.record:
+        print(f"⏺️ Recording AnkiConnect traffic to '{args.record}'")
+        return CassetteRecorder(args.record, http_transport, url=ANKI_CONNECT_URL)
+    return None
+
+def submit_to_daemon(args):
+    from daemon import submit_and_follow
+    url = f"http://127.0.0.1:{args.port}"
+    paths = [args.file] if args.file else [
+        os.path.join(root, file) for root, _, files in os.walk(args.folder or '.') for file in files if file.endswith('.csv')
+    ]
+    try:
+        for path in paths:
+            submit_and_follow(url, path, args.base_deck)
+    except OSError as e:
+        print(f"⚠️ Could not reach the import daemon at {url}: {e}")
+
 def main(args):
+    if args.submit:
+        # The daemon owns the log, report and id map; this process only hands over files
+        submit_to_daemon(args)
+        return
+    METRICS.reset()
+    set_progress_mode('quiet' if args.quiet else args.progress)
+    try:
+        policy = get_conflict_policy(args)
+    except (OSError, ValueError) as e:
+        print(f"⚠️ Error loading conflict policy: {e}")
+        return
+    if args.note_types:
+        try:
+            NOTE_TYPES.configure(load_note_types(args.note_types))
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Error loading note types: {e}")
+            return
+    targets = None
+    if args.target:
+        try:
+            targets = parse_targets(args.target)
+        except ValueError as e:
+            print(f"⚠️ {e}")
+            return
+    try:
+        transport = get_transport(args)
+    except (OSError, ValueError) as e:
+        print(f"⚠️ Error opening cassette: {e}")
+        return
+
+    if args.collection:
+        if not os.path.isfile(args.collection):
+            print(f"⚠️ No Anki collection at '{args.collection}'")
+            return
+        set_collection(args.collection)
+
+    # Read before this run's log rotates the previous one away
+    retry_rows = None
+    if args.retry_failed:
+        try:
+            retry_rows = failed_rows(LOG_FILE_PATH)
+        except FileNotFoundError:
+            print(f"⚠️ No previous import log at '{LOG_FILE_PATH}' to retry from.")
+            return
+        print(f"🔁 Retrying {sum(map(len, retry_rows.values()))} failed cards from the previous run")
+
     def process_file(path):
+        only_rows = None
+        if retry_rows is not None:
+            if path not in retry_rows:
+                return
+            only_rows = set(retry_rows[path])
+        set_source(path)
+        errors_before = error_count()
         cache_file = get_cache_path(path)
+        journal_file = get_journal_path(path)
+        plan_file = get_plan_path(path) if args.save_plan else None
         use_cache = None
 
-        if os.path.exists(cache_file) and not args.use_cache:
-            try:
-                use_cache = safe_input(f"\nFound previously approved cards in '{cache_file}'. Use these? [Y/n] ", default='y')
-            except KeyboardInterrupt:
-                return
+        if os.path.exists(cache_file) and not args.use_cache and only_rows is None and not args.apkg:
+            if args.headless:
+                # Nobody to ask: headless runs read a cache only when it is named with --use-cache
+                use_cache = 'n'
+            else:
+                try:
+                    use_cache = safe_input(f"\nFound previously approved cards in '{cache_file}'. Use these? [Y/n] ", default='y')
+                except KeyboardInterrupt:
+                    return
         if use_cache != 'n':
             args.use_cache = cache_file
 
-        if args.use_cache:
+        media_dir = os.path.dirname(os.path.abspath(path))
+        if args.use_cache and not args.apkg:
             try:
                 with open(args.use_cache, encoding="utf-8") as f:
                     approved = json.load(f)
                 print(f"\U0001F4E6 Importing {len(approved)} pre-approved notes from cache...")
-                import_from_rows(approved, dry_run=False)
+                # The cache already holds the hashed media names; the CSV says which local files they are
+                media = collect_media(preview_csv(path)[1], media_dir) if os.path.exists(path) else {}
+                with media_uploads(media):
+                    import_from_rows(approved, dry_run=False, journal_path=journal_file, resume=args.resume,
+                                     id_map_path=ID_MAP_PATH)
                 return
             except Exception as e:
                 print(f"⚠️ Error loading cache: {e}. Proceeding with normal import.")
@@ -50,6 +169,15 @@ def main(args):
             print(f"⚠️ No rows in file: {path}")
             return
 
+        if args.assign_ids:
+            assigned = assign_row_ids(path, rows)
+            if assigned:
+                print(f"🆔 Assigned IDs to {assigned} rows in '{path}'")
+
+        media = collect_media(rows, media_dir)
+        if media:
+            print(f"🖼️ {len(media)} local media files referenced")
+
         first_deck = rows[0]['Deck']
         print(f"\nFile: {path}")
         print(f"First deck entry: '{first_deck}'")
@@ -60,11 +188,43 @@ def main(args):
         except KeyboardInterrupt:
             return
 
+        if args.apkg:
+            # Written offline, so neither AnkiConnect nor the models check is needed
+            from apkg import build_apkg
+            build_apkg(rows, get_apkg_path(path), base_deck, media)
+            return
+
+        if targets:
+            fanout_import(rows, targets, base_deck, policy=policy, id_map_path=ID_MAP_PATH, journal_path=journal_file,
+                          resume=args.resume, media=media, dry_run=args.dry_run, only_rows=only_rows,
+                          report_path=None if args.report == '-' else args.report)
+            return
+
         if not anki_model_exists("Basic") or not anki_model_exists("Cloze"):
             print("⚠️ Error: Required Anki models ('Basic' and/or 'Cloze') are not found.")
             exit()
 
+        if args.merge:
+            from merge import load_merge_policy, merge_import
+            with media_uploads(media):
+                merge_import(rows, base_deck, get_snapshot_path(path), load_merge_policy(args.merge_policy),
+                             conflict_policy=policy, dry_run=args.dry_run,
+                             id_map_path=ID_MAP_PATH)
+            return
+
         dry_run = args.dry_run
+        if args.pipeline and not args.headless and not dry_run:
+            print("\nStarting import...")
+            try:
+                with media_uploads(media):
+                    pipelined_import(rows, base_deck, journal_path=journal_file, resume=args.resume,
+                                     id_map_path=ID_MAP_PATH, policy=policy, only_rows=only_rows)
+            except KeyboardInterrupt:
+                return
+            if error_count() > errors_before:
+                print(f"\n⚠️ Some cards were skipped or failed. See '{LOG_FILE_PATH}' for details.")
+            return
+
         if not args.headless and not dry_run:
             try:
                 dry_run_choice = safe_input("Would you like to do a dry run (Y/n)?", default='y')
@@ -76,10 +236,13 @@ def main(args):
         if dry_run:
             print("\U0001F50D Beginning dry run summary:")
             try:
-                import_from_rows(rows, base_deck, dry_run=True, cache_path=cache_file)
+                plan = import_from_rows(rows, base_deck, dry_run=True, cache_path=cache_file, id_map_path=ID_MAP_PATH,
+                                        policy=policy, plan_path=plan_file, only_rows=only_rows)
             except KeyboardInterrupt:
                 print("\n❌ Dry run cancelled by user.")
                 return
+            if plan is None:
+                return
 
             if not args.headless:
                 try:
@@ -94,42 +257,89 @@ def main(args):
 
                     proceed = safe_input("\nDry run complete. Proceed with actual import? (y/n):", default='n')
                     if proceed == 'y':
-                        import_from_rows(rows, base_deck, dry_run=False)
+                        # Apply what the dry run planned, with the answers given to its prompts
+                        with media_uploads(media):
+                            import_from_rows(rows, base_deck, dry_run=False, journal_path=journal_file,
+                                             resume=args.resume, id_map_path=ID_MAP_PATH, policy=policy,
+                                             only_rows=only_rows, plan=plan)
                     else:
                         print("Import cancelled.")
                 except KeyboardInterrupt:
                     return
         else:
-            import_from_rows(rows, base_deck, dry_run=False)
+            with media_uploads(media):
+                import_from_rows(rows, base_deck, dry_run=False, journal_path=journal_file, resume=args.resume,
+                                 id_map_path=ID_MAP_PATH, policy=policy, plan_path=plan_file, only_rows=only_rows)
 
-        if os.path.exists(LOG_FILE_PATH):
+        if error_count() > errors_before:
             print(f"\n⚠️ Some cards were skipped or failed. See '{LOG_FILE_PATH}' for details.")
 
+    def import_all():
+        try:
+            if args.apply_plan:
+                try:
+                    import_plan_file(args.apply_plan, journal_path=get_journal_path(args.apply_plan), resume=args.resume,
+                                     id_map_path=ID_MAP_PATH)
+                except (OSError, ValueError) as e:
+                    print(f"⚠️ Error loading plan: {e}")
+            elif args.export:
+                from export import export_deck
+                export_deck(args.export, args.out, args.base_deck if args.base_deck != '-' else None)
+            elif args.daemon:
+                from daemon import serve
+                serve(args.port, args.base_deck, policy, ID_MAP_PATH, keep_alive=transport is None)
+            elif args.watch:
+                from watcher import watch_folder
+                watch_folder(args.watch, args.base_deck, policy, id_map_path=ID_MAP_PATH, polling=args.poll)
+            elif args.file:
+                process_file(args.file)
+            elif args.folder:
+                for root, _, files in os.walk(args.folder):
+                    for file in files:
+                        if file.endswith('.csv'):
+                            process_file(os.path.join(root, file))
+            else:
+                print("\nSelect the CSV file to import into Anki...")
+                # Imported here so command-line runs never pay for loading Tk
+                from tkinter import Tk
+                from tkinter.filedialog import askopenfilename
+                Tk().withdraw()
+                try:
+                    file_path = askopenfilename(
+                        initialdir=DEFAULT_CSV_ROOT,
+                        filetypes=[('CSV Files', '*.csv')],
+                        title="Select Anki Import CSV"
+                    )
+                    if file_path:
+                        process_file(file_path)
+                    else:
+                        print("No file selected. Operation cancelled.")
+                except Exception as e:
+                    print(f"❌ Error selecting file: {e}")
+        except KeyboardInterrupt:
+            print("\n❌ Operation cancelled by user.")
+
+    if transport:
+        set_transport(transport)
     try:
-        if args.file:
-            process_file(args.file)
-        elif args.folder:
-            for root, _, files in os.walk(args.folder):
-                for file in files:
-                    if file.endswith('.csv'):
-                        process_file(os.path.join(root, file))
-        else:
-            print("\nSelect the CSV file to import into Anki...")
-            Tk().withdraw()
+        with run_log(LOG_FILE_PATH):
+            if args.profile or args.profile_phase:
+                with profile_run(args.profile or DEFAULT_PROFILE_PREFIX, args.profile_phase):
+                    import_all()
+            else:
+                import_all()
+    finally:
+        if transport:
+            set_transport(None)
+            transport.close()
+        if args.report != '-':
             try:
-                file_path = askopenfilename(
-                    initialdir=DEFAULT_CSV_ROOT,
-                    filetypes=[('CSV Files', '*.csv')],
-                    title="Select Anki Import CSV"
-                )
-                if file_path:
-                    process_file(file_path)
-                else:
-                    print("No file selected. Operation cancelled.")
-            except Exception as e:
-                print(f"❌ Error selecting file: {e}")
-    except KeyboardInterrupt:
-        print("\n❌ Operation cancelled by user.")
+                write_run_report(args.report, RUN_HISTORY_PATH, url=ANKI_CONNECT_URL,
+                                 source=args.apply_plan or args.watch or args.file or args.folder,
+                                 dry_run=args.dry_run, headless=args.headless,
+                                 transport='replay' if args.replay else 'record' if args.record else 'http')
+            except OSError as e:
+                print(f"⚠️ Could not write run report: {e}")
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(
@@ -149,6 +359,34 @@ Example usage:
     parser.add_argument("--use-cache", help="Instead of CSV, import from a previously saved dry-run cache (JSON file)")
     parser.add_argument("--headless", action="store_true", help="Run fully from command line without user prompts")
     parser.add_argument("--overwrite-all", action="store_true", help="Automatically replace all duplicate cards without asking")
+    parser.add_argument("--policy", help="JSON conflict policy (per deck/tag: skip, replace, update, add, longer) used instead of prompting")
+    parser.add_argument("--note-types", help="JSON mapping of note type -> {CSV column: field} for custom note types (pick one per row with a Model column)")
+    parser.add_argument("--assign-ids", action="store_true", help="Write a generated ID into every CSV row that lacks one, so edited rows update their existing note")
+    parser.add_argument("--save-plan", action="store_true", help="Write the computed import plan next to each CSV as _plan.json")
+    parser.add_argument("--apply-plan", help="Apply a previously saved import plan (JSON) without re-planning")
+    parser.add_argument("--pipeline", action="store_true", help="Import cards without conflicts right away while you review duplicates (replaces the dry run step)")
+    parser.add_argument("--profile", nargs='?', const=DEFAULT_PROFILE_PREFIX, help="Profile the run with cProfile and tracemalloc, writing <prefix>.pstats and <prefix>_report.txt")
+    parser.add_argument("--profile-phase", choices=PHASES, help="Only profile one stage of the import (implies --profile)")
+    parser.add_argument("--report", default=RUN_REPORT_PATH, help=f"Where to write the JSON run report (also appended to {RUN_HISTORY_PATH}); '-' disables it")
+    parser.add_argument("--record", help="Record every AnkiConnect request/response with timings to this cassette (.jsonl.gz)")
+    parser.add_argument("--replay", help="Serve AnkiConnect responses from a recorded cassette instead of a running Anki")
+    parser.add_argument("--replay-latency-scale", type=float, default=1.0, help="Multiply recorded latencies on replay (0 = no delay)")
+    parser.add_argument("--retry-failed", action="store_true", help=f"Only import the rows that failed in the previous run, per '{LOG_FILE_PATH}'")
+    parser.add_argument("--watch", nargs='?', const=DEFAULT_CSV_ROOT, help="Keep running and import new or changed CSV rows under this folder as files are saved")
+    parser.add_argument("--poll", action="store_true", help="With --watch, poll the folder instead of using inotify")
+    parser.add_argument("--export", metavar="DECK", help="Export the notes under DECK (and its subdecks) to a CSV in the import format")
+    parser.add_argument("--out", default=EXPORT_PATH, help="CSV file written by --export")
+    parser.add_argument("--target", action="append", metavar="NAME=URL", help="Import into this AnkiConnect endpoint (repeat for several, run concurrently); a bare NAME is looked up in ANKI_TARGETS")
+    parser.add_argument("--daemon", action="store_true", help="Serve import jobs over a localhost HTTP API, keeping the duplicate index warm between jobs")
+    parser.add_argument("--port", type=int, default=DAEMON_PORT, help="Port of the --daemon job API")
+    parser.add_argument("--submit", action="store_true", help="Hand --file (or the CSVs in --folder) to a running --daemon and follow its progress")
+    parser.add_argument("--collection", default=ANKI_COLLECTION_PATH, help="Read the duplicate index, note types and deck names from this collection.anki2 (read-only) instead of through AnkiConnect, e.g. while Anki is closed")
+    parser.add_argument("--apkg", action="store_true", help="Write each CSV to an .apkg package next to it (for Anki's File > Import) instead of importing through AnkiConnect")
+    parser.add_argument("--merge", action="store_true", help="Merge three ways against the file's _snapshot.json of the last import, so edits made in Anki are not overwritten")
+    parser.add_argument("--merge-policy", help="JSON {class: source|keep} for --merge, overriding MERGE_POLICY (classes: source-changed, anki-changed, both-changed, deleted)")
+    parser.add_argument("--progress", choices=PROGRESS_MODES, default='bar', help="How import progress is shown: a throttled status line, JSON events on stderr, or nothing")
+    parser.add_argument("--quiet", action="store_true", help="Same as --progress=quiet")
+    parser.add_argument("--resume", action="store_true", help="Skip cards already committed by an interrupted run (per the file's _journal.jsonl)")
 
     args = parser.parse_args()
     main(args)
@@ -0,0 +1,135 @@
+# media.py
+
+import base64
+import contextlib
+import contextvars
+import hashlib
+import os
+import re
+
+from config import MEDIA_FIELDS, MEDIA_WORKERS
+from import_log import log_event
+from metrics import METRICS
+from utils import anki_request
+
+# <img src="..."> (any quoting) and [sound:...] references
+MEDIA_RE = re.compile(r'''(<img\b[^>]*?\bsrc\s*=\s*["']?)([^"'\s>]+)|(\[sound:)([^\]]+)(?=\])''', re.IGNORECASE)
+
+
+def is_remote(ref):
+    return ref.startswith(('http://', 'https://', 'data:', '//'))
+
+
+def file_digest(path):
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def media_name(path, digest):
+    """Name a file is stored under in Anki: its content hash and extension, so equal files share one name."""
+    return f"{digest}{os.path.splitext(path)[1].lower()}"
+
+
+def find_media(text):
+    return [m.group(2) or m.group(4) for m in MEDIA_RE.finditer(text)]
+
+
+def collect_media(rows, base_dir):
+    """Point local media references in rows at their hashed Anki names; returns {name: local path}.
+
+    References are resolved relative to base_dir (the CSV's folder). Remote
+    URLs and files that do not exist locally are left as they are."""
+    files = {}
+    names = {}
+
+    def rename(match):
+        prefix = match.group(1) or match.group(3)
+        ref = match.group(2) or match.group(4)
+        if is_remote(ref):
+            return match.group(0)
+        path = os.path.normpath(os.path.join(base_dir, ref))
+        if path not in names:
+            names[path] = media_name(path, file_digest(path)) if os.path.isfile(path) else None
+        name = names[path]
+        if name is None:
+            return match.group(0)
+        files[name] = path
+        return prefix + name
+
+    for row in rows:
+        for field in MEDIA_FIELDS:
+            value = row.get(field)
+            if value and ('<' in value or '[sound:' in value):
+                row[field] = MEDIA_RE.sub(rename, value)
+    return files
+
+
+class MediaUploader:
+    """Stores the media files Anki does not have yet on a bounded pool of worker threads."""
+
+    def __init__(self, files, workers=MEDIA_WORKERS):
+        self.files = files
+        self.workers = workers
+        self.uploaded = 0
+        self.failed = 0
+        self._executor = None
+        self._futures = []
+
+    def start(self):
+        existing = set(anki_request('getMediaFilesNames', pattern='*').get('result') or [])
+        missing = sorted(name for name in self.files if name not in existing)
+        METRICS.count('media_present', len(self.files) - len(missing))
+        if not missing:
+            return 0
+        from concurrent.futures import ThreadPoolExecutor
+        print(f"🖼️ Uploading {len(missing)} media files ({len(self.files) - len(missing)} already in Anki)...")
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="media-upload")
+        # Each upload runs in a copy of this context, so it goes to the same endpoint (see fanout.py)
+        self._futures = [self._executor.submit(contextvars.copy_context().run, self._store, name) for name in missing]
+        return len(missing)
+
+    def _store(self, name):
+        try:
+            with open(self.files[name], 'rb') as f:
+                data = base64.b64encode(f.read()).decode('ascii')
+            error = anki_request('storeMediaFile', filename=name, data=data).get('error')
+        except Exception as e:
+            error = f"crashed: {e}"
+        log_event('media', error=error, file=name)
+        return error is None
+
+    def wait(self):
+        if self._executor is None:
+            return
+        for future in self._futures:
+            if future.result():
+                self.uploaded += 1
+            else:
+                self.failed += 1
+        self._executor.shutdown()
+        self._executor = None
+        METRICS.count('media_uploaded', self.uploaded)
+        METRICS.count('media_failed', self.failed)
+        print(f"🖼️ Media: {self.uploaded} uploaded, {self.failed} failed")
+
+
+@contextlib.contextmanager
+def media_uploads(files, workers=MEDIA_WORKERS):
+    """Upload missing media in the background while the body of the with-block imports notes."""
+    if not files:
+        yield None
+        return
+    uploader = MediaUploader(files, workers)
+    try:
+        uploader.start()
+    except Exception as e:
+        print(f"⚠️ Could not check Anki's media folder: {e}")
+        yield None
+        return
+    try:
+        yield uploader
+    finally:
+        uploader.wait()
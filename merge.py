@@ -0,0 +1,221 @@
+# merge.py
+
+import contextlib
+import hashlib
+import json
+import os
+from collections import Counter
+
+from compact_index import same_back
+from config import MERGE_POLICY
+from export import fetch_pages
+from idmap import IdMap, note_digest
+from import_log import run_log
+from note_types import REGISTRY as NOTE_TYPES
+from utils import (
+    apply_plan,
+    fetch_existing_index,
+    get_deck_names,
+    new_plan,
+    plan_import,
+    print_plan_summary,
+    record_plan_metrics,
+    resolve_conflicts,
+    row_note,
+    tag_change,
+    tag_delta,
+)
+
+CLASSES = ('unchanged', 'source-changed', 'anki-changed', 'both-changed', 'deleted')
+# What a class's policy can say: write the CSV version to Anki, or keep Anki as it is
+MERGE_ACTIONS = ('source', 'keep')
+
+
+def note_key(note):
+    """Stable key of a row: its ID column, else a hash of note type and front."""
+    if note["row_id"]:
+        return note["row_id"]
+    return hashlib.sha1(f"{note['model']}\x1f{note['front']}".encode('utf-8')).hexdigest()[:20]
+
+
+def content_digest(note):
+    return note_digest(note["front"], note["back"], note["ref"])
+
+
+def classify(source, base, live):
+    """Class of one note from the digests of the CSV row, the snapshot and Anki (None: deleted in Anki)."""
+    if live is None:
+        return 'deleted'
+    if source == base:
+        return 'unchanged' if live == base else 'anki-changed'
+    if live == base:
+        return 'source-changed'
+    # Both sides made the same edit
+    return 'unchanged' if live == source else 'both-changed'
+
+
+class Snapshot:
+    """What was last imported from one CSV: {key: [note id, content digest, tags applied]}, persisted as JSON."""
+
+    def __init__(self, path):
+        self.path = path
+        self.dirty = False
+        try:
+            with open(path, encoding="utf-8") as f:
+                self.entries = json.load(f)
+        except FileNotFoundError:
+            self.entries = {}
+
+    def get(self, key):
+        return self.entries.get(key)
+
+    def set(self, key, note_id, digest, tags):
+        self.entries[key] = [note_id, digest, list(tags)]
+        self.dirty = True
+
+    def remember(self, note, note_id):
+        self.set(note_key(note), note_id, content_digest(note), note["tags"])
+
+    def save(self):
+        if not self.dirty:
+            return
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.entries, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+        self.dirty = False
+
+
+def load_merge_policy(path=None):
+    """{class: action} from MERGE_POLICY, overridden by the JSON file at path."""
+    policy = dict(MERGE_POLICY)
+    if path:
+        with open(path, encoding="utf-8") as f:
+            policy.update(json.load(f))
+    for cls, action in policy.items():
+        if cls not in CLASSES[1:]:
+            raise ValueError(f"Unknown merge class '{cls}', expected one of: {', '.join(CLASSES[1:])}")
+        if action not in MERGE_ACTIONS:
+            raise ValueError(f"Unknown merge action '{action}' for {cls}, expected one of: {', '.join(MERGE_ACTIONS)}")
+    return policy
+
+
+def live_notes(note_ids):
+    """{note id: (content digest, tags)} of the notes still in Anki."""
+    live = {}
+    for page in fetch_pages(list(note_ids)):
+        for note in page:
+            if not note:
+                continue
+            note_type = NOTE_TYPES.for_note(note)
+            fields = note['fields']
+            digest = note_digest(*(note_type.value(fields, column).strip() for column in ('Front', 'Back', 'Ref')))
+            live[note['noteId']] = (digest, note.get('tags', []))
+    return live
+
+
+def merge_plan(rows, snapshot, base_deck=None, policy=None, id_map=None):
+    """Plan rows three ways against the snapshot and the live notes it points at.
+
+    Rows the snapshot knows are classified (see classify) and handled by
+    the policy for their class, and have their tags synced like mapped rows
+    in plan_import; everything else goes through plan_import's usual front
+    matching. Every lookup is by hashed key, so this is linear in the number
+    of rows. plan['merge'] counts the classes."""
+    policy = policy or MERGE_POLICY
+    plan = new_plan(base_deck)
+    plan["counts"]["rows"] = len(rows)
+    classes = Counter()
+    matched = []
+    fresh = {}
+    for idx, row in enumerate(rows, start=1):
+        note = row_note(row, idx, base_deck)
+        entry = snapshot.get(note_key(note))
+        if entry is None:
+            fresh[idx] = note
+        else:
+            matched.append((note, entry))
+
+    live = live_notes(entry[0] for _, entry in matched) if matched else {}
+    readd_decks = set()
+    for note, entry in matched:
+        # Only tags the snapshot says were applied from here are removed
+        note_id, base, applied = entry
+        source = content_digest(note)
+        live_digest, live_tags = live.get(note_id, (None, None))
+        cls = classify(source, base, live_digest)
+        classes[cls] += 1
+        if cls != 'deleted':
+            add, remove = tag_delta(live_tags, note["tags"], applied)
+            if add or remove:
+                plan["tag_changes"].append(tag_change(note, note_id, add, remove))
+        if cls == 'unchanged':
+            if base != source:
+                snapshot.set(note_key(note), note_id, source, applied)
+            continue
+        if policy[cls] == 'keep':
+            plan["counts"]["kept"] += 1
+        elif cls == 'deleted':
+            plan["notes"].append(note)
+            readd_decks.add(note["deck"])
+        else:
+            plan["notes"].append(note.replace(update_id=note_id))
+
+    if fresh:
+        index = fetch_existing_index()
+        sub = plan_import(rows, base_deck, index=index, id_map=id_map, only_rows=set(fresh))
+        for key in ("notes", "conflicts", "adopt", "tag_changes", "failed"):
+            plan[key].extend(sub[key])
+        sub["counts"].pop("rows", None)
+        plan["counts"].update(sub["counts"])
+        readd_decks.update(sub["decks"])
+        # Rows already in Anki unchanged join the snapshot, so they are merged three ways from now on
+        planned = {n["row"] for n in sub["notes"]} | {c["note"]["row"] for c in sub["conflicts"]}
+        for idx, note in fresh.items():
+            existing = index.get(note["model"], {}).get(note["front"])
+            if idx not in planned and existing and same_back(existing, note["back"]):
+                # Owning the row's tags the note already has, as adopted id map entries do
+                owned = [tag for tag in note["tags"] if tag in (existing.get('tags') or ())]
+                snapshot.set(note_key(note), existing['id'], content_digest(note), owned)
+
+    if readd_decks:
+        plan["decks"] = sorted(readd_decks - set(get_deck_names()))
+    plan["notes"].sort(key=lambda n: n["row"])
+    plan["merge"] = {cls: classes[cls] for cls in CLASSES if classes[cls]}
+    return plan
+
+
+def print_merge_summary(plan):
+    print("\n=== Three-way merge ===")
+    for cls, count in plan["merge"].items():
+        print(f"  {cls}: {count}")
+
+
+def merge_import(rows, base_deck=None, snapshot_path=None, policy=None, conflict_policy=None, dry_run=False,
+                 id_map_path=None):
+    """Import rows with merge_plan, then move the snapshot on to what was written."""
+    snapshot = Snapshot(snapshot_path)
+    id_map = IdMap(id_map_path) if id_map_path else None
+    with contextlib.nullcontext() if dry_run else run_log():
+        plan = merge_plan(rows, snapshot, base_deck, policy, id_map)
+        resolve_conflicts(plan, conflict_policy)
+        record_plan_metrics(plan)
+        print_merge_summary(plan)
+        print_plan_summary(plan)
+        if dry_run:
+            return plan
+
+        def remember(note, note_id):
+            snapshot.remember(note, note_id)
+
+        def retagged(change):
+            snapshot.set(note_key(change), change["note"], change["digest"], change["tags"])
+
+        try:
+            if plan["notes"] or plan["decks"] or plan["adopt"] or plan["tag_changes"]:
+                apply_plan(plan, id_map=id_map, on_written=remember, on_retagged=retagged)
+        finally:
+            snapshot.save()
+            if id_map:
+                id_map.save()
+    return plan
@@ -0,0 +1,144 @@
+# metrics.py
+
+import bisect
+import contextlib
+import contextvars
+import json
+import math
+import threading
+import time
+from array import array
+from collections import Counter
+
+# Upper bounds (seconds) of the latency histogram buckets; the last bucket is open-ended
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _nearest_rank(ordered, p):
+    if not ordered:
+        return 0.0
+    return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+
+class LatencyHistogram:
+    """Bucketed latency counts plus the raw samples (8 bytes each) for exact percentiles."""
+
+    def __init__(self):
+        self.samples = array('d')
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.errors = 0
+
+    def record(self, seconds, ok=True):
+        self.samples.append(seconds)
+        self.buckets[bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        if not ok:
+            self.errors += 1
+
+    def percentile(self, p):
+        return _nearest_rank(sorted(self.samples), p)
+
+    def summary(self):
+        ordered = sorted(self.samples)
+        count = len(ordered)
+        total = sum(ordered)
+        labels = [f"<={bound}s" for bound in LATENCY_BUCKETS] + [f">{LATENCY_BUCKETS[-1]}s"]
+        return {
+            'count': count,
+            'errors': self.errors,
+            'total_s': round(total, 6),
+            'mean_ms': round(total / count * 1000, 3) if count else 0.0,
+            'p50_ms': round(_nearest_rank(ordered, 50) * 1000, 3),
+            'p95_ms': round(_nearest_rank(ordered, 95) * 1000, 3),
+            'p99_ms': round(_nearest_rank(ordered, 99) * 1000, 3),
+            'max_ms': round(ordered[-1] * 1000, 3) if count else 0.0,
+            'buckets': {label: n for label, n in zip(labels, self.buckets) if n},
+        }
+
+
+# Extra RunMetrics that this context's measurements are also recorded into; see scoped_metrics
+_scope = contextvars.ContextVar('run_metrics_scope', default=None)
+
+
+class RunMetrics:
+    """Everything measured during one main.main invocation; safe to update from worker threads.
+
+    Measurements made inside scoped_metrics(other) are copied into other too."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.started_at = time.time()
+            self._started = time.perf_counter()
+            self.actions = {}
+            self.phases = {}
+            self.counters = Counter()
+
+    def record_call(self, action, seconds, ok=True):
+        with self._lock:
+            histogram = self.actions.get(action)
+            if histogram is None:
+                histogram = self.actions[action] = LatencyHistogram()
+            histogram.record(seconds, ok)
+        self._forward('record_call', action, seconds, ok)
+
+    def record_phase(self, name, seconds):
+        with self._lock:
+            total, count = self.phases.get(name, (0.0, 0))
+            self.phases[name] = (total + seconds, count + 1)
+        self._forward('record_phase', name, seconds)
+
+    def count(self, name, n=1):
+        with self._lock:
+            self.counters[name] += n
+        self._forward('count', name, n)
+
+    def _forward(self, method, *args):
+        scoped = _scope.get()
+        if scoped is not None and scoped is not self:
+            getattr(scoped, method)(*args)
+
+    def report(self, **context):
+        with self._lock:
+            duration = time.perf_counter() - self._started
+            written = self.counters['written']
+            write_time = self.phases.get('write', (0.0, 0))[0]
+            return {
+                'started_at': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(self.started_at)),
+                'duration_s': round(duration, 3),
+                **context,
+                'counts': dict(self.counters),
+                'throughput': {
+                    'cards_per_s': round(written / duration, 2) if duration else 0.0,
+                    'write_cards_per_s': round(written / write_time, 2) if write_time else 0.0,
+                },
+                'phases': {name: {'total_s': round(total, 6), 'count': count}
+                           for name, (total, count) in self.phases.items()},
+                'actions': {action: h.summary() for action, h in sorted(self.actions.items())},
+            }
+
+
+METRICS = RunMetrics()
+
+
+@contextlib.contextmanager
+def scoped_metrics(metrics):
+    """Also record this thread's measurements into metrics (e.g. one fan-out target) during the block."""
+    token = _scope.set(metrics)
+    try:
+        yield metrics
+    finally:
+        _scope.reset(token)
+
+
+def write_run_report(path, history_path=None, metrics=None, **context):
+    """Write this run's report (or that of metrics) to path and append it as one line to history_path."""
+    report = (metrics or METRICS).report(**context)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    if history_path:
+        with open(history_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(report, ensure_ascii=False) + "\n")
+    return report
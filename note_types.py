@@ -0,0 +1,126 @@
+# note_types.py
+
+import json
+
+from config import NOTE_TYPE_FIELDS
+
+COLUMNS = ('Front', 'Back', 'Ref', 'Tags')
+
+# Field a column falls back to when the mapping does not name one, by preference
+_FALLBACK_FIELDS = {
+    'Front': ('Front', 'Text'),
+    'Back': ('Back', 'Back Extra'),
+    'Ref': ('Ref',),
+    'Tags': ('Tags',),
+}
+
+
+class NoteType:
+    """A note type's CSV column → field mapping, resolved once.
+
+    `targets` is the compiled list of (column index, field) pairs, so
+    building a note's fields is a single pass with no lookups by name.
+    """
+
+    def __init__(self, name, mapping, fields=None):
+        self.name = name
+        self.fields = list(fields) if fields is not None else None
+        resolved = {}
+        for position, column in enumerate(COLUMNS):
+            field = mapping.get(column, self._fallback(column, position))
+            if field and (self.fields is None or field in self.fields):
+                resolved[column] = field
+        self.mapping = resolved
+        self.targets = [(COLUMNS.index(column), field) for column, field in resolved.items()]
+        self.front_field = resolved.get('Front')
+        self.back_field = resolved.get('Back')
+
+    def _fallback(self, column, position):
+        if self.fields is None:
+            return None
+        for field in _FALLBACK_FIELDS[column]:
+            if field in self.fields:
+                return field
+        # Front and Back default to the model's first two fields
+        if position < 2 and len(self.fields) > position:
+            return self.fields[position]
+        return None
+
+    def build_fields(self, front, back, ref, tags):
+        values = (front, back, ref, ' '.join(tags))
+        return {field: values[i] for i, field in self.targets}
+
+    def value(self, note_fields, column):
+        """The raw value of a notesInfo 'fields' dict that column maps to ('' if unmapped)."""
+        field = self.mapping.get(column)
+        return note_fields.get(field, {}).get('value', '') if field else ''
+
+    def read(self, note_fields):
+        """(front, back) of a notesInfo 'fields' dict for this type."""
+        return self.value(note_fields, 'Front').strip(), self.value(note_fields, 'Back').strip()
+
+
+class NoteTypeRegistry:
+    """Note types compiled on first use and kept for the session.
+
+    A type whose mapping names a field for every column is compiled as is;
+    any other type costs one modelFieldNames call, the first time it is used.
+    """
+
+    def __init__(self, mapping=None):
+        self.configure(mapping)
+
+    def configure(self, mapping=None):
+        self.mapping = {**NOTE_TYPE_FIELDS, **(mapping or {})}
+        self.types = {}
+
+    def clear(self):
+        self.types = {}
+
+    def get(self, name, fields=None):
+        """The compiled type for model name; fields (e.g. from notesInfo, in order) avoid a request."""
+        if name in self.types:
+            note_type = self.types[name]
+            if note_type is None:
+                raise ValueError(f"Unknown note type '{name}'")
+            return note_type
+        mapping = self.mapping.get(name, {})
+        if fields is None and not all(column in mapping for column in COLUMNS):
+            try:
+                fields = self._fetch_fields(name)
+            except ValueError:
+                # Remembered, so a CSV full of a misspelt model fails fast instead of once per row
+                self.types[name] = None
+                raise
+        note_type = self.types[name] = NoteType(name, mapping, fields)
+        return note_type
+
+    def for_note(self, note):
+        """The compiled type of a notesInfo entry, compiled from its own field order if new."""
+        note_type = self.types.get(note['modelName'])
+        if note_type is None:
+            fields = note['fields']
+            note_type = self.get(note['modelName'], sorted(fields, key=lambda name: fields[name].get('order', 0)))
+        return note_type
+
+    @staticmethod
+    def _fetch_fields(name):
+        from utils import anki_request
+        reply = anki_request('modelFieldNames', modelName=name)
+        if reply.get('error') or not isinstance(reply.get('result'), list):
+            raise ValueError(f"Unknown note type '{name}': {reply.get('error')}")
+        return reply['result']
+
+
+REGISTRY = NoteTypeRegistry()
+
+
+def load_note_types(path):
+    """Read {model: {column: field}} from a JSON file; a null field leaves that column out."""
+    with open(path, encoding="utf-8") as f:
+        mapping = json.load(f)
+    for name, columns in mapping.items():
+        unknown = set(columns) - set(COLUMNS)
+        if unknown:
+            raise ValueError(f"Note type '{name}' maps unknown columns: {', '.join(sorted(unknown))}")
+    return mapping
@@ -0,0 +1,137 @@
+# pipeline.py
+
+import queue
+import threading
+import time
+
+from idmap import IdMap
+from import_log import log_event, run_log
+from metrics import METRICS
+from utils import (
+    apply_tag_changes,
+    create_deck,
+    delete_note,
+    import_note,
+    note_action,
+    open_journal,
+    plan_import,
+    print_import_summary,
+    record_plan_metrics,
+    resolve_conflicts,
+)
+
+
+class WriteQueue:
+    """Single background writer that applies approved notes in the order queued.
+
+    Decks named in `decks` are created just before the first note that needs
+    them. Only this thread touches the journal and id map once it has started.
+    A note that fails is logged and counted, and the writer carries on with
+    the next; notes still queued when cancelled are counted in `dropped`.
+    """
+
+    def __init__(self, decks=(), journal=None, id_map=None):
+        self.journal = journal
+        self.id_map = id_map
+        self.success_count = 0
+        self.error_count = 0
+        self.dropped = 0
+        self._missing_decks = set(decks)
+        self._queue = queue.Queue()
+        self._cancelled = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="anki-writer", daemon=True)
+        self._thread.start()
+
+    @property
+    def written(self):
+        return self.success_count + self.error_count
+
+    def put(self, note):
+        self._queue.put(note)
+
+    def close(self, cancel=False):
+        """Stop accepting notes and wait for the writer; with cancel, drop what is still queued."""
+        if cancel:
+            self._cancelled.set()
+        self._queue.put(None)
+        self._thread.join()
+
+    def _run(self):
+        while True:
+            note = self._queue.get()
+            if note is None:
+                return
+            if self._cancelled.is_set():
+                self.dropped += 1
+                continue
+            start = time.perf_counter()
+            try:
+                written = self._write(note)
+            except Exception as e:
+                log_event(note_action(note), row=note["row"], deck=note["deck"], front=note["front"],
+                          error=f"crashed: {e}", latency=time.perf_counter() - start)
+                METRICS.count('failed')
+                written = False
+            if written:
+                self.success_count += 1
+            else:
+                self.error_count += 1
+            METRICS.record_phase('write', time.perf_counter() - start)
+
+    def _write(self, note):
+        deck = note["deck"]
+        if deck in self._missing_decks and not note.get("update_id"):
+            create_deck(deck)
+            self._missing_decks.discard(deck)
+        if note.get("replace_id"):
+            delete_note(note["replace_id"])
+        return import_note(note["row"], note, self.journal, self.id_map)
+
+
+def pipelined_import(rows, base_deck=None, journal_path=None, resume=False, id_map_path=None, policy=None,
+                     only_rows=None):
+    """Import rows while the user reviews duplicates.
+
+    Rows without a conflict are handed to the writer as soon as planning has
+    classified them; each duplicate joins the same queue the moment it is
+    resolved, so only the prompts are left for the user to wait on."""
+    journal = open_journal(rows, journal_path, resume) if journal_path else None
+    id_map = IdMap(id_map_path) if id_map_path else None
+    writer = None
+    try:
+        with run_log():
+            plan = plan_import(rows, base_deck, journal=journal, id_map=id_map, only_rows=only_rows)
+            if id_map:
+                for entry in plan["adopt"]:
+                    id_map.set(*entry)
+
+            writer = WriteQueue(plan["decks"], journal, id_map)
+            for note in plan["notes"]:
+                writer.put(note)
+            queued = len(plan["notes"])
+            print(f"\n🚚 Writing {queued} new or updated cards in the background...")
+
+            if plan["conflicts"]:
+                print(f"⚠️ {len(plan['conflicts'])} duplicates need review")
+            completed = resolve_conflicts(plan, policy, interactive=True, on_resolved=writer.put)
+
+            if writer.written < len(plan["notes"]):
+                print(f"\n⏳ Waiting for {len(plan['notes']) - writer.written} queued cards to be written...")
+            writer.close()
+            apply_tag_changes(plan["tag_changes"], id_map)
+            record_plan_metrics(plan)
+            if not completed:
+                print("Remaining duplicates were left untouched.")
+            print_import_summary(writer.written, writer.success_count, writer.error_count)
+    except KeyboardInterrupt:
+        if writer:
+            writer.close(cancel=True)
+            print(f"\n❌ Import cancelled by user after {writer.written} cards were written.")
+            if writer.dropped:
+                print(f"⚠️ {writer.dropped} queued cards were not written.")
+        raise
+    finally:
+        if journal:
+            journal.close()
+        if id_map:
+            id_map.save()
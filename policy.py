@@ -0,0 +1,64 @@
+# policy.py
+
+import fnmatch
+import json
+import re
+
+from records import with_fields
+
+ACTIONS = ('skip', 'replace', 'update', 'add', 'longer')
+
+
+class ConflictPolicy:
+    """Declarative answer to "a note with this front already exists".
+
+    Rules are checked in order and the first one whose deck pattern and tag
+    both match decides; otherwise the default applies. Actions:
+    skip, replace (delete + add), update (edit in place), add (keep both)
+    and longer (update only if the new back is longer).
+    """
+
+    def __init__(self, rules=(), default='add'):
+        self.default = self._check(default)
+        self.rules = [
+            (re.compile(fnmatch.translate(rule['deck'])).match if rule.get('deck') else None,
+             rule.get('tag'),
+             self._check(rule.get('action')))
+            for rule in rules
+        ]
+
+    @staticmethod
+    def _check(action):
+        if action not in ACTIONS:
+            raise ValueError(f"Unknown conflict action '{action}', expected one of: {', '.join(ACTIONS)}")
+        return action
+
+    def action_for(self, deck, tags):
+        for deck_match, tag, action in self.rules:
+            if deck_match and not deck_match(deck):
+                continue
+            if tag and tag not in tags:
+                continue
+            return action
+        return self.default
+
+    def resolve(self, note, existing):
+        """Return (action, note) for one conflict; note is None when skipped.
+
+        The returned note carries replace_id or update_id as the action needs."""
+        action = self.action_for(note['deck'], note['tags'])
+        if action == 'longer':
+            action = 'update' if len(note['back']) > len(existing['back']) else 'skip'
+        if action == 'skip':
+            return action, None
+        if action == 'replace':
+            return action, with_fields(note, replace_id=existing['id'])
+        if action == 'update':
+            return action, with_fields(note, update_id=existing['id'])
+        return action, note
+
+
+def load_policy(path):
+    with open(path, encoding="utf-8") as f:
+        spec = json.load(f)
+    return ConflictPolicy(spec.get('rules', []), spec.get('default', 'add'))
@@ -0,0 +1,105 @@
+# profiling.py
+
+import contextlib
+import time
+
+from config import PROFILE_TOP_N
+from metrics import METRICS
+
+PHASES = ('parse', 'index', 'plan', 'write')
+
+_active = None
+
+
+class Profiler:
+    """cProfile plus tracemalloc over the whole run or over every entry into one phase."""
+
+    def __init__(self, output_prefix, phase=None, top_n=PROFILE_TOP_N):
+        import cProfile
+        import tracemalloc
+        self.tracemalloc = tracemalloc
+        self.output_prefix = output_prefix
+        self.phase = phase
+        self.top_n = top_n
+        self.profile = cProfile.Profile()
+        self.sections = []
+        self._snapshot = None
+
+    def begin(self):
+        self._snapshot = self._take_snapshot()
+        self.tracemalloc.reset_peak()
+        self.profile.enable()
+
+    def end(self, label):
+        self.profile.disable()
+        peak = self.tracemalloc.get_traced_memory()[1]
+        stats = self._take_snapshot().compare_to(self._snapshot, 'lineno')
+        self.sections.append((label, peak, stats[:self.top_n]))
+        self._snapshot = None
+
+    def _take_snapshot(self):
+        tracemalloc = self.tracemalloc
+        return tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+        ))
+
+    def write_reports(self):
+        import io
+        import pstats
+        stats_path = f"{self.output_prefix}.pstats"
+        report_path = f"{self.output_prefix}_report.txt"
+        if not self.sections:
+            print(f"\nℹ️  Profiled phase '{self.phase}' never ran; no profile written.")
+            return None, None
+        self.profile.dump_stats(stats_path)
+
+        functions = io.StringIO()
+        pstats.Stats(self.profile, stream=functions).sort_stats('cumulative').print_stats(self.top_n)
+        with open(report_path, "w", encoding="utf-8") as f:
+            f.write(f"=== Top {self.top_n} functions by cumulative time ===\n")
+            f.write(functions.getvalue())
+            for label, peak, stats in self.sections:
+                f.write(f"\n=== Top {self.top_n} allocations: {label} (peak {peak / 1024:.1f} KiB) ===\n")
+                for stat in stats:
+                    f.write(f"{stat}\n")
+        return stats_path, report_path
+
+
+@contextlib.contextmanager
+def profile_run(output_prefix, phase=None, top_n=PROFILE_TOP_N):
+    """Profile the enclosed block, or only the parts of it marked with phase(name)."""
+    global _active
+    if phase is not None and phase not in PHASES:
+        raise ValueError(f"Unknown phase '{phase}', expected one of: {', '.join(PHASES)}")
+    profiler = Profiler(output_prefix, phase, top_n)
+    profiler.tracemalloc.start()
+    _active = profiler
+    try:
+        if phase is None:
+            profiler.begin()
+        yield profiler
+    finally:
+        if phase is None:
+            profiler.end('run')
+        _active = None
+        profiler.tracemalloc.stop()
+        stats_path, report_path = profiler.write_reports()
+        if stats_path:
+            print(f"\n📊 Profile written to '{stats_path}', hot spots summarised in '{report_path}'")
+
+
+@contextlib.contextmanager
+def phase(name):
+    """Mark one stage of an import: its duration goes to METRICS and --profile-phase can target it."""
+    profiler = _active if _active is not None and _active.phase == name else None
+    start = time.perf_counter()
+    if profiler:
+        profiler.begin()
+    try:
+        yield
+    finally:
+        if profiler:
+            profiler.end(name)
+        METRICS.record_phase(name, time.perf_counter() - start)
@@ -0,0 +1,134 @@
+# progress.py
+
+import json
+import sys
+import time
+
+from config import PROGRESS_INTERVAL, PROGRESS_LOG_INTERVAL
+
+MODES = ('bar', 'json', 'quiet')
+
+_mode = 'bar'
+
+
+def set_progress_mode(mode):
+    """Select how progress is shown: 'bar', 'json' (events on stderr) or 'quiet'; returns the previous mode."""
+    global _mode
+    if mode not in MODES:
+        raise ValueError(f"Unknown progress mode '{mode}', expected one of: {', '.join(MODES)}")
+    previous, _mode = _mode, mode
+    return previous
+
+
+def progress_mode():
+    return _mode
+
+
+def format_duration(seconds):
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}h{minutes:02d}m" if hours else f"{minutes}m{seconds:02d}s" if minutes else f"{seconds}s"
+
+
+class Progress:
+    """Counts work done and hands it to render() at most once per interval.
+
+    Callers update() as often as they like; the cost of output is bounded
+    by the interval, not by the number of cards. Keyword arguments to
+    update() add to named counters (written=1, failed=1, ...).
+    """
+
+    def __init__(self, total, desc, unit='card', interval=PROGRESS_INTERVAL, stream=None):
+        self.total = total
+        self.desc = desc
+        self.unit = unit
+        self.interval = interval
+        self.stream = stream or sys.stderr
+        self.n = 0
+        self.counts = {}
+        self.start = time.perf_counter()
+        self._last = 0.0
+        self._closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @property
+    def rate(self):
+        elapsed = time.perf_counter() - self.start
+        return self.n / elapsed if elapsed > 0 else 0.0
+
+    def update(self, n=1, **counts):
+        self.n += n
+        for key, value in counts.items():
+            self.counts[key] = self.counts.get(key, 0) + value
+        now = time.perf_counter()
+        if now - self._last >= self.interval:
+            self._last = now
+            self.render()
+
+    def close(self):
+        if not self._closed:
+            self._closed = True
+            self.render(final=True)
+
+    def render(self, final=False):
+        pass
+
+
+class BarProgress(Progress):
+    """One status line redrawn in place on a terminal; on a log (not a TTY), a throughput line now and then."""
+
+    def __init__(self, total, desc, unit='card', interval=PROGRESS_INTERVAL, stream=None,
+                 log_interval=PROGRESS_LOG_INTERVAL):
+        super().__init__(total, desc, unit, interval, stream)
+        isatty = getattr(self.stream, 'isatty', None)
+        self.tty = bool(isatty and isatty())
+        if not self.tty:
+            self.interval = log_interval
+        self._width = 0
+
+    def line(self):
+        parts = [f"{self.desc}: {self.n}/{self.total}"]
+        if self.total:
+            parts[0] += f" ({self.n * 100 // self.total}%)"
+        parts += [f"{value} {key}" for key, value in self.counts.items()]
+        rate = self.rate
+        parts.append(f"{rate:.0f} {self.unit}/s")
+        if rate and self.n < self.total:
+            parts.append(f"ETA {format_duration((self.total - self.n) / rate)}")
+        return " · ".join(parts)
+
+    def render(self, final=False):
+        line = self.line()
+        if self.tty:
+            self.stream.write("\r" + line.ljust(self._width) + ("\n" if final else ""))
+            self._width = len(line)
+        else:
+            self.stream.write(line + "\n")
+        self.stream.flush()
+
+
+class JsonProgress(Progress):
+    """Newline-delimited JSON progress events, e.g. for CI dashboards."""
+
+    def render(self, final=False):
+        event = {'event': 'end' if final else 'progress', 'desc': self.desc, 'done': self.n, 'total': self.total,
+                 'rate': round(self.rate, 1), 'ts': round(time.time(), 3), **self.counts}
+        self.stream.write(json.dumps(event, ensure_ascii=False) + "\n")
+        self.stream.flush()
+
+
+class QuietProgress(Progress):
+    """Counts without printing anything."""
+
+
+_RENDERERS = {'bar': BarProgress, 'json': JsonProgress, 'quiet': QuietProgress}
+
+
+def progress_bar(total, desc, unit='card'):
+    """Progress display for the current mode; takes the tqdm arguments perform_import passes."""
+    return _RENDERERS[_mode](total, desc, unit)
@@ -0,0 +1,199 @@
+# records.py
+
+import sys
+from collections.abc import MutableMapping
+from operator import attrgetter, itemgetter
+
+from config import ID_COLUMN, MODEL_COLUMN
+
+# What an absent key's slot holds. Every slot is always set, so reading one
+# never raises, and the hot loops can read slots directly (see column()).
+UNSET = object()
+
+# Tag strings seen so far -> their tags as a tuple of interned strings, shared by every row with that string
+_TAG_SETS = {}
+
+
+def intern_tags(text):
+    tags = _TAG_SETS.get(text)
+    if tags is None:
+        tags = _TAG_SETS[text] = tuple(sys.intern(tag) for tag in text.split())
+    return tags
+
+
+class Record(MutableMapping):
+    """A fixed set of __slots__ that reads and writes like a dict.
+
+    Code written for csv.DictReader rows and note dicts keeps working, and a
+    record compares equal to a dict with the same items. A slot that was
+    not set is a missing key; keys outside FIELDS go to an overflow dict,
+    created only when one is needed.
+
+    A slot holding UNSET is a missing key.
+    """
+
+    __slots__ = ('_extra',)
+    FIELDS = ()
+    KEYS = frozenset()
+
+    def __init__(self, values=(), **kwargs):
+        self._extra = None
+        for key in self.FIELDS:
+            setattr(self, key, UNSET)
+        self.update(values, **kwargs)
+
+    def __getitem__(self, key):
+        if key in self.KEYS:
+            value = getattr(self, key)
+            if value is not UNSET:
+                return value
+        elif self._extra is not None and key in self._extra:
+            return self._extra[key]
+        raise KeyError(key)
+
+    def get(self, key, default=None):
+        if key in self.KEYS:
+            value = getattr(self, key)
+            return default if value is UNSET else value
+        return self._extra.get(key, default) if self._extra is not None else default
+
+    def __contains__(self, key):
+        if key in self.KEYS:
+            return getattr(self, key) is not UNSET
+        return self._extra is not None and key in self._extra
+
+    def __setitem__(self, key, value):
+        if key in self.KEYS:
+            setattr(self, key, value)
+        elif self._extra is None:
+            self._extra = {key: value}
+        else:
+            self._extra[key] = value
+
+    def __delitem__(self, key):
+        if key in self.KEYS and getattr(self, key) is not UNSET:
+            setattr(self, key, UNSET)
+        elif self._extra is not None and key in self._extra:
+            del self._extra[key]
+        else:
+            raise KeyError(key)
+
+    def __iter__(self):
+        for key in self.FIELDS:
+            if getattr(self, key) is not UNSET:
+                yield key
+        if self._extra is not None:
+            yield from self._extra
+
+    def __len__(self):
+        return sum(getattr(self, key) is not UNSET for key in self.FIELDS) + (len(self._extra) if self._extra is not None else 0)
+
+    def __repr__(self):
+        return f"{type(self).__name__}({dict(self)!r})"
+
+    def copy(self):
+        return type(self)(self)
+
+    def replace(self, **changes):
+        """A copy with changes applied, like dict(record, **changes) but still a record."""
+        record = self.copy()
+        record.update(changes)
+        return record
+
+
+def with_fields(note, **changes):
+    """dict(note, **changes) that keeps a record a record."""
+    return note.replace(**changes) if isinstance(note, Record) else dict(note, **changes)
+
+
+ROW_FIELDS = tuple(dict.fromkeys(('Deck', 'Front', 'Back', 'Ref', 'Tags', MODEL_COLUMN, ID_COLUMN)))
+NOTE_FIELDS = ('deck', 'front', 'back', 'ref', 'tags', 'model', 'row_id', 'row', 'update_id', 'replace_id')
+
+
+class Row(Record):
+    """One CSV row; columns outside the import schema go to the overflow dict."""
+
+    __slots__ = ROW_FIELDS
+    FIELDS = ROW_FIELDS
+    KEYS = frozenset(ROW_FIELDS)
+
+
+class Note(Record):
+    """A planned note. deck, model and tags are interned, so the notes of one deck share those strings."""
+
+    __slots__ = NOTE_FIELDS
+    FIELDS = NOTE_FIELDS
+    KEYS = frozenset(NOTE_FIELDS)
+
+    @classmethod
+    def new(cls, deck, front, back, ref, tags, model, row_id, row):
+        note = cls.__new__(cls)
+        note._extra = None
+        note.deck = sys.intern(deck)
+        note.front = front
+        note.back = back
+        note.ref = ref
+        note.tags = intern_tags(tags)
+        note.model = sys.intern(model)
+        note.row_id = row_id
+        note.row = row
+        note.update_id = note.replace_id = UNSET
+        return note
+
+
+def row_parser(header):
+    """Function turning one csv.reader row into a Row, compiled once per header.
+
+    Behaves like csv.DictReader: missing trailing cells are None and surplus
+    cells are collected under the key None. Deck, Tags and Model are interned;
+    Tags also has commas turned into spaces."""
+    header = list(header)
+    # (cell index, slot setter or None for the overflow dict, key or how to intern)
+    setters = []
+    for idx, key in enumerate(header):
+        if key in Row.KEYS:
+            how = 'tags' if key == 'Tags' else 'intern' if key in ('Deck', MODEL_COLUMN) else None
+            setters.append((idx, getattr(Row, key).__set__, how))
+        else:
+            setters.append((idx, None, key))
+    unset = [getattr(Row, key).__set__ for key in Row.FIELDS if key not in header]
+    width = len(header)
+    new = Row.__new__
+
+    def parse(values):
+        if len(values) < width:
+            values = values + [None] * (width - len(values))
+        row = new(Row)
+        row._extra = None
+        for setter in unset:
+            setter(row, UNSET)
+        for idx, setter, how in setters:
+            value = values[idx]
+            if setter is None:
+                row[how] = value
+            elif how is None or value is None:
+                setter(row, value)
+            else:
+                setter(row, sys.intern(value.replace(',', ' ') if how == 'tags' else value))
+        if len(values) > width:
+            row[None] = values[width:]
+        return row
+
+    return parse
+
+
+def column(rows, name, default=UNSET):
+    """The values of one column for every row, for the hot loops.
+
+    Rows are read by slot, which avoids Record.__getitem__; dict rows are
+    read by subscript. Without a default, a missing column raises KeyError."""
+    if name in Row.KEYS and all(type(row) is Row for row in rows):
+        values = list(map(attrgetter(name), rows))
+        if UNSET in values:
+            if default is UNSET:
+                raise KeyError(name)
+            values = [default if value is UNSET else value for value in values]
+        return values
+    if default is not UNSET:
+        return [row.get(name, default) for row in rows]
+    return list(map(itemgetter(name), rows))
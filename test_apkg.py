@@ -0,0 +1,71 @@
+import json
+import sqlite3
+import zipfile
+import pytest
+from apkg import build_apkg, cloze_ordinals, note_guid
+from media import collect_media
+
+@pytest.fixture
+def rows():
+    return [
+        {'Deck': 'Met::Fog', 'Front': 'What is fog?', 'Back': 'Visibility < 1000 m', 'Ref': 'Met 1', 'Tags': 'met fog'},
+        {'Deck': 'Met', 'Front': '{{c1::Radiation}} fog forms on {{c2::clear}} nights, {{c1::radiation}}',
+         'Back': '', 'Ref': '', 'Tags': ''},
+        {'Deck': 'Nav', 'Front': 'Chart', 'Back': '<img src="chart.png">', 'Ref': '', 'Tags': 'nav', 'ID': 'n-1'},
+    ]
+
+def open_package(path, tmp_path):
+    with zipfile.ZipFile(path) as package:
+        package.extractall(tmp_path / "unpacked")
+    return sqlite3.connect(tmp_path / "unpacked" / "collection.anki2")
+
+def test_cloze_ordinals():
+    assert cloze_ordinals("{{c2::a}} {{c1::b}} {{c2::c}}") == [0, 1]
+    assert cloze_ordinals("no deletions") == [0]
+
+def test_note_guid_is_stable():
+    note = {'row_id': None, 'model': 'Basic', 'front': 'Q'}
+    assert note_guid(note) == note_guid(dict(note))
+    assert note_guid(dict(note, row_id='n-1')) != note_guid(note)
+
+def test_build_apkg(tmp_path, rows):
+    (tmp_path / "chart.png").write_bytes(b"png")
+    media = collect_media(rows, str(tmp_path))
+    path = str(tmp_path / "cards.apkg")
+
+    assert build_apkg(rows, path, base_deck='ATPL', media=media) == 3
+
+    db = open_package(path, tmp_path)
+    ver, models, decks = db.execute("SELECT ver, models, decks FROM col").fetchone()
+    assert ver == 11
+    models = {m['name']: m for m in json.loads(models).values()}
+    assert [f['name'] for f in models['Cloze']['flds']] == ['Text', 'Back Extra', 'Ref', 'Tags']
+    assert models['Cloze']['type'] == 1
+    decks = {d['name']: d['id'] for d in json.loads(decks).values()}
+    assert {'Default', 'ATPL', 'ATPL::Met', 'ATPL::Met::Fog', 'ATPL::Nav'} == set(decks)
+
+    notes = {flds.split('\x1f')[0]: (nid, mid, tags, flds)
+             for nid, mid, tags, flds in db.execute("SELECT id, mid, tags, flds FROM notes")}
+    nid, mid, tags, flds = notes['What is fog?']
+    assert mid == models['Basic']['id']
+    assert tags == ' met fog '
+    assert flds.split('\x1f') == ['What is fog?', 'Visibility < 1000 m', 'Met 1', 'met fog']
+
+    cards = db.execute("SELECT nid, did, ord FROM cards ORDER BY nid, ord").fetchall()
+    assert len(cards) == 4
+    cloze_id = notes[rows[1]['Front']][0]
+    assert [(did, ord) for nid, did, ord in cards if nid == cloze_id] == [(decks['ATPL::Met'], 0), (decks['ATPL::Met'], 1)]
+    db.close()
+
+    with zipfile.ZipFile(path) as package:
+        index = json.loads(package.read('media'))
+        assert list(index.values()) == list(media)
+        assert package.read(next(iter(index))) == b"png"
+
+def test_build_apkg_skips_unknown_note_types(tmp_path, rows):
+    rows[0]['Model'] = 'Image Occlusion'
+    path = str(tmp_path / "cards.apkg")
+    assert build_apkg(rows, path) == 2
+    db = open_package(path, tmp_path)
+    assert db.execute("SELECT count(*) FROM notes").fetchone() == (2,)
+    db.close()
@@ -0,0 +1,32 @@
+import bench_cpu
+
+def test_find_regressions_uses_tolerance():
+    baselines = {'a': 1.0, 'b': 1.0}
+    current = {'a': 1.2, 'b': 1.3, 'new': 5.0}
+    assert bench_cpu.find_regressions(current, baselines, tolerance=0.25) == [('b', 1.0, 1.3)]
+
+def test_benchmarks_cover_hot_paths():
+    results = bench_cpu.run_benchmarks(sizes=[20])
+    assert set(results) == {
+        'preview_csv[20]', 'summarize_deck[20]', 'detect_model[20]',
+        'check_deck_prefixes[20]', 'plan_import[20]',
+    }
+    assert all(seconds > 0 for seconds in results.values())
+
+def test_baselines_exist_for_default_sizes():
+    for baselines in bench_cpu.load_baselines(bench_cpu.BASELINES_PATH).values():
+        assert all(f"plan_import[{size}]" in baselines for size in bench_cpu.DEFAULT_SIZES)
+
+def test_other_machines_baselines_get_wide_tolerance():
+    recorded = {'here': {'a': 1.0}, 'there': {'a': 2.0}}
+    assert bench_cpu.pick_baselines(recorded, 'here', 0.25) == ({'a': 1.0}, 0.25, 'here')
+    assert bench_cpu.pick_baselines(recorded, 'elsewhere', 0.25) == ({'a': 1.0}, bench_cpu.CROSS_MACHINE_TOLERANCE, 'here')
+
+def test_update_adds_this_machines_section(tmp_path, monkeypatch):
+    path = tmp_path / "baselines.json"
+    path.write_text('{"there": {"a[1]": 1.0}}')
+    monkeypatch.setattr(bench_cpu, "run_benchmarks", lambda sizes: {'a[1]': 0.5})
+    assert bench_cpu.main(["--baselines", str(path), "--update"]) == 0
+    recorded = bench_cpu.load_baselines(str(path))
+    assert recorded == {'there': {'a[1]': 1.0}, bench_cpu.machine_id(): {'a[1]': 0.5}}
+    assert bench_cpu.main(["--baselines", str(path)]) == 0
@@ -0,0 +1,36 @@
+import pytest
+import utils
+import bench_import
+from cassette import CassettePlayer, CassetteRecorder
+from fake_ankiconnect import FakeAnkiConnect
+
+@pytest.fixture
+def restore_transport():
+    yield
+    utils.set_transport(None)
+
+def test_record_then_replay_offline(tmp_path, monkeypatch, restore_transport):
+    path = str(tmp_path / "run.jsonl.gz")
+    rows = bench_import.make_rows(10)
+
+    with FakeAnkiConnect() as server:
+        server.collection.seed(3)
+        monkeypatch.setattr(utils, "ANKI_CONNECT_URL", server.url)
+        recorder = CassetteRecorder(path, utils.http_transport, url=server.url)
+        utils.set_transport(recorder)
+        utils.import_from_rows(rows, dry_run=False)
+        recorder.close()
+
+    player = CassettePlayer(path, latency_scale=0)
+    utils.set_transport(player)
+    with FakeAnkiConnect() as offline:
+        monkeypatch.setattr(utils, "ANKI_CONNECT_URL", offline.url)
+        utils.import_from_rows(rows, dry_run=False)
+        assert offline.requests == 0
+    assert player.misses == 0
+
+def test_unknown_request_is_an_error(tmp_path, restore_transport):
+    path = str(tmp_path / "empty.jsonl.gz")
+    CassetteRecorder(path, utils.http_transport).close()
+    utils.set_transport(CassettePlayer(path, latency_scale=0))
+    assert utils.anki_request('deckNames')['error'].startswith("cassette has no answer")
@@ -0,0 +1,82 @@
+import json
+import sqlite3
+import zipfile
+import pytest
+import utils
+from apkg import build_apkg
+from collection_reader import CollectionReader, read_existing_index
+
+@pytest.fixture
+def collection(tmp_path):
+    rows = [
+        {'Deck': 'Met', 'Front': 'What is fog?', 'Back': ' Visibility < 1000 m ', 'Ref': '', 'Tags': 'met fog'},
+        {'Deck': 'Met', 'Front': '{{c1::Radiation}} fog', 'Back': 'Extra', 'Ref': '', 'Tags': ''},
+    ]
+    path = str(tmp_path / "cards.apkg")
+    build_apkg(rows, path, base_deck='ATPL')
+    with zipfile.ZipFile(path) as package:
+        package.extract('collection.anki2', tmp_path)
+    return str(tmp_path / "collection.anki2")
+
+def to_notetypes_tables(path):
+    """Move the note types from col.models into the notetypes/fields tables of newer collections."""
+    db = sqlite3.connect(path)
+    models = json.loads(db.execute("SELECT models FROM col").fetchone()[0])
+    db.create_collation('unicase', lambda a, b: (a.lower() > b.lower()) - (a.lower() < b.lower()))
+    db.execute("CREATE TABLE notetypes (id integer primary key, name text not null collate unicase)")
+    db.execute("CREATE UNIQUE INDEX idx_notetypes_name ON notetypes (name)")
+    db.execute("CREATE TABLE fields (ntid integer not null, ord integer not null, name text not null)")
+    for mid, model in models.items():
+        db.execute("INSERT INTO notetypes VALUES (?, ?)", (int(mid), model['name']))
+        db.executemany("INSERT INTO fields VALUES (?, ?, ?)",
+                       [(int(mid), f['ord'], f['name']) for f in reversed(model['flds'])])
+    db.execute("UPDATE col SET models = ''")
+    db.commit()
+    db.close()
+
+def test_reads_index_from_legacy_models(collection):
+    index = read_existing_index(collection)
+    assert set(index) == {'Basic', 'Cloze'}
+    fog = index['Basic']['What is fog?']
+    assert fog['back'] == 'Visibility < 1000 m'
+    assert fog['tags'] == ['met', 'fog']
+    assert index['Cloze']['{{c1::Radiation}} fog']['back'] == 'Extra'
+    assert set(read_existing_index(collection, ['Cloze'])) == {'Cloze'}
+
+def test_reads_index_from_notetypes_tables(collection):
+    to_notetypes_tables(collection)
+    with CollectionReader(collection, copy=True) as reader:
+        assert sorted(name for name, _ in reader.note_types().values()) == ['Basic', 'Cloze']
+        assert reader.existing_index()['Basic']['What is fog?']['back'] == 'Visibility < 1000 m'
+
+def test_reader_is_read_only(collection):
+    with CollectionReader(collection) as reader:
+        with pytest.raises(sqlite3.OperationalError):
+            reader.db.execute("DELETE FROM notes")
+
+def test_plan_import_uses_collection(collection):
+    previous = utils.set_collection(collection)
+    try:
+        rows = [
+            {'Deck': 'Met', 'Front': 'What is fog?', 'Back': 'Visibility < 1000 m', 'Ref': '', 'Tags': 'met fog'},
+            {'Deck': 'Met', 'Front': 'What is mist?', 'Back': 'Visibility >= 1000 m', 'Ref': '', 'Tags': ''},
+        ]
+        # No AnkiConnect is running: the index comes from the file alone
+        plan = utils.plan_import(rows, 'ATPL', existing_decks=['ATPL::Met'])
+    finally:
+        utils.set_collection(previous)
+    assert plan["counts"]["exact"] == 1
+    assert [n["front"] for n in plan["notes"]] == ['What is mist?']
+
+def test_names_come_from_collection(collection, monkeypatch):
+    def closed(payload):
+        raise ConnectionError("Anki is closed")
+
+    monkeypatch.setattr(utils, "_transport", closed)
+    previous = utils.set_collection(collection)
+    try:
+        assert utils.anki_model_exists('Basic') and utils.anki_model_exists('Cloze')
+        assert not utils.anki_model_exists('Missing')
+        assert {'ATPL', 'ATPL::Met'} <= set(utils.get_deck_names())
+    finally:
+        utils.set_collection(previous)
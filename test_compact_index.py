@@ -0,0 +1,71 @@
+import tracemalloc
+import pytest
+import utils
+from compact_index import CompactIndex, forget_note, same_back
+from metrics import METRICS
+from policy import ConflictPolicy
+
+def test_lookup_by_digest():
+    index = CompactIndex([('Q1', 'A1', 11, ['a']), ('Q2', 'A2', 12, []), ('Q1', 'A1 v2', 13, ['b'])])
+    assert len(index) == 2
+    entry = index.get('Q1')
+    assert entry['id'] == 13 and entry['tags'] == ['b']
+    assert same_back(entry, 'A1 v2') and not same_back(entry, 'A1')
+    assert index.get('Q3') is None and 'Q2' in index
+    with pytest.raises(KeyError):
+        index['Q3']
+
+def test_setitem_inserts_and_replaces():
+    index = CompactIndex()
+    index['Q2'] = {'back': 'A2', 'id': 2, 'tags': ['t']}
+    index['Q1'] = {'back': 'A1', 'id': 1, 'tags': []}
+    index['Q2'] = dict(index['Q2'], tags=['u'])
+    assert len(index) == 2
+    assert index['Q2']['tags'] == ['u'] and same_back(index['Q2'], 'A2')
+    assert index['Q1']['id'] == 1
+
+def test_smaller_than_text_index():
+    def notes():
+        # Fresh strings, as decoded from notesInfo
+        for n in range(5000):
+            yield f"Question {n} about a fairly long topic?", f"A reasonably detailed answer number {n}", n, ['tag', 'x']
+
+    def traced(build):
+        tracemalloc.start()
+        try:
+            index = build()
+            return tracemalloc.get_traced_memory()[0], index
+        finally:
+            tracemalloc.stop()
+
+    as_dict, _ = traced(lambda: {front: {'back': back, 'id': nid, 'tags': list(tags)} for front, back, nid, tags in notes()})
+    as_digests, index = traced(lambda: CompactIndex(notes()))
+    assert as_digests * 10 < as_dict
+    assert index.nbytes < 40 * len(index)
+
+def test_conflicts_fetch_back_text_once(server):
+    server.collection.create_deck('D')
+    for n in range(5):
+        server.collection.add('D', 'Basic', {'Front': f'Q{n}', 'Back': f'Old {n}'})
+    rows = [{'Deck': 'D', 'Front': f'Q{n}', 'Back': f'New answer {n}' if n < 2 else f'Old {n}', 'Ref': '', 'Tags': ''}
+            for n in range(5)]
+    index = utils.fetch_existing_index()
+    assert isinstance(index['Basic'], CompactIndex)
+    METRICS.reset()
+
+    plan = utils.plan_import(rows, index=index, existing_decks=['D'])
+    assert plan["counts"]["exact"] == 3
+    assert [c["existing"]["back"] for c in plan["conflicts"]] == ['Old 0', 'Old 1']
+    assert len(METRICS.actions['notesInfo'].samples) == 1
+
+    utils.resolve_conflicts(plan, ConflictPolicy(default='longer'))
+    assert [n.get('update_id') is not None for n in plan["notes"]] == [True, True]
+
+def test_forget_note_by_id():
+    index = CompactIndex([('Q1', 'A1', 11, []), ('Q2', 'A2', 12, [])])
+    forget_note(index, 11)
+    forget_note(index, 99)
+    assert 'Q1' not in index and index['Q2']['id'] == 12 and len(index) == 1
+    plain = {'Q1': {'back': 'A1', 'id': 11}}
+    forget_note(plain, 11)
+    assert plain == {}
@@ -0,0 +1,44 @@
+import pytest
+from unittest.mock import MagicMock
+import utils
+from policy import ConflictPolicy
+
+@pytest.fixture
+def anki_notes():
+    return [{"modelName": "Basic", "fields": {"Front": {"value": "Question 1"}, "Back": {"value": "Old"}}, "noteId": 1}]
+
+@pytest.fixture
+def anki_decks():
+    return ["Default"]
+
+def test_first_matching_rule_wins():
+    policy = ConflictPolicy([
+        {'deck': 'ATPL::Meteo*', 'action': 'replace'},
+        {'tag': 'draft', 'action': 'skip'},
+    ], default='add')
+    assert policy.action_for('ATPL::Meteorology', ['draft']) == 'replace'
+    assert policy.action_for('ATPL::Law', ['draft']) == 'skip'
+    assert policy.action_for('ATPL::Law', []) == 'add'
+
+def test_unknown_action_rejected():
+    with pytest.raises(ValueError):
+        ConflictPolicy(default='merge')
+
+def test_keep_longer_back():
+    policy = ConflictPolicy(default='longer')
+    note = {'deck': 'D', 'tags': [], 'back': 'Longer answer'}
+    assert policy.resolve(note, {'id': 7, 'back': 'Short'}) == ('update', dict(note, update_id=7))
+    assert policy.resolve(note, {'id': 7, 'back': 'A much longer answer'}) == ('skip', None)
+
+@pytest.mark.parametrize("default, expected", [
+    ('replace', ['deleteNotes', 'addNote']),
+    ('update', ['updateNoteFields']),
+    ('skip', []),
+])
+def test_policy_resolves_without_prompting(anki_post, monkeypatch, default, expected):
+    monkeypatch.setattr(utils, "get_single_key", MagicMock(side_effect=AssertionError("prompted")))
+    rows = [{'Deck': 'Test', 'Front': 'Question 1', 'Back': 'New', 'Ref': '', 'Tags': ''}]
+    utils.import_from_rows(rows, dry_run=False, policy=ConflictPolicy(default=default))
+    actions = [c[1]["json"]["action"] for c in anki_post.call_args_list]
+    writes = [a for a in actions if a not in ('findNotes', 'notesInfo', 'deckNames', 'createDeck')]
+    assert writes == expected
@@ -0,0 +1,71 @@
+import hashlib
+import json
+import time
+import pytest
+import requests
+from daemon import ImportDaemon, submit_and_follow
+
+@pytest.fixture
+def daemon(server):
+    with ImportDaemon(base_deck="Daemon", port=0) as daemon:
+        yield daemon
+
+@pytest.fixture
+def csv_path(tmp_path):
+    path = tmp_path / "cards.csv"
+    path.write_text("Deck,Front,Back,Ref,Tags\nTest,Q1,A1,R1,t1\nTest,Q2,A2,R2,t2\n", encoding="utf-8")
+    return str(path)
+
+def test_jobs_share_warm_index(daemon, server, csv_path):
+    final = submit_and_follow(daemon.url, csv_path)
+    assert final['event'] == 'done'
+    assert final['result']['written'] == 2
+    assert "Daemon::Test" in server.collection.decks
+    assert daemon.status()['index_warm'] is True
+
+    requests_before = server.requests
+    final = submit_and_follow(daemon.url, csv_path)
+    assert final['result']['exact'] == 2
+    # No index download, capability check or deck listing for the second job
+    assert server.requests == requests_before
+
+def test_event_stream(daemon, csv_path):
+    job = requests.post(f"{daemon.url}/jobs", json={'path': csv_path}).json()
+    lines = requests.get(f"{daemon.url}/jobs/{job['id']}/events").text.splitlines()
+    events = [json.loads(line)['event'] for line in lines]
+    assert events == ['queued', 'started', 'planned', 'written', 'written', 'done']
+    assert requests.get(f"{daemon.url}/jobs/{job['id']}").json()['status'] == 'done'
+
+def test_rows_job_and_failures(daemon, server):
+    rows = [{'Deck': 'Inline', 'Front': 'Q', 'Back': 'A', 'Ref': 'R', 'Tags': ''}]
+    job = daemon.submit({'rows': rows})
+    assert list(job.follow())[-1]['event'] == 'done'
+    assert any(n['fields']['Front'] == 'Q' for n in server.collection.notes.values())
+
+    missing = daemon.submit({'path': '/does/not/exist.csv'})
+    assert list(missing.follow())[-1]['event'] == 'failed'
+    assert requests.post(f"{daemon.url}/jobs", json={}).status_code == 400
+    assert requests.get(f"{daemon.url}/jobs/99").status_code == 404
+
+def test_job_uploads_media(daemon, server, tmp_path):
+    (tmp_path / "wing.png").write_bytes(b"wing")
+    path = tmp_path / "media.csv"
+    path.write_text('Deck,Front,Back,Ref,Tags\nTest,Wing,"<img src=""wing.png"">",,\n', encoding="utf-8")
+    final = submit_and_follow(daemon.url, str(path))
+    assert final['event'] == 'done'
+    name = f'{hashlib.sha1(b"wing").hexdigest()}.png'
+    assert server.collection.media[name] == b"wing"
+    assert any(n['fields']['Back'] == f'<img src="{name}">' for n in server.collection.notes.values())
+
+def test_finished_jobs_are_pruned(server, csv_path):
+    with ImportDaemon(port=0, keep_jobs=2, job_ttl=60) as daemon:
+        jobs = [daemon.submit({'path': csv_path}) for _ in range(4)]
+        for job in jobs:
+            list(job.follow())
+        daemon.prune()
+        assert sorted(daemon.jobs) == [jobs[2].id, jobs[3].id]
+        assert jobs[3].metrics['counts'].get('written', 0) == 0 and 'addNote' not in jobs[3].metrics['actions']
+        assert jobs[0].metrics['counts']['written'] == 2
+
+        daemon.prune(now=time.time() + 61)
+        assert daemon.jobs == {}
@@ -0,0 +1,36 @@
+import csv
+import utils
+from export import export_deck, search_term
+from metrics import METRICS
+
+def read_csv(path):
+    with open(path, newline='', encoding='utf-8') as f:
+        return list(csv.DictReader(f))
+
+def test_search_term():
+    assert search_term('ATPL::Met_Fog*') == 'ATPL::Met\\_Fog\\*'
+
+def test_export_round_trip(tmp_path, server):
+    rows = [{'Deck': f'Sub {n % 3}', 'Front': f'Q{n}' if n % 4 else f'{{{{c1::T{n}}}}}', 'Back': f'A{n}',
+             'Ref': f'R{n}', 'Tags': f't{n % 2} x'} for n in range(250)]
+    utils.import_from_rows(rows, base_deck='ATPL')
+    server.collection.create_deck('Other')
+    server.collection.add('Other', 'Basic', {'Front': 'Elsewhere', 'Back': 'B'})
+    METRICS.reset()
+
+    path = str(tmp_path / "export.csv")
+    assert export_deck('ATPL', path, base_deck='ATPL', page_size=40) == 250
+    # Three subdecks: 84 + 83 + 83 notes in pages of 40
+    assert len(METRICS.actions['notesInfo'].samples) == 9
+
+    exported = read_csv(path)
+    assert {r['Front'] for r in exported} == {r['Front'] for r in rows}
+    first = next(r for r in exported if r['Front'] == 'Q1')
+    assert first == {'Deck': 'Sub 1', 'Front': 'Q1', 'Back': 'A1', 'Ref': 'R1', 'Tags': 't1 x', 'Model': ''}
+
+    # Importing the export again changes nothing
+    plan = utils.plan_import(exported, 'ATPL')
+    assert not plan["notes"] and not plan["conflicts"] and not plan["tag_changes"]
+
+def test_export_unknown_deck(tmp_path, server):
+    assert export_deck('Nope', str(tmp_path / "x.csv")) == 0
@@ -0,0 +1,23 @@
+import utils
+import bench_import
+
+def test_import_round_trip(server):
+    rows = bench_import.make_rows(30)
+    utils.import_from_rows(rows, base_deck="Test", dry_run=False)
+    assert len(server.collection.notes) == 30
+    assert "Test::Bench::Deck 3" in server.collection.decks
+
+    utils.import_from_rows(rows, base_deck="Test", dry_run=False)
+    assert len(server.collection.notes) == 30
+
+def test_existing_index_from_seeded_collection(server):
+    server.collection.seed(5)
+    existing = utils.get_all_existing_fronts_by_model("Basic")
+    assert existing["Seed question 4"]["back"] == "Seed answer 4"
+    assert utils.check_ankiconnect() is True
+
+def test_benchmark_case_reports_throughput(monkeypatch):
+    monkeypatch.setattr(utils, "ANKI_CONNECT_URL", utils.ANKI_CONNECT_URL)
+    result = bench_import.run_case(20, existing=10)
+    assert result['imported'] == 20
+    assert result['cards_per_s'] > 0
@@ -0,0 +1,47 @@
+import json
+import pytest
+import bench_import
+from fake_ankiconnect import FakeAnkiConnect
+from fanout import fanout_import, parse_targets, target_path
+from import_log import read_log, run_log
+
+@pytest.fixture
+def servers():
+    with FakeAnkiConnect() as alice, FakeAnkiConnect() as bob:
+        yield alice, bob
+
+def test_parse_targets():
+    assert parse_targets(["a=http://x:1", "b"], known={"b": "http://y:2"}) == {"a": "http://x:1", "b": "http://y:2"}
+    with pytest.raises(ValueError):
+        parse_targets(["c"], known={})
+    with pytest.raises(ValueError):
+        parse_targets(["a=http://x:1", "a=http://x:2"])
+    assert target_path("anki_id_map.json", "bob") == "anki_id_map.bob.json"
+
+def test_each_target_gets_its_own_index_and_report(tmp_path, servers):
+    alice, bob = servers
+    rows = bench_import.make_rows(30)
+    bob.collection.create_deck("Bench::Deck 0")
+    bob.collection.add("Bench::Deck 0", "Basic", {"Front": "Question 1?", "Back": "Answer 1"})
+    targets = {"alice": alice.url, "bob": bob.url, "down": "http://127.0.0.1:9"}
+    report = str(tmp_path / "report.json")
+    id_map = str(tmp_path / "ids.json")
+
+    with run_log(str(tmp_path / "log.jsonl")):
+        results = fanout_import(rows, targets, id_map_path=id_map, report_path=report)
+
+    assert len(alice.collection.notes) == 30
+    assert len(bob.collection.notes) == 30
+    assert results["alice"]["plan"]["add"] == 30
+    assert results["bob"]["plan"]["retag"] == 1
+    assert "Connection" in results["down"]["error"]
+    assert results["down"]["ok"] is False
+
+    bob_report = json.load(open(target_path(report, "bob"), encoding="utf-8"))
+    assert bob_report["target"] == "bob"
+    assert bob_report["counts"]["written"] == 29
+    assert bob_report["actions"]["addNote"]["count"] == 29
+    assert json.load(open(target_path(report, "down"), encoding="utf-8"))["error"]
+
+    targets_logged = {r.get("target") for r in read_log(str(tmp_path / "log.jsonl"), action="add")}
+    assert targets_logged == {"alice", "bob"}
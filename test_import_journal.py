@@ -0,0 +1,67 @@
+import functools
+import pytest
+import utils
+from journal import ImportJournal, load_journal, rows_fingerprint
+from metrics import METRICS
+
+@pytest.fixture
+def sample_rows():
+    return [
+        {'Deck': 'Test', 'Front': 'Question 1', 'Back': 'Answer 1', 'Ref': 'Ref1', 'Tags': 'tag1'},
+        {'Deck': 'Test', 'Front': 'Question 2', 'Back': 'Answer 2', 'Ref': 'Ref2', 'Tags': 'tag2'},
+        {'Deck': 'Test', 'Front': 'Question 3', 'Back': 'Answer 3', 'Ref': 'Ref3', 'Tags': 'tag3'}
+    ]
+
+def test_journal_ignores_torn_batch(tmp_path):
+    path = tmp_path / "journal.jsonl"
+    with ImportJournal(str(path), "abc", batch_size=2) as journal:
+        journal.record(1, 101)
+        journal.record(2, 102)
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('{"rows": [[3, 1')
+
+    assert load_journal(str(path), "abc") == {1: 101, 2: 102}
+    assert load_journal(str(path), "other") == {}
+
+    with ImportJournal(str(path), "abc", resume=True) as journal:
+        journal.record(3, 103)
+    assert load_journal(str(path), "abc") == {1: 101, 2: 102, 3: 103}
+
+def test_resume_skips_committed_rows(tmp_path, sample_rows, anki_post):
+    path = str(tmp_path / "journal.jsonl")
+    utils.import_from_rows(sample_rows[:2], dry_run=False, journal_path=path)
+    assert load_journal(path) == {1: 100, 2: 101}
+
+    anki_post.reset_mock()
+    utils.import_from_rows(sample_rows[:2], dry_run=False, journal_path=path, resume=True)
+    actions = [c[1]["json"]["action"] for c in anki_post.call_args_list]
+    assert actions == []
+
+def test_fingerprint_covers_import_columns_only():
+    row = {'Deck': 'D', 'Front': 'Q', 'Back': 'A', 'Ref': '', 'Tags': 't', 'Notes': 'x', None: ['surplus']}
+    fingerprint = rows_fingerprint([row])
+    assert rows_fingerprint([dict(row, Notes='y')]) == fingerprint
+    assert rows_fingerprint([dict(row, Back='B')]) != fingerprint
+    assert rows_fingerprint([{'Tags': 't', 'Ref': '', 'Back': 'A', 'Front': 'Q', 'Deck': 'D'}]) == fingerprint
+
+def test_resume_applies_saved_plan(tmp_path, server, monkeypatch):
+    monkeypatch.setattr(utils, "ImportJournal", functools.partial(ImportJournal, batch_size=2))
+    path = str(tmp_path / "journal.jsonl")
+    rows = [{'Deck': 'Test', 'Front': f'Q{n}', 'Back': f'A{n}', 'Ref': '', 'Tags': ''} for n in range(1, 6)]
+    rows[2]['Front'] = 'Q3 "*_\\'
+    utils.import_from_rows(rows, dry_run=False, journal_path=path)
+    # Crash after row 3 was written: rows 1-2 were flushed, row 3 was still buffered
+    with open(path, encoding="utf-8") as f:
+        lines = f.readlines()
+    with open(path, "w", encoding="utf-8") as f:
+        f.writelines(lines[:2])
+    for note_id, note in list(server.collection.notes.items()):
+        if note['fields']['Front'] in ('Q4', 'Q5'):
+            del server.collection.notes[note_id]
+
+    METRICS.reset()
+    utils.import_from_rows(rows, dry_run=False, journal_path=path, resume=True)
+    assert {action: len(h.samples) for action, h in METRICS.actions.items()} == \
+        {'findNotes': 1, 'notesInfo': 1, 'addNote': 2}
+    assert sorted(n['fields']['Front'] for n in server.collection.notes.values()) == ['Q1', 'Q2', 'Q3 "*_\\', 'Q4', 'Q5']
+    assert sorted(load_journal(path)) == [1, 2, 3, 4, 5]
@@ -0,0 +1,59 @@
+import pytest
+from unittest.mock import MagicMock
+import utils
+import import_log
+
+@pytest.fixture
+def sample_rows():
+    return [
+        {'Deck': 'Test', 'Front': 'Question 1', 'Back': 'Answer 1', 'Ref': 'Ref1', 'Tags': 'tag1'},
+        {'Deck': 'Test', 'Front': 'Question 2', 'Back': 'Answer 2', 'Ref': 'Ref2', 'Tags': 'tag2'},
+    ]
+
+@pytest.fixture
+def mock_requests(monkeypatch):
+    def fake_post(url, json=None, **kwargs):
+        mock = MagicMock()
+        action = json.get("action") if json else None
+        if action == "addNote" and json["params"]["note"]["fields"]["Front"] == "Question 2":
+            mock.json.return_value = {"result": None, "error": "cannot create note because it is empty"}
+        else:
+            mock.json.return_value = {"result": [] if action in ("findNotes", "deckNames") else 1, "error": None}
+        return mock
+
+    monkeypatch.setattr("requests.post", MagicMock(side_effect=fake_post))
+
+def test_failures_are_logged_and_queryable(tmp_path, sample_rows, mock_requests):
+    path = str(tmp_path / "import.jsonl")
+    with import_log.run_log(path) as log:
+        import_log.set_source("cards.csv")
+        utils.import_from_rows(sample_rows, dry_run=False)
+        assert log.errors == 1
+
+    records = list(import_log.read_log(path))
+    assert [(r['row'], r['action'], r['error'] is None) for r in records] == [(1, 'add', True), (2, 'add', False)]
+    assert records[1]['front'] == import_log.front_digest("Question 2")
+    assert records[1]['latency_ms'] >= 0
+    assert import_log.failed_rows(path) == {"cards.csv": [2]}
+
+def test_each_run_rotates_the_log(tmp_path):
+    path = str(tmp_path / "import.jsonl")
+    for run in range(4):
+        with import_log.run_log(path):
+            import_log.log_event('add', row=run)
+    assert [r['row'] for r in import_log.read_log(path)] == [3]
+    assert [r['row'] for r in import_log.read_log(f"{path}.3")] == [0]
+
+def test_run_without_records_keeps_the_last_log(tmp_path):
+    path = str(tmp_path / "import.jsonl")
+    with import_log.run_log(path):
+        import_log.set_source("cards.csv")
+        import_log.log_event('add', row=2, error="boom")
+    with import_log.run_log(path):
+        pass
+    assert import_log.failed_rows(path) == {"cards.csv": [2]}
+    assert not (tmp_path / "import.jsonl.1").exists()
+
+def test_retry_only_plans_failed_rows(sample_rows, mock_requests):
+    plan = utils.plan_import(sample_rows, index={"Basic": {}, "Cloze": {}}, only_rows={2})
+    assert [n["row"] for n in plan["notes"]] == [2]
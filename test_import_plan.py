@@ -0,0 +1,59 @@
+import pytest
+import utils
+
+@pytest.fixture
+def sample_rows():
+    return [
+        {'Deck': 'Test', 'Front': 'Question 1', 'Back': 'Answer 1', 'Ref': 'Ref1', 'Tags': 'tag1'},
+        {'Deck': 'Test', 'Front': 'Question 2', 'Back': 'Answer 2', 'Ref': 'Ref2', 'Tags': 'tag2'},
+        {'Deck': 'Other', 'Front': 'Question 3', 'Back': 'Changed', 'Ref': 'Ref3', 'Tags': 'tag3'}
+    ]
+
+@pytest.fixture
+def index():
+    return {
+        "Basic": {"Question 2": {"back": "Answer 2", "id": 2}, "Question 3": {"back": "Answer 3", "id": 3}},
+        "Cloze": {}
+    }
+
+@pytest.fixture
+def anki_decks():
+    return ["Default", "Test::Other"]
+
+def test_plan_is_read_only(sample_rows, index, anki_post):
+    plan = utils.plan_import(sample_rows, "Test", index=index)
+    actions = [c[1]["json"]["action"] for c in anki_post.call_args_list]
+    assert actions == ["deckNames"]
+    assert plan["decks"] == ["Test::Test"]
+    assert [n["front"] for n in plan["notes"]] == ["Question 1"]
+    assert plan["conflicts"][0]["existing"] == {"id": 3, "back": "Answer 3"}
+
+def test_saved_plan_round_trip(tmp_path, sample_rows, index, anki_post):
+    plan = utils.plan_import(sample_rows, "Test", index=index)
+    assert utils.resolve_conflicts(plan)
+    path = str(tmp_path / "plan.json")
+    utils.save_plan(plan, path)
+
+    loaded = utils.load_plan(path)
+    assert loaded["counts"]["add"] == 2
+    assert loaded["counts"]["exact"] == 1
+
+    anki_post.reset_mock()
+    utils.apply_plan(loaded)
+    actions = [c[1]["json"]["action"] for c in anki_post.call_args_list]
+    assert actions == ["createDeck", "addNote", "addNote"]
+
+def test_dry_run_plan_is_applied_as_answered(sample_rows, index, anki_post, monkeypatch, tmp_path):
+    monkeypatch.setattr(utils, "fetch_existing_index", lambda *a, **k: index)
+    monkeypatch.setattr(utils, "get_single_key", lambda *a, **k: 'n')
+    plan = utils.import_from_rows(sample_rows, "Test", dry_run=True)
+    assert [n["front"] for n in plan["notes"]] == ["Question 1"]
+
+    def replan(*args, **kwargs):
+        raise AssertionError("the dry run's plan should be reused")
+
+    monkeypatch.setattr(utils, "plan_import", replan)
+    anki_post.reset_mock()
+    utils.import_from_rows(sample_rows, "Test", plan=plan)
+    actions = [c[1]["json"]["action"] for c in anki_post.call_args_list]
+    assert actions == ["createDeck", "addNote"]
@@ -0,0 +1,42 @@
+import hashlib
+import pytest
+from media import collect_media, find_media, media_uploads
+
+@pytest.fixture
+def media_dir(tmp_path):
+    (tmp_path / "img").mkdir()
+    (tmp_path / "img" / "wing.png").write_bytes(b"wing")
+    (tmp_path / "img" / "copy.png").write_bytes(b"wing")
+    (tmp_path / "engine.mp3").write_bytes(b"engine")
+    return tmp_path
+
+def test_find_media():
+    text = '<img src="a.png"> <IMG alt=x src=b.jpg> [sound:c.mp3] <img src=\'https://x/d.png\'>'
+    assert find_media(text) == ['a.png', 'b.jpg', 'c.mp3', 'https://x/d.png']
+
+def test_collect_media_rewrites_local_references(media_dir):
+    rows = [
+        {'Front': 'Q [sound:engine.mp3]', 'Back': '<img src="img/wing.png"><img src="img/copy.png">', 'Ref': ''},
+        {'Front': 'Q2', 'Back': '<img src="missing.png"> <img src="http://x/y.png">', 'Ref': '<img src="img/wing.png">'},
+    ]
+    files = collect_media(rows, str(media_dir))
+
+    wing, engine = hashlib.sha1(b"wing").hexdigest(), hashlib.sha1(b"engine").hexdigest()
+    # wing.png and copy.png hold the same bytes, so they are one file in Anki
+    assert sorted(files) == sorted([f'{wing}.png', f'{engine}.mp3'])
+    assert files[f'{wing}.png'] in (str(media_dir / "img" / "wing.png"), str(media_dir / "img" / "copy.png"))
+    assert rows[0]['Front'] == f'Q [sound:{engine}.mp3]'
+    assert rows[0]['Back'] == f'<img src="{wing}.png"><img src="{wing}.png">'
+    assert rows[1]['Ref'] == f'<img src="{wing}.png">'
+    assert rows[1]['Back'] == '<img src="missing.png"> <img src="http://x/y.png">'
+
+def test_uploads_only_missing_files(media_dir, server):
+    rows = [{'Front': 'Q', 'Back': '<img src="img/wing.png"> [sound:engine.mp3]', 'Ref': ''}]
+    files = collect_media(rows, str(media_dir))
+    wing = f'{hashlib.sha1(b"wing").hexdigest()}.png'
+    server.collection.media[wing] = b"wing"
+
+    with media_uploads(files, workers=2) as uploader:
+        pass
+    assert (uploader.uploaded, uploader.failed) == (1, 0)
+    assert set(server.collection.media) == set(files)
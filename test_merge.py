@@ -0,0 +1,89 @@
+import json
+import pytest
+from merge import Snapshot, classify, load_merge_policy, merge_import, note_key
+
+def make_rows():
+    return [{'Deck': 'Met', 'Front': f'Q{n}', 'Back': f'A{n}', 'Ref': '', 'Tags': ''} for n in range(5)]
+
+def note_for(server, front):
+    return next(n for n in server.collection.notes.values() if n['fields']['Front'] == front)
+
+def test_classify():
+    assert classify('a', 'a', 'a') == 'unchanged'
+    assert classify('b', 'a', 'a') == 'source-changed'
+    assert classify('a', 'a', 'b') == 'anki-changed'
+    assert classify('b', 'a', 'c') == 'both-changed'
+    assert classify('b', 'a', 'b') == 'unchanged'
+    assert classify('a', 'a', None) == 'deleted'
+
+def test_load_merge_policy(tmp_path):
+    path = tmp_path / "merge.json"
+    path.write_text(json.dumps({'both-changed': 'source'}))
+    assert load_merge_policy(str(path))['both-changed'] == 'source'
+    path.write_text(json.dumps({'both-changed': 'theirs'}))
+    with pytest.raises(ValueError):
+        load_merge_policy(str(path))
+
+def test_merge_keeps_anki_edits(tmp_path, server):
+    snapshot_path = str(tmp_path / "cards_snapshot.json")
+    rows = make_rows()
+    merge_import(rows, 'ATPL', snapshot_path)
+    assert len(server.collection.notes) == 5
+    assert len(Snapshot(snapshot_path).entries) == 5
+
+    # Edited in Anki: Q1 and Q2; edited in the CSV: Q0 and Q2; deleted in Anki: Q3
+    note_for(server, 'Q1')['fields']['Back'] = 'A1 fixed in Anki'
+    note_for(server, 'Q2')['fields']['Back'] = 'A2 fixed in Anki'
+    server.collection.notes.pop(note_for(server, 'Q3')['noteId'])
+    rows[0]['Back'] = 'A0 v2'
+    rows[2]['Back'] = 'A2 v2'
+    rows.append({'Deck': 'Met', 'Front': 'Q5', 'Back': 'A5', 'Ref': '', 'Tags': ''})
+
+    plan = merge_import(rows, 'ATPL', snapshot_path)
+    assert plan["merge"] == {'unchanged': 1, 'source-changed': 1, 'anki-changed': 1, 'both-changed': 1, 'deleted': 1}
+    assert note_for(server, 'Q0')['fields']['Back'] == 'A0 v2'
+    assert note_for(server, 'Q1')['fields']['Back'] == 'A1 fixed in Anki'
+    assert note_for(server, 'Q2')['fields']['Back'] == 'A2 fixed in Anki'
+    assert not any(n['fields']['Front'] == 'Q3' for n in server.collection.notes.values())
+    assert note_for(server, 'Q5')['fields']['Back'] == 'A5'
+    assert len(Snapshot(snapshot_path).entries) == 6
+
+def test_merge_policy_source_wins(tmp_path, server):
+    snapshot_path = str(tmp_path / "cards_snapshot.json")
+    rows = make_rows()
+    merge_import(rows, 'ATPL', snapshot_path)
+    note_for(server, 'Q1')['fields']['Back'] = 'A1 fixed in Anki'
+    server.collection.notes.pop(note_for(server, 'Q3')['noteId'])
+    rows[1]['Back'] = 'A1 v2'
+
+    policy = dict(load_merge_policy(), **{'both-changed': 'source', 'deleted': 'source'})
+    plan = merge_import(rows, 'ATPL', snapshot_path, policy)
+    assert plan["merge"]["both-changed"] == 1 and plan["merge"]["deleted"] == 1
+    assert note_for(server, 'Q1')['fields']['Back'] == 'A1 v2'
+    q3 = note_for(server, 'Q3')
+    assert Snapshot(snapshot_path).get(note_key({'row_id': None, 'model': 'Basic', 'front': 'Q3'}))[0] == q3['noteId']
+
+def test_merge_adopts_notes_already_in_anki(tmp_path, server):
+    server.collection.create_deck('ATPL::Met')
+    server.collection.add('ATPL::Met', 'Basic', {'Front': 'Q0', 'Back': 'A0'})
+    snapshot_path = str(tmp_path / "cards_snapshot.json")
+    plan = merge_import(make_rows(), 'ATPL', snapshot_path, dry_run=True)
+    assert len(plan["notes"]) == 4
+
+    merge_import(make_rows(), 'ATPL', snapshot_path)
+    assert len(server.collection.notes) == 5
+    assert len(Snapshot(snapshot_path).entries) == 5
+
+def test_merge_syncs_tags_of_snapshot_rows(tmp_path, server):
+    snapshot_path = str(tmp_path / "cards_snapshot.json")
+    rows = [dict(row, Tags='met old') for row in make_rows()]
+    merge_import(rows, 'ATPL', snapshot_path)
+    note_for(server, 'Q0')['tags'].append('leech')
+
+    plan = merge_import([dict(row, Tags='met new') for row in rows], 'ATPL', snapshot_path)
+    assert plan["merge"] == {'unchanged': 5}
+    assert len(plan["tag_changes"]) == 5
+    assert sorted(note_for(server, 'Q0')['tags']) == ['leech', 'met', 'new']
+    assert sorted(note_for(server, 'Q1')['tags']) == ['met', 'new']
+    key = note_key({'row_id': None, 'model': 'Basic', 'front': 'Q1'})
+    assert Snapshot(snapshot_path).get(key)[2] == ['met', 'new']
@@ -0,0 +1,31 @@
+import json
+import utils
+from metrics import METRICS, LatencyHistogram, write_run_report
+
+def test_histogram_percentiles():
+    histogram = LatencyHistogram()
+    for ms in range(1, 101):
+        histogram.record(ms / 1000)
+    summary = histogram.summary()
+    assert summary['count'] == 100
+    assert summary['p50_ms'] == 50.0
+    assert summary['p95_ms'] == 95.0
+    assert summary['p99_ms'] == 99.0
+    assert sum(summary['buckets'].values()) == 100
+
+def test_actions_timed_into_run_report(tmp_path, anki_post):
+    METRICS.reset()
+    utils.anki_model_exists("Basic")
+    utils.create_deck("Test")
+    METRICS.count('written', 3)
+
+    report_path = tmp_path / "report.json"
+    history_path = tmp_path / "history.jsonl"
+    write_run_report(str(report_path), str(history_path), source="cards.csv")
+    report = json.loads(report_path.read_text(encoding="utf-8"))
+
+    assert set(report['actions']) == {'modelNames', 'createDeck'}
+    assert report['actions']['createDeck']['count'] == 1
+    assert report['counts'] == {'written': 3}
+    assert report['source'] == "cards.csv"
+    assert len(history_path.read_text(encoding="utf-8").splitlines()) == 1
@@ -0,0 +1,52 @@
+import pytest
+import utils
+from fake_ankiconnect import FAKE_MODELS, FakeCollection
+from metrics import METRICS
+from note_types import REGISTRY, NoteType, load_note_types
+
+@pytest.fixture
+def fake_collection():
+    return FakeCollection(dict(FAKE_MODELS, **{"ATPL Question": ["Question", "Answer", "Source", "Explanation"]}))
+
+@pytest.fixture
+def server(server):
+    REGISTRY.configure({"ATPL Question": {"Back": "Answer", "Ref": "Source", "Tags": None}})
+    yield server
+    REGISTRY.configure()
+
+def test_compiled_fallbacks():
+    note_type = NoteType("Custom", {}, ["Prompt", "Reply", "Ref"])
+    assert note_type.mapping == {'Front': 'Prompt', 'Back': 'Reply', 'Ref': 'Ref'}
+    assert note_type.build_fields("Q", "A", "R", ["t"]) == {'Prompt': 'Q', 'Reply': 'A', 'Ref': 'R'}
+    assert NoteType("Basic", {'Front': 'Front', 'Back': 'Back', 'Ref': None, 'Tags': None}).mapping == \
+        {'Front': 'Front', 'Back': 'Back'}
+
+def test_load_note_types_rejects_unknown_columns(tmp_path):
+    path = tmp_path / "types.json"
+    path.write_text('{"ATPL": {"Question": "Front"}}', encoding="utf-8")
+    with pytest.raises(ValueError):
+        load_note_types(str(path))
+
+def test_import_into_custom_note_type(server):
+    METRICS.reset()
+    rows = [{'Deck': 'Test', 'Front': f'Q{n}', 'Back': f'A{n}', 'Ref': 'R', 'Tags': 't', 'Model': 'ATPL Question'}
+            for n in range(20)]
+    rows.append({'Deck': 'Test', 'Front': 'Plain', 'Back': 'B', 'Ref': 'R', 'Tags': 't', 'Model': ''})
+    utils.import_from_rows(rows)
+
+    notes = {n['fields'].get('Question') or n['fields'].get('Front'): n for n in server.collection.notes.values()}
+    assert notes['Q3']['modelName'] == 'ATPL Question'
+    assert notes['Q3']['fields'] == {'Question': 'Q3', 'Answer': 'A3', 'Source': 'R', 'Explanation': ''}
+    assert notes['Plain']['modelName'] == 'Basic'
+    # The custom type's schema is fetched once, not per card
+    assert len(METRICS.actions['modelFieldNames'].samples) == 1
+
+    plan = utils.plan_import(rows)
+    assert plan["counts"]["exact"] == 21
+
+def test_unknown_model_fails_fast(server):
+    METRICS.reset()
+    rows = [{'Deck': 'Test', 'Front': f'Q{n}', 'Back': 'A', 'Ref': '', 'Tags': '', 'Model': 'Nope'} for n in range(5)]
+    plan = utils.plan_import(rows)
+    assert plan["counts"]["errors"] == 5
+    assert len(METRICS.actions['modelFieldNames'].samples) == 1
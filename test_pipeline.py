@@ -0,0 +1,69 @@
+import threading
+import pytest
+import utils
+import pipeline
+
+@pytest.fixture
+def sample_rows():
+    return [
+        {'Deck': 'Test', 'Front': 'Question 1', 'Back': 'New answer', 'Ref': 'Ref1', 'Tags': 'tag1'},
+        {'Deck': 'Test', 'Front': 'Question 2', 'Back': 'Answer 2', 'Ref': 'Ref2', 'Tags': 'tag2'},
+    ]
+
+@pytest.fixture
+def anki_notes():
+    return [{"modelName": "Basic", "fields": {"Front": {"value": "Question 1"}, "Back": {"value": "Old answer"}},
+             "noteId": 1}]
+
+@pytest.fixture
+def added(anki_post):
+    """Set once the first addNote has been posted."""
+    event = threading.Event()
+    post = anki_post.side_effect
+
+    def watch(url, json=None, **kwargs):
+        if json["action"] == "addNote":
+            event.set()
+        return post(url, json=json, **kwargs)
+
+    anki_post.side_effect = watch
+    return event
+
+def test_new_cards_written_before_duplicate_is_answered(sample_rows, anki_post, added, monkeypatch):
+
+    def answer(prompt, valid_keys):
+        assert added.wait(timeout=5), "non-conflicting card was not written while prompting"
+        return 'r'
+
+    monkeypatch.setattr(utils, "get_single_key", answer)
+    pipeline.pipelined_import(sample_rows, "Test")
+
+    actions = [c[1]["json"]["action"] for c in anki_post.call_args_list]
+    writes = [a for a in actions if a not in ('findNotes', 'notesInfo', 'deckNames')]
+    assert writes == ["createDeck", "addNote", "deleteNotes", "addNote"]
+
+def test_writer_keeps_going_after_a_failed_note(monkeypatch):
+    def create_deck(deck):
+        if deck == 'Broken':
+            raise ConnectionError("reset by peer")
+
+    written = []
+    monkeypatch.setattr(pipeline, "create_deck", create_deck)
+    monkeypatch.setattr(pipeline, "import_note", lambda idx, note, *args: written.append(note["front"]) or True)
+    writer = pipeline.WriteQueue(decks=['Broken', 'Fine'])
+    writer.put({'deck': 'Broken', 'front': 'Q1', 'row': 1})
+    writer.put({'deck': 'Fine', 'front': 'Q2', 'row': 2})
+    writer.close()
+    assert written == ['Q2']
+    assert (writer.success_count, writer.error_count) == (1, 1)
+
+def test_cancel_counts_notes_never_written(monkeypatch):
+    release = threading.Event()
+    monkeypatch.setattr(pipeline, "import_note", lambda *args: release.wait(timeout=5))
+    writer = pipeline.WriteQueue()
+    for row in range(1, 4):
+        writer.put({'deck': 'D', 'front': f'Q{row}', 'row': row})
+    writer._cancelled.set()
+    release.set()
+    writer.close(cancel=True)
+    assert writer.written + writer.dropped == 3 and writer.dropped >= 2
@@ -0,0 +1,30 @@
+import pstats
+import pytest
+import utils
+from profiling import profile_run
+
+@pytest.fixture
+def csv_path(tmp_path):
+    path = tmp_path / "cards.csv"
+    path.write_text("Deck,Front,Back,Ref,Tags\nTest,Q1,A1,R1,t1\n", encoding="utf-8")
+    return str(path)
+
+def test_profile_single_phase(tmp_path, csv_path):
+    prefix = str(tmp_path / "prof")
+    with profile_run(prefix, phase='parse') as profiler:
+        utils.preview_csv(csv_path)
+
+    assert [label for label, _, _ in profiler.sections] == ['parse']
+    assert pstats.Stats(f"{prefix}.pstats").total_calls > 0
+    assert 'allocations: parse' in open(f"{prefix}_report.txt", encoding="utf-8").read()
+
+def test_profile_phase_that_never_runs(tmp_path):
+    prefix = tmp_path / "prof"
+    with profile_run(str(prefix), phase='write'):
+        pass
+    assert not (tmp_path / "prof.pstats").exists()
+
+def test_unknown_phase_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        with profile_run(str(tmp_path / "prof"), phase='network'):
+            pass
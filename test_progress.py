@@ -0,0 +1,60 @@
+import io
+import json
+import pytest
+import progress
+from progress import BarProgress, JsonProgress, format_duration, progress_bar, set_progress_mode
+
+class FakeTTY(io.StringIO):
+    def isatty(self):
+        return True
+
+@pytest.fixture(autouse=True)
+def restore_mode():
+    previous = set_progress_mode('bar')
+    yield
+    set_progress_mode(previous)
+
+def test_output_is_throttled():
+    stream = io.StringIO()
+    with BarProgress(10000, "Importing cards", stream=stream, log_interval=60) as bar:
+        for n in range(10000):
+            bar.update(1, written=1)
+    lines = stream.getvalue().splitlines()
+    # The first update and the final line, nothing per card
+    assert len(lines) == 2
+    assert lines[-1].startswith("Importing cards: 10000/10000 (100%) · 10000 written")
+
+def test_terminal_line_is_redrawn_in_place():
+    stream = FakeTTY()
+    bar = BarProgress(3, "Importing cards", stream=stream, interval=0)
+    bar.update(1, written=1)
+    bar.update(1, failed=1)
+    bar.close()
+    out = stream.getvalue()
+    assert out.count("\r") == 3 and out.endswith("\n") and out.count("\n") == 1
+    assert "1 written · 1 failed" in out
+
+def test_json_events():
+    stream = io.StringIO()
+    with JsonProgress(2, "Importing cards", interval=0, stream=stream) as bar:
+        bar.update(1, written=1)
+        bar.update(1, failed=1)
+    events = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert [e['event'] for e in events] == ['progress', 'progress', 'end']
+    assert events[-1]['done'] == 2 and events[-1]['written'] == 1 and events[-1]['failed'] == 1
+
+def test_modes(capsys):
+    set_progress_mode('quiet')
+    with progress_bar(5, "Importing cards") as bar:
+        bar.update(5)
+    assert capsys.readouterr().err == ""
+    set_progress_mode('json')
+    assert isinstance(progress_bar(5, "Importing cards"), JsonProgress)
+    with pytest.raises(ValueError):
+        set_progress_mode('fancy')
+    assert progress.progress_mode() == 'json'
+
+def test_format_duration():
+    assert format_duration(42) == "42s"
+    assert format_duration(125) == "2m05s"
+    assert format_duration(7300) == "2h01m"
@@ -0,0 +1,86 @@
+import csv
+import json
+import tracemalloc
+import bench_import
+import utils
+import pytest
+from policy import ConflictPolicy
+from records import Note, Row, column, row_parser, with_fields
+
+def write_csv(path, rows):
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+
+def test_row_reads_like_a_dict():
+    row = Row(Deck='D', Front='Q', Extra='x')
+    assert row == {'Deck': 'D', 'Front': 'Q', 'Extra': 'x'}
+    assert row.get('ID', '') == '' and 'ID' not in row and 'Extra' in row
+    row['ID'] = 'n-1'
+    del row['Extra']
+    assert dict(row) == {'Deck': 'D', 'Front': 'Q', 'ID': 'n-1'}
+    assert json.loads(json.dumps(row, default=dict)) == dict(row)
+
+def test_note_replace_stays_a_record():
+    note = Note.new('D', 'Q', 'A', '', 'a b', 'Basic', None, 1)
+    updated = note.replace(update_id=5)
+    assert isinstance(updated, Note) and updated['update_id'] == 5
+    assert note.get('update_id') is None
+    assert updated == dict(note, update_id=5)
+
+def test_parser_matches_dict_reader(tmp_path):
+    path = tmp_path / "rows.csv"
+    path.write_text("Deck,Front,Back,Ref,Tags,Notes\n"
+                    "D,Q1,A1,R1,\"a,b\",n\n"
+                    "\n"
+                    "D,Q2,A2\n"
+                    "D,Q3,A3,R3,c,n,surplus\n", encoding='utf-8')
+    with open(path, newline='', encoding='utf-8') as f:
+        expected = list(csv.DictReader(f))
+    expected[0]['Tags'] = 'a b'
+    headers, rows = utils.preview_csv(str(path))
+    assert headers == ['Deck', 'Front', 'Back', 'Ref', 'Tags', 'Notes']
+    assert rows == expected
+
+def test_strings_are_interned(tmp_path):
+    path = tmp_path / "rows.csv"
+    write_csv(path, bench_import.make_rows(10, decks=2, tags=3))
+    _, rows = utils.preview_csv(str(path))
+    assert rows[0]['Deck'] is rows[2]['Deck']
+    notes = [utils.row_note(row, idx, 'ATPL') for idx, row in enumerate(rows, start=1)]
+    assert notes[0].deck is notes[2].deck
+    assert notes[0].tags is notes[3].tags
+
+def test_rows_use_less_memory_than_dicts(tmp_path):
+    path = tmp_path / "rows.csv"
+    write_csv(path, bench_import.make_rows(2000))
+    parse = row_parser(['Deck', 'Front', 'Back', 'Ref', 'Tags'])
+
+    def traced(build):
+        tracemalloc.start()
+        try:
+            with open(path, newline='', encoding='utf-8') as f:
+                result = build(f)
+            return tracemalloc.get_traced_memory()[0], result
+        finally:
+            tracemalloc.stop()
+
+    as_dicts, _ = traced(lambda f: list(csv.DictReader(f)))
+    as_rows, _ = traced(lambda f: [parse(values) for values in csv.reader(f)])
+    assert as_rows < as_dicts * 0.75
+
+def test_column_reads_rows_and_dicts():
+    parse = row_parser(['Deck', 'Front'])
+    rows = [parse(['D1', 'Q1']), parse(['D2', 'Q2'])]
+    assert column(rows, 'Deck') == ['D1', 'D2']
+    assert column(rows, 'Model', None) == [None, None]
+    assert column([dict(row) for row in rows], 'Model', '') == ['', '']
+    with pytest.raises(KeyError):
+        column(rows, 'Back')
+
+def test_conflict_copies_stay_records():
+    note = Note.new('D', 'Q', 'A long answer', '', '', 'Basic', None, 1)
+    action, resolved = ConflictPolicy(default='longer').resolve(note, {'id': 7, 'back': 'A'})
+    assert action == 'update' and isinstance(resolved, Note) and resolved['update_id'] == 7
+    assert with_fields({'front': 'Q'}, replace_id=3) == {'front': 'Q', 'replace_id': 3}
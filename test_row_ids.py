@@ -0,0 +1,49 @@
+import csv
+import pytest
+import utils
+from idmap import IdMap
+
+def test_assign_row_ids_writes_back(tmp_path):
+    path = tmp_path / "cards.csv"
+    path.write_text("Deck,Front,Back,Ref,Tags\nTest,Q1,A1,R1,t1\n", encoding="utf-8")
+    _, rows = utils.preview_csv(str(path))
+
+    assert utils.assign_row_ids(str(path), rows) == 1
+    with open(path, newline='', encoding="utf-8") as f:
+        written = list(csv.DictReader(f))
+    assert written[0]['ID'] == rows[0]['ID']
+    assert utils.assign_row_ids(str(path), rows) == 0
+
+def test_assign_row_ids_keeps_other_cells(tmp_path):
+    path = tmp_path / "cards.csv"
+    path.write_bytes(b'Deck,Front,Back,Ref,Tags,ID\r\nTest,Q1,A1,R1,"x,y",\r\n\r\nTest,Q2,A2,R2,t2,keep,extra\r\n')
+    _, rows = utils.preview_csv(str(path))
+
+    assert utils.assign_row_ids(str(path), rows) == 1
+    assert path.read_bytes() == (f'Deck,Front,Back,Ref,Tags,ID\r\nTest,Q1,A1,R1,"x,y",{rows[0]["ID"]}\r\n\r\n'
+                                 'Test,Q2,A2,R2,t2,keep,extra\r\n').encode()
+
+def test_edited_row_updates_mapped_note(tmp_path, anki_post):
+    id_map_path = str(tmp_path / "ids.json")
+    row = {'ID': 'abc', 'Deck': 'Test', 'Front': 'Question 1', 'Back': 'Answer 1', 'Ref': 'Ref1', 'Tags': 'tag1'}
+    utils.import_from_rows([row], dry_run=False, id_map_path=id_map_path)
+    assert IdMap(id_map_path).get('abc')['note'] == 100
+
+    anki_post.reset_mock()
+    utils.import_from_rows([dict(row, Front='Question 1, reworded')], dry_run=False, id_map_path=id_map_path)
+    calls = [c[1]["json"] for c in anki_post.call_args_list]
+    assert [c["action"] for c in calls] == ["updateNoteFields"]
+    assert calls[0]["params"]["note"]["id"] == 100
+
+    anki_post.reset_mock()
+    utils.import_from_rows([dict(row, Front='Question 1, reworded')], dry_run=False, id_map_path=id_map_path)
+    assert anki_post.call_args_list == []
+
+@pytest.mark.parametrize("error, readded", [("Note was not found: 5", True), ("model was not found: Basic", False),
+                                             ("collection is not available", False)])
+def test_only_deleted_notes_are_readded(monkeypatch, error, readded):
+    monkeypatch.setattr(utils, "update_note", lambda *args: {'result': None, 'error': error})
+    monkeypatch.setattr(utils, "add_note", lambda *args: {'result': 200, 'error': None})
+    note = {'deck': 'Test', 'front': 'Q', 'back': 'A', 'ref': '', 'tags': [], 'model': 'Basic', 'update_id': 5}
+    result = utils.write_note(note)
+    assert result == ({'result': 200, 'error': None} if readded else {'result': None, 'error': error})
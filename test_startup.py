@@ -0,0 +1,32 @@
+import os
+import re
+import subprocess
+import sys
+
+# Cumulative import time allowed for `import main`, in milliseconds; importing requests and tqdm eagerly took ~150 ms
+IMPORT_TIME_BUDGET_MS = 50
+
+HEAVY_MODULES = ('requests', 'tkinter', 'tqdm', 'cProfile', 'tracemalloc')
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def run_python(*args):
+    return subprocess.run([sys.executable, *args], cwd=HERE, capture_output=True, text=True, check=True)
+
+
+def test_heavy_modules_not_loaded_at_startup():
+    code = f"import sys, main; print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    loaded = run_python("-c", code).stdout.strip()
+    assert loaded == ""
+
+
+def test_import_time_within_budget():
+    # Best of three, so one slow run on a busy machine does not fail the suite
+    timings = []
+    for _ in range(3):
+        stderr = run_python("-X", "importtime", "-c", "import main").stderr
+        match = re.search(r"^import time:\s+\d+ \|\s+(\d+) \| main$", stderr, re.MULTILINE)
+        assert match, stderr
+        timings.append(int(match.group(1)) / 1000)
+    assert min(timings) < IMPORT_TIME_BUDGET_MS
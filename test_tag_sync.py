@@ -0,0 +1,76 @@
+import utils
+from idmap import IdMap
+from metrics import METRICS
+
+def make_rows(count, tags):
+    return [{'Deck': 'Test', 'Front': f'Q{n}', 'Back': f'A{n}', 'Ref': '', 'Tags': tags(n)} for n in range(count)]
+
+def calls(action):
+    histogram = METRICS.actions.get(action)
+    return len(histogram.samples) if histogram else 0
+
+def test_tag_delta():
+    assert utils.tag_delta(['a', 'b'], ['b', 'c']) == (['c'], ['a'])
+    assert utils.tag_delta(None, ['b', 'a']) == (['a', 'b'], [])
+    assert utils.tag_delta(['a', 'mine', 'b'], ['b'], applied=['a', 'b']) == ([], ['a'])
+
+def applied_tags(id_map_path, row_id):
+    id_map = IdMap(id_map_path)
+    return id_map.tags(id_map.get(row_id)['note'])
+
+def test_retag_groups_identical_deltas(tmp_path, server):
+    id_map_path = str(tmp_path / "ids.json")
+    utils.import_from_rows(make_rows(40, lambda n: "old keep"), id_map_path=id_map_path)
+    METRICS.reset()
+
+    # Two distinct deltas across 40 notes
+    rows = make_rows(40, lambda n: "keep new" if n % 2 else "keep other")
+    id_map = IdMap(id_map_path)
+    plan = utils.plan_import(rows, id_map=id_map)
+    assert len(plan["tag_changes"]) == 40 and not plan["notes"]
+    utils.apply_plan(plan, id_map=id_map)
+
+    assert calls('addTags') == 2
+    assert calls('removeTags') == 2
+    assert calls('addNote') == calls('updateNoteFields') == 0
+    tags = {note['fields']['Front']: sorted(note['tags']) for note in server.collection.notes.values()}
+    assert tags['Q1'] == ['keep', 'new']
+    assert tags['Q2'] == ['keep', 'other']
+    assert utils.plan_import(rows, id_map=id_map)["tag_changes"] == []
+
+def test_unmapped_rows_remove_only_applied_tags(tmp_path, server):
+    id_map_path = str(tmp_path / "ids.json")
+    utils.import_from_rows(make_rows(2, lambda n: "t0"), id_map_path=id_map_path)
+    server.collection.create_deck('Test')
+    server.collection.add('Test', 'Basic', {'Front': 'Q9', 'Back': 'A9'}, tags=['t0'])
+    for note in server.collection.notes.values():
+        note['tags'].append('leech')
+
+    utils.import_from_rows(make_rows(2, lambda n: "t9") + [dict(make_rows(10, lambda n: "t9")[9])],
+                           id_map_path=id_map_path)
+    tags = {note['fields']['Front']: sorted(note['tags']) for note in server.collection.notes.values()}
+    assert tags == {'Q0': ['leech', 't9'], 'Q1': ['leech', 't9'], 'Q9': ['leech', 't0', 't9']}
+
+def test_mapped_rows_retag_without_update(tmp_path, server):
+    id_map_path = str(tmp_path / "ids.json")
+    rows = [dict(row, ID=f"id{n}") for n, row in enumerate(make_rows(3, lambda n: "t1"))]
+    utils.import_from_rows(rows, id_map_path=id_map_path)
+    assert applied_tags(id_map_path, 'id0') == ['t1']
+    METRICS.reset()
+
+    utils.import_from_rows([dict(row, Tags="t2") for row in rows], id_map_path=id_map_path)
+    assert (calls('addTags'), calls('removeTags'), calls('updateNoteFields')) == (1, 1, 0)
+    assert applied_tags(id_map_path, 'id0') == ['t2']
+    assert all(note['tags'] == ['t2'] for note in server.collection.notes.values())
+
+def test_anki_only_tags_survive_adoption(tmp_path, server):
+    server.collection.create_deck('Test')
+    note_id = server.collection.add('Test', 'Basic', {'Front': 'Q0', 'Back': 'A0'}, tags=['leech', 't1'])
+    id_map_path = str(tmp_path / "ids.json")
+    rows = [dict(make_rows(1, lambda n: "t1 t2")[0], ID="id0")]
+    utils.import_from_rows(rows, id_map_path=id_map_path)
+    assert sorted(server.collection.notes[note_id]['tags']) == ['leech', 't1', 't2']
+    assert applied_tags(id_map_path, 'id0') == ['t1', 't2']
+
+    utils.import_from_rows([dict(rows[0], Tags="t2")], id_map_path=id_map_path)
+    assert sorted(server.collection.notes[note_id]['tags']) == ['leech', 't2']
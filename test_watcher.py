@@ -0,0 +1,91 @@
+import time
+import threading
+import pytest
+import utils
+import watcher
+from compact_index import same_back
+
+HEADER = "Deck,Front,Back,Ref,Tags\n"
+
+def write_csv(path, *lines):
+    path.write_text(HEADER + "".join(f"{line}\n" for line in lines), encoding="utf-8")
+
+def test_session_imports_only_changed_rows(tmp_path, server):
+    csv_path = tmp_path / "cards.csv"
+    write_csv(csv_path, "Test,Q1,A1,R1,t1", "Test,Q2,A2,R2,t2")
+    session = watcher.WatchSession(base_deck="Watch")
+
+    assert session.import_file(str(csv_path)) == 2
+    assert len(server.collection.notes) == 2
+    requests_after_first = server.requests
+
+    write_csv(csv_path, "Test,Q1,A1,R1,t1", "Test,Q2,A2,R2,t2", "Test,Q3,A3,R3,t3")
+    assert session.import_file(str(csv_path)) == 1
+    assert len(server.collection.notes) == 3
+    # The warm index and deck list are reused: only the new note is written
+    assert server.requests - requests_after_first == 1
+
+    assert session.import_file(str(csv_path)) == 0
+    assert same_back(session.index["Basic"]["Q3"], "A3")
+
+def test_session_refetches_index_after_failure(tmp_path, server, monkeypatch):
+    csv_path = tmp_path / "cards.csv"
+    write_csv(csv_path, "Test,Q1,A1,R1,t1")
+    session = watcher.WatchSession()
+    monkeypatch.setattr(watcher, "apply_plan", lambda *a, **k: (_ for _ in ()).throw(ConnectionError("down")))
+
+    assert session.import_file(str(csv_path)) == 0
+    assert session.index is None
+    assert str(csv_path) not in session.digests
+
+@pytest.mark.parametrize("polling", [True, False])
+def test_watch_debounces_saves(tmp_path, polling):
+    if not polling and watcher._load_libc() is None:
+        pytest.skip("inotify not available")
+    (tmp_path / "sub").mkdir()
+    batches = []
+    stop = threading.Event()
+
+    def on_change(paths):
+        batches.append(paths)
+        stop.set()
+
+    thread = threading.Thread(target=watcher.watch, args=(str(tmp_path), on_change),
+                              kwargs=dict(debounce=0.2, poll_interval=0.05, stop=stop, polling=polling))
+    thread.start()
+    time.sleep(0.2)  # let the watcher take its initial snapshot
+    try:
+        for n in range(3):
+            write_csv(tmp_path / "sub" / "a.csv", f"Test,Q{n},A,R,t")
+        (tmp_path / "notes.txt").write_text("ignored", encoding="utf-8")
+        thread.join(timeout=5)
+    finally:
+        stop.set()
+        thread.join()
+    assert batches == [[str(tmp_path / "sub" / "a.csv")]]
+
+def test_failed_rows_are_retried(tmp_path, server, monkeypatch):
+    csv_path = tmp_path / "cards.csv"
+    write_csv(csv_path, "Test,Q1,A1,R1,t1", "Test,Q2,A2,R2,t2")
+    session = watcher.WatchSession(base_deck="Watch")
+    write_note = utils.write_note
+    monkeypatch.setattr(utils, "write_note",
+                        lambda note: {'result': None, 'error': 'busy'} if note["front"] == 'Q2' else write_note(note))
+    assert session.import_file(str(csv_path)) == 2
+    assert len(server.collection.notes) == 1
+
+    monkeypatch.setattr(utils, "write_note", write_note)
+    assert session.import_file(str(csv_path)) == 1
+    assert len(server.collection.notes) == 2
+
+def test_update_moves_index_entry_to_new_front(tmp_path, server):
+    csv_path = tmp_path / "cards.csv"
+    HEADER_ID = "ID," + HEADER
+    csv_path.write_text(HEADER_ID + "n1,Test,Q1,A1,R1,t1\n", encoding="utf-8")
+    session = watcher.WatchSession(base_deck="Watch", id_map_path=str(tmp_path / "ids.json"))
+    session.import_file(str(csv_path))
+
+    csv_path.write_text(HEADER_ID + "n1,Test,Q1 renamed,A1,R1,t1\n", encoding="utf-8")
+    session.import_file(str(csv_path))
+    assert len(server.collection.notes) == 1
+    assert "Q1" not in session.index["Basic"] and "Q1 renamed" in session.index["Basic"]
@@ -1,11 +1,13 @@
 # utils.py
 
+import contextlib
+import contextvars
 import csv
 import json
-import requests
 from collections import Counter
 import sys
 import os
+import time
 
 # Platform handling
 try:
@@ -19,7 +21,19 @@ IS_WINDOWS = sys.platform == 'win32'
 if IS_WINDOWS:
     import msvcrt
 
-from config import ANKI_CONNECT_URL, REQUIRED_HEADERS, LOG_FILE_PATH
+from config import (ANKI_CONNECT_URL, ANKI_COLLECTION_PATH, REQUIRED_HEADERS, LOG_FILE_PATH, ID_COLUMN, MODEL_COLUMN,
+                    PROGRESS_VERBOSE_ROWS, INDEX_PAGE_SIZE)
+
+PLAN_VERSION = 1
+from idmap import IdMap, note_digest
+from journal import ImportJournal, rows_fingerprint
+from import_log import log_event, run_log
+from metrics import METRICS
+from note_types import REGISTRY as NOTE_TYPES
+from profiling import phase
+from records import UNSET, Note, Row, column, row_parser, with_fields
+from compact_index import CompactIndex, same_back
+from progress import progress_mode
 
 class CardModel:
     BASIC = "Basic"
@@ -59,10 +73,64 @@ def get_single_key(prompt: str, valid_keys: str) -> str:
         print(f"\nInput error: {e}")
         raise
 
+# AnkiConnect URL for requests made in this thread, when it is not ANKI_CONNECT_URL; see use_endpoint
+_endpoint = contextvars.ContextVar('anki_endpoint', default=None)
+
+def anki_url():
+    return _endpoint.get() or ANKI_CONNECT_URL
+
+@contextlib.contextmanager
+def use_endpoint(url):
+    """Send this thread's AnkiConnect requests to url for the duration of the block."""
+    token = _endpoint.set(url)
+    try:
+        yield
+    finally:
+        _endpoint.reset(token)
+
+def http_transport(payload):
+    import requests  # deferred: the HTTP stack dominates start-up time
+    return requests.post(anki_url(), json=payload).json()
+
+# Callable taking an AnkiConnect payload and returning the decoded reply; see cassette.py
+_transport = http_transport
+
+def set_transport(transport):
+    """Route AnkiConnect requests through transport (None restores HTTP); returns the previous one."""
+    global _transport
+    previous, _transport = _transport, transport or http_transport
+    return previous
+
+# Collection file the duplicate index is read from instead of AnkiConnect; see collection_reader.py
+_collection = ANKI_COLLECTION_PATH
+
+def set_collection(path):
+    """Build the duplicate index from the collection file at path (None: through AnkiConnect); returns the previous path."""
+    global _collection
+    previous, _collection = _collection, path
+    return previous
+
+def anki_request(action, **params):
+    """POST one AnkiConnect action and return the decoded reply, timing it into METRICS."""
+    payload = {'action': action, 'version': 6}
+    if params:
+        payload['params'] = params
+    start = time.perf_counter()
+    reply = None
+    try:
+        reply = _transport(payload)
+        return reply
+    finally:
+        ok = isinstance(reply, dict) and not reply.get('error')
+        METRICS.record_call(action, time.perf_counter() - start, ok)
+
 def anki_model_exists(model_name=CardModel.BASIC):
     try:
-        response = requests.post(ANKI_CONNECT_URL, json={'action': 'modelNames', 'version': 6})
-        result = response.json().get('result')
+        if _collection:
+            # Anki may well be closed; the collection knows its note types
+            from collection_reader import read_model_names
+            return model_name in read_model_names(_collection)
+        result = anki_request('modelNames').get('result')
         return model_name in result if result else False
     except Exception:
         return False
@@ -79,20 +147,35 @@ def safe_input(prompt: str, default: str = '') -> str:
 
 
 def check_ankiconnect():
+    import requests
     try:
-        response = requests.get(ANKI_CONNECT_URL, timeout=2)
+        response = requests.get(anki_url(), timeout=2)
         return response.status_code == 200
     except requests.ConnectionError:
         return False
 
 def create_deck(deck_name):
-    requests.post(ANKI_CONNECT_URL, json={'action': 'createDeck', 'version': 6, 'params': {'deck': deck_name}})
+    anki_request('createDeck', deck=deck_name)
+
+def get_deck_names():
+    if _collection:
+        from collection_reader import read_deck_names
+        return read_deck_names(_collection)
+    return anki_request('deckNames').get('result') or []
 
 def detect_model(front_text):
     return CardModel.CLOZE if "{{c" in front_text else CardModel.BASIC
 
+def pick_model(model, front):
+    """The Model column value when set, otherwise Basic or Cloze by the front."""
+    return (model or '').strip() or detect_model(front)
+
+def row_model(row):
+    return pick_model(row.get(MODEL_COLUMN), row['Front'])
+
 def check_deck_prefixes(rows, base_prefix):
-    return all(row['Deck'].startswith(f"{base_prefix}::") or row['Deck'] == base_prefix for row in rows)
+    prefix = f"{base_prefix}::"
+    return all(deck.startswith(prefix) or deck == base_prefix for deck in set(column(rows, 'Deck')))
 
 def suggest_base_deck(rows, default_base, headless=False):
     if headless:
@@ -108,77 +191,167 @@ def suggest_base_deck(rows, default_base, headless=False):
         return default_base if user_input == '' else None if user_input == '-' else user_input
 
 def get_all_existing_fronts_by_model(model):
-    field_name = "Front" if model == CardModel.BASIC else "Text"
-    response = requests.post(ANKI_CONNECT_URL, json={
-        'action': 'findNotes',
-        'version': 6,
-        'params': {'query': f'{field_name}:*'}
-    })
-    note_ids = response.json().get('result', [])
+    if _collection:
+        from collection_reader import read_existing_index
+        return read_existing_index(_collection, [model]).get(model, {})
+    field_name = NOTE_TYPES.get(model).front_field
+    if not field_name:
+        return {}
+    note_ids = find_notes_with_field(field_name)
     if not note_ids:
         return {}
 
-    fetch_resp = requests.post(ANKI_CONNECT_URL, json={
-        'action': 'notesInfo',
-        'version': 6,
-        'params': {'notes': note_ids}
-    })
-    notes_info = fetch_resp.json().get('result', [])
+    notes_info = anki_request('notesInfo', notes=note_ids).get('result', [])
     existing = {}
     for note in notes_info:
-        note_model = note['modelName']
-        front = note['fields'].get("Front" if note_model == CardModel.BASIC else "Text", {}).get('value', '')
-        back = note['fields'].get("Back" if note_model == CardModel.BASIC else "Back Extra", {}).get('value', '')
+        front, back = NOTE_TYPES.for_note(note).read(note['fields'])
         note_id = note.get('noteId', 0)
-        existing[front.strip()] = {'back': back.strip(), 'id': note_id}
+        existing[front] = {'back': back, 'id': note_id, 'tags': note.get('tags', [])}
     return existing
 
+def find_notes_with_field(field_name):
+    query = f'"{field_name}:*"' if ' ' in field_name else f'{field_name}:*'
+    return anki_request('findNotes', query=query).get('result', [])
+
+def get_existing_index_by_model(model):
+    """get_all_existing_fronts_by_model as a CompactIndex, read a page of notes at a time so no text is kept."""
+    if _collection:
+        return get_all_existing_fronts_by_model(model)
+    field_name = NOTE_TYPES.get(model).front_field
+    note_ids = find_notes_with_field(field_name) if field_name else []
+
+    def entries():
+        for start in range(0, len(note_ids), INDEX_PAGE_SIZE):
+            for note in anki_request('notesInfo', notes=note_ids[start:start + INDEX_PAGE_SIZE]).get('result', []):
+                if note:
+                    front, back = NOTE_TYPES.for_note(note).read(note['fields'])
+                    yield front, back, note.get('noteId', 0), note.get('tags', [])
+
+    return CompactIndex(entries())
+
+def fill_conflict_backs(conflicts):
+    """Fetch the back text of conflicting notes a digest index only knew by digest, for prompts and policies."""
+    missing = [c["existing"] for c in conflicts if c["existing"].get("back") is None]
+    if not missing:
+        return
+    notes = anki_request('notesInfo', notes=[e["id"] for e in missing]).get('result') or []
+    backs = {note['noteId']: NOTE_TYPES.for_note(note).read(note['fields'])[1] for note in notes if note}
+    for existing in missing:
+        existing["back"] = backs.get(existing["id"], '')
+
 def delete_note(note_id):
-    requests.post(ANKI_CONNECT_URL, json={
-        'action': 'deleteNotes',
-        'version': 6,
-        'params': {'notes': [note_id]}
-    })
+    delete_notes([note_id])
+
+def delete_notes(note_ids):
+    anki_request('deleteNotes', notes=note_ids)
+
+def build_fields(front, back, ref, tags, model):
+    return NOTE_TYPES.get(model).build_fields(front, back, ref, tags)
 
 def add_note(deck, front, back, ref, tags, model):
-    fields = {
-        'Front' if model == CardModel.BASIC else 'Text': front,
-        'Back' if model == CardModel.BASIC else 'Back Extra': back,
-        'Ref': ref,
-        'Tags': ' '.join(tags)
-    }
-    response = requests.post(ANKI_CONNECT_URL, json={
-        'action': 'addNote',
-        'version': 6,
-        'params': {
-            'note': {
-                'deckName': deck,
-                'modelName': model,
-                'fields': fields,
-                'tags': tags,
-                'options': {'allowDuplicate': True}
-            }
-        }
+    fields = build_fields(front, back, ref, tags, model)
+    return anki_request('addNote', note={
+        'deckName': deck,
+        'modelName': model,
+        'fields': fields,
+        'tags': tags,
+        'options': {'allowDuplicate': True}
     })
-    return response.json()
+
+def update_note(note_id, front, back, ref, tags, model):
+    return anki_request('updateNoteFields', note={
+        'id': note_id,
+        'fields': build_fields(front, back, ref, tags, model)
+    })
+
+def is_missing_note_error(error):
+    """Whether an AnkiConnect error says the note itself no longer exists."""
+    return 'note was not found' in str(error).lower()
+
+def write_note(note):
+    """Update the note in place when it has a known id, otherwise add it.
+
+    A note deleted in Anki since the last import is re-added; any other
+    update error is returned as it is. Notes being replaced are expected to
+    have been deleted already (see apply_plan)."""
+    if note.get("update_id"):
+        result = update_note(note["update_id"], note["front"], note["back"], note["ref"], note["tags"], note["model"])
+        error = result.get('error')
+        if error is None:
+            return {'result': note["update_id"], 'error': None}
+        if not is_missing_note_error(error):
+            return result
+    return add_note(note["deck"], note["front"], note["back"], note["ref"], note["tags"], note["model"])
+
+def remember_note(id_map, note, note_id):
+    """Record the note id of a written row and the tags the importer applied to the note."""
+    if not id_map:
+        return
+    if note.get("replace_id"):
+        id_map.forget(note["replace_id"])
+    if note.get("row_id"):
+        id_map.set(note["row_id"], note_id, note_digest(note["front"], note["back"], note["ref"]), note["tags"])
+    else:
+        id_map.set_tags(note_id, note["tags"])
 
 def preview_csv(path):
-    with open(path, newline='', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
-        headers = set(reader.fieldnames)
-        if missing := REQUIRED_HEADERS - headers:
+    """(header, rows) of a CSV, each row a compact records.Row with interned deck, tags and model."""
+    with phase('parse'), open(path, newline='', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        fieldnames = next(reader, [])
+        if missing := REQUIRED_HEADERS - set(fieldnames):
             print(f"Missing required columns: {', '.join(missing)}")
             return None, []
-        rows = list(reader)
-        for row in rows:
-            if 'Tags' in row:
-                row['Tags'] = row['Tags'].replace(',', ' ')
-        return reader.fieldnames, rows
+        parse = row_parser(fieldnames)
+        return fieldnames, [parse(values) for values in reader if values]
+
+def assign_row_ids(path, rows):
+    """Give every row without an ID a new GUID and write the CSV back in place.
+
+    rows are the file's parsed rows (see preview_csv). The file is rewritten
+    from its raw cells, so only the new ID cells change."""
+    import uuid
+    missing = [row for row in rows if not (row.get(ID_COLUMN) or '').strip()]
+    if not missing:
+        return 0
+    for row in missing:
+        row[ID_COLUMN] = uuid.uuid4().hex
+    with open(path, newline='', encoding='utf-8') as f:
+        lineterminator = '\r\n' if f.readline().endswith('\r\n') else '\n'
+        f.seek(0)
+        header, *records = csv.reader(f)
+    if ID_COLUMN in header:
+        pos = header.index(ID_COLUMN)
+    else:
+        pos = 0
+        header.insert(0, ID_COLUMN)
+        records = [[''] + values if values else values for values in records]
+    # preview_csv skips blank lines, so parsed rows line up with the non-empty records
+    parsed = iter(rows)
+    for values in records:
+        if not values:
+            continue
+        row_id = next(parsed)[ID_COLUMN]
+        if len(values) <= pos:
+            values.extend([''] * (pos + 1 - len(values)))
+        if not values[pos].strip():
+            values[pos] = row_id
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f, lineterminator=lineterminator)
+        writer.writerow(header)
+        writer.writerows(records)
+    os.replace(tmp_path, path)
+    return len(missing)
 
 def summarize_deck(rows):
-    decks = sorted({r['Deck'] for r in rows})
-    model_counter = Counter(detect_model(r['Front']) for r in rows)
-    tag_counter = Counter(tag for r in rows for tag in r['Tags'].split())
+    decks = sorted(set(column(rows, 'Deck')))
+    model_counter = Counter(map(pick_model, column(rows, MODEL_COLUMN, None), column(rows, 'Front')))
+    # Rows share a few tag strings, so split each distinct one once
+    tag_counter = Counter()
+    for tags, count in Counter(column(rows, 'Tags')).items():
+        for tag in tags.split():
+            tag_counter[tag] += count
 
     print("\n=== Deck Hierarchy ===")
     for deck in decks:
@@ -197,122 +370,538 @@ def print_user_message(arg0, arg1, arg2):
     print("----------------------------------------")
 
 
-def import_from_rows(rows, base_deck=None, dry_run=False, cache_path=None):
-    from tqdm import tqdm
-
-    if os.path.exists(LOG_FILE_PATH):
-        os.remove(LOG_FILE_PATH)
-
-    is_preapproved = all('model' in r for r in rows)
-    if is_preapproved and not dry_run:
-        print_user_message(
-            "\n🚀 Starting actual import of pre-approved notes...",
-            '📦 Total cards to import: ',
-            rows,
-        )
-
-    if is_preapproved:
-        for idx, note in enumerate(rows, start=1):
-            if note.get("replace_id"):
-                delete_note(note["replace_id"])
-            result = add_note(note["deck"], note["front"], note["back"], note["ref"], note["tags"], note["model"])
-            status = "OK" if result.get('error') is None else result.get('error')
-            print(f"{'✔️' if status == 'OK' else '❌'} [{idx}/{len(rows)}] {note['front'][:50]}... -> {status}")
-        if not dry_run:
-            print("\n✅ Import completed successfully!")
-        return
+def open_journal(rows, journal_path, resume):
+    journal = ImportJournal(journal_path, rows_fingerprint(rows), resume=resume)
+    if resume:
+        if journal.committed:
+            print(f"\n⏩ Resuming: {len(journal.committed)} cards already committed per '{journal_path}'")
+        else:
+            print(f"\nℹ️  Nothing to resume in '{journal_path}', starting from the beginning")
+    return journal
+
+
+def journal_plan_path(journal_path):
+    """Where the plan being applied under journal_path is kept for --resume."""
+    return f"{os.path.splitext(journal_path)[0]}_plan.json"
+
 
-    model_cache = {
-        CardModel.BASIC: get_all_existing_fronts_by_model(CardModel.BASIC),
-        CardModel.CLOZE: get_all_existing_fronts_by_model(CardModel.CLOZE)
+def load_resume_plan(journal, id_map=None):
+    """The plan an interrupted run was applying under journal, or None if there is none for these rows.
+
+    Rows of the batch that was being written when the run stopped may be in
+    Anki without being journaled; those are looked up (see recheck_unflushed)."""
+    if not journal.committed:
+        return None
+    try:
+        plan = load_plan(journal_plan_path(journal.path))
+    except (OSError, ValueError):
+        return None
+    if plan.get("source") != journal.fingerprint:
+        return None
+    # The decks were created and replaced notes deleted before the first row was written
+    plan["decks"] = []
+    recheck_unflushed(plan, journal, id_map)
+    return plan
+
+
+def recheck_unflushed(plan, journal, id_map=None):
+    """Journal the notes after the last journaled one that Anki already has, at most one batch of them."""
+    from export import search_term
+
+    notes = plan["notes"]
+    last = max((i for i, n in enumerate(notes) if n["row"] in journal), default=-1)
+    # An update written twice is the same update, so only added notes could be duplicated
+    pending = [n for n in notes[last + 1:last + 1 + journal.batch_size] if not n.get("update_id")]
+    by_field = {}
+    for note in pending:
+        by_field.setdefault(NOTE_TYPES.get(note["model"]).front_field, []).append(note)
+    written = {}
+    for field, group in by_field.items():
+        if not field:
+            continue
+        query = " or ".join(f'"{field}:{search_term(n["front"])}"' for n in group)
+        note_ids = anki_request('findNotes', query=query).get('result') or []
+        if not note_ids:
+            continue
+        for note in anki_request('notesInfo', notes=note_ids).get('result') or []:
+            if note:
+                written[NOTE_TYPES.for_note(note).read(note['fields'])] = note['noteId']
+    found = 0
+    for note in pending:
+        note_id = written.get((note["front"], note["back"]))
+        if note_id:
+            remember_note(id_map, note, note_id)
+            journal.record(note["row"], note_id)
+            found += 1
+    if found:
+        journal.flush()
+        print(f"🔎 {found} cards of the interrupted batch were already in Anki")
+
+
+def fetch_existing_index():
+    with phase('index'):
+        if _collection:
+            from collection_reader import read_existing_index
+            index = read_existing_index(_collection)
+            for model in (CardModel.BASIC, CardModel.CLOZE):
+                index.setdefault(model, {})
+            return index
+        return {
+            CardModel.BASIC: get_existing_index_by_model(CardModel.BASIC),
+            CardModel.CLOZE: get_existing_index_by_model(CardModel.CLOZE)
+        }
+
+
+def new_plan(base_deck=None):
+    return {
+        "version": PLAN_VERSION,
+        "base_deck": base_deck,
+        "decks": [],
+        "notes": [],
+        "conflicts": [],
+        "adopt": [],
+        "tag_changes": [],
+        # Rows that could not be planned
+        "failed": [],
+        "counts": Counter(),
     }
 
-    allow_all = disallow_all = replace_all = False
-    approved_notes = []
 
-    print(f"\nProcessing {len(rows)} cards...")
-    for idx, col in enumerate(rows, start=1):
-        try:
-            deck = col['Deck'].strip()
-            if base_deck:
-                deck = f"{base_deck}::{deck}"
-            front = col['Front'].strip()
-            back = col['Back'].strip()
-            ref = col['Ref'].strip()
-            tags = col['Tags'].split()
-            model = detect_model(front)
+def tag_delta(old_tags, new_tags, applied=None):
+    """(tags to add, tags to remove) to turn old_tags into new_tags.
 
-            create_deck(deck)
+    Only tags in applied, the ones this importer put on the note, are ever
+    removed, so tags added in Anki stay. applied defaults to old_tags, as
+    for id map entries; old_tags None means unknown, so nothing is removed."""
+    new = set(new_tags)
+    old = set(old_tags) if old_tags is not None else set()
+    owned = old if applied is None else old & set(applied)
+    return sorted(new - old), sorted(owned - new)
+
+
+def tag_change(note, note_id, add, remove):
+    return {"note": note_id, "row": note["row"], "row_id": note["row_id"], "deck": note["deck"],
+            "front": note["front"], "model": note["model"], "tags": note["tags"],
+            "digest": note_digest(note["front"], note["back"], note["ref"]), "add": add, "remove": remove}
+
+
+def note_action(note):
+    if note.get("update_id"):
+        return "update"
+    return "replace" if note.get("replace_id") else "add"
 
-            existing = model_cache[model].get(front)
-            replace_id = None
 
-            if existing and existing['back'] == back:
-                print(f"🔁 [{idx}/{len(rows)}] Exact match, skipping: {front[:40]}")
+def row_note(col, idx, base_deck=None):
+    """The note a CSV row (1-based row number idx) describes."""
+    if type(col) is Row:
+        deck, front, back, ref, tags = col.Deck, col.Front, col.Back, col.Ref, col.Tags
+        model, row_id = getattr(col, MODEL_COLUMN), getattr(col, ID_COLUMN)
+        if model is UNSET:
+            model = None
+        if row_id is UNSET:
+            row_id = None
+    else:
+        deck, front, back, ref, tags = col['Deck'], col['Front'], col['Back'], col['Ref'], col['Tags']
+        model, row_id = col.get(MODEL_COLUMN), col.get(ID_COLUMN)
+    deck = deck.strip()
+    if base_deck:
+        deck = f"{base_deck}::{deck}"
+    front = front.strip()
+    return Note.new(deck, front, back.strip(), ref.strip(), tags, pick_model(model, front),
+                    (row_id or '').strip() or None, idx)
+
+
+def plan_import(rows, base_deck=None, index=None, journal=None, id_map=None, verbose=False, existing_decks=None,
+                only_rows=None):
+    """Work out what importing rows would do without writing anything to Anki.
+
+    Duplicates whose back differs are left in plan['conflicts'] for
+    resolve_conflicts(); everything else is decided here. index and
+    existing_decks are fetched from Anki when not supplied. only_rows
+    restricts planning to those (1-based) row numbers, e.g. for a retry."""
+    plan = new_plan(base_deck)
+    counts = plan["counts"]
+    counts["rows"] = len(rows)
+
+    if journal and all(idx in journal for idx in range(1, len(rows) + 1)):
+        counts["resumed"] = len(rows)
+        return plan
+
+    # Rows already mapped to a note by their ID never need the collection index
+    if index is None:
+        if id_map is None or any(not id_map.get(row_id.strip()) for row_id in column(rows, ID_COLUMN, '')):
+            index = fetch_existing_index()
+        else:
+            index = {CardModel.BASIC: {}, CardModel.CLOZE: {}}
+
+    decks = set()
+    with phase('plan'):
+        print(f"\nProcessing {len(rows)} cards...")
+        for idx, col in enumerate(rows, start=1):
+            if journal and idx in journal:
+                counts["resumed"] += 1
+                continue
+            if only_rows is not None and idx not in only_rows:
                 continue
+            try:
+                note = row_note(col, idx, base_deck)
+                deck, front, back, ref = note.deck, note.front, note.back, note.ref
+                tags, model, row_id = note.tags, note.model, note.row_id
+
+                mapped = id_map.get(row_id) if id_map else None
+                if mapped:
+                    # updateNoteFields leaves Anki's tags alone, so tags are synced as a delta either way
+                    add, remove = tag_delta(id_map.tags(mapped['note']), tags)
+                    if mapped['digest'] != note_digest(front, back, ref):
+                        if verbose:
+                            print(f"✏️ [{idx}/{len(rows)}] Update: '{front[:40]}' → '{back[:40]}' (note {mapped['note']})")
+                        plan["notes"].append(note.replace(update_id=mapped['note']))
+                    elif add or remove:
+                        if verbose:
+                            print(f"🏷️ [{idx}/{len(rows)}] Retag: {front[:40]} (+{' '.join(add)} -{' '.join(remove)})")
+                    else:
+                        counts["unchanged"] += 1
+                        if verbose:
+                            print(f"🔁 [{idx}/{len(rows)}] Unchanged, skipping: {front[:40]}")
+                    if add or remove:
+                        plan["tag_changes"].append(tag_change(note, mapped['note'], add, remove))
+                    continue
 
-            if dry_run and existing and not (allow_all or disallow_all or replace_all):
-                print(f"\n⚠️ [{idx}/{len(rows)}] Duplicate found:")
-                print(f"  Front: {front}")
-                print(f"  Existing Back: {existing['back']}")
-                print(f"  Proposed Back: {back}")
-                try:
-                    choice = get_single_key(
-                        prompt="Add? [y]es, [n]o, [r]eplace, [Y]es to all, [N]o to all, [R]eplace to all",
-                        valid_keys="ynrYNR"
-                    )
-                    if choice == 'n':
-                        continue
-                    elif choice == 'r':
-                        replace_id = existing['id']
-                    elif choice == 'Y':
-                        allow_all = True
-                    elif choice == 'N':
-                        disallow_all = True
+                decks.add(deck)
+                model_index = index.get(model)
+                if model_index is None:
+                    # Custom note types are indexed the first time a row uses them
+                    model_index = index[model] = get_existing_index_by_model(model)
+                existing = model_index.get(front)
+
+                if existing and same_back(existing, back):
+                    # Only tags the importer applied when it wrote the note are removed; a note it never wrote only gains tags
+                    existing_tags = existing.get('tags')
+                    applied = (id_map.tags(existing['id']) if id_map else None) or ()
+                    add, remove = tag_delta(existing_tags, tags, applied) if existing_tags is not None else ([], [])
+                    if row_id:
+                        # Adopted owning the row's tags the note already has, and those applied before; the map is
+                        # only moved on once a retag succeeds
+                        owned = tags if existing_tags is None else sorted(set(existing_tags) & {*tags, *applied})
+                        plan["adopt"].append([row_id, existing['id'], note_digest(front, back, ref), owned])
+                    if add or remove:
+                        plan["tag_changes"].append(tag_change(note, existing['id'], add, remove))
+                        if verbose:
+                            print(f"🏷️ [{idx}/{len(rows)}] Retag: {front[:40]} (+{' '.join(add)} -{' '.join(remove)})")
                         continue
-                    elif choice == 'R':
-                        replace_all = True
-                        replace_id = existing['id']
-                except KeyboardInterrupt:
-                    print("\nImport cancelled by user")
-                    return
-                except Exception as e:
-                    print(f"Error getting user input: {e}, skipping card")
+                    counts["exact"] += 1
+                    if verbose:
+                        print(f"🔁 [{idx}/{len(rows)}] Exact match, skipping: {front[:40]}")
                     continue
-            elif disallow_all and existing:
-                continue
-            elif replace_all and existing:
-                replace_id = existing['id']
 
-            if dry_run:
-                print(f"✔️ [{idx}/{len(rows)}] Add: '{front[:40]}' → '{back[:40]}' to {deck}")
-
-            approved_notes.append({
-                "deck": deck,
-                "front": front,
-                "back": back,
-                "ref": ref,
-                "tags": tags,
-                "model": model,
-                "replace_id": replace_id
-            })
+                if existing:
+                    plan["conflicts"].append({"note": note, "existing": {"id": existing['id'], "back": existing.get('back')}})
+                    continue
 
-        except Exception as e:
-            print(f"❌ Error processing card {idx}: {e}")
+                if verbose:
+                    print(f"✔️ [{idx}/{len(rows)}] Add: '{front[:40]}' → '{back[:40]}' to {deck}")
+                plan["notes"].append(note)
+
+            except Exception as e:
+                counts["errors"] += 1
+                plan["failed"].append(idx)
+                print(f"❌ Error processing card {idx}: {e}")
+
+    fill_conflict_backs(plan["conflicts"])
+    if decks:
+        plan["decks"] = sorted(decks - set(get_deck_names() if existing_decks is None else existing_decks))
+    return plan
+
+
+def plan_from_notes(notes, journal=None):
+    """Wrap a list of approved notes (e.g. a dry-run cache) in a plan."""
+    plan = new_plan()
+    plan["counts"]["rows"] = len(notes)
+    for idx, note in enumerate(notes, start=1):
+        note.setdefault("row", idx)
+        if journal and note["row"] in journal:
+            plan["counts"]["resumed"] += 1
+            continue
+        plan["notes"].append(note)
+    plan["decks"] = sorted({n["deck"] for n in plan["notes"] if not n.get("update_id")})
+    return plan
+
+
+def resolve_conflicts(plan, policy=None, interactive=False, on_resolved=None):
+    """Move plan['conflicts'] into plan['notes'] by policy, prompt or default add.
+
+    on_resolved, if given, is called with each note as soon as it is approved.
+    Returns False if the user cancelled while being prompted."""
+    conflicts = plan["conflicts"]
+    if not conflicts:
+        return True
+    total = plan["counts"]["rows"]
+    if policy:
+        print(f"\n⚖️ Resolving {len(conflicts)} duplicates by policy...")
+
+    allow_all = disallow_all = replace_all = False
+    while conflicts:
+        conflict = conflicts[0]
+        note, existing = conflict["note"], conflict["existing"]
+        resolved = note
+        if policy:
+            action, resolved = policy.resolve(note, existing)
+            if interactive:
+                print(f"⚖️ [{note['row']}/{total}] {action.capitalize()}: '{note['front'][:40]}' in {note['deck']}")
+        elif interactive and not (allow_all or disallow_all or replace_all):
+            print(f"\n⚠️ [{note['row']}/{total}] Duplicate found:")
+            print(f"  Front: {note['front']}")
+            print(f"  Existing Back: {existing['back']}")
+            print(f"  Proposed Back: {note['back']}")
+            try:
+                choice = get_single_key(
+                    prompt="Add? [y]es, [n]o, [r]eplace, [Y]es to all, [N]o to all, [R]eplace to all",
+                    valid_keys="ynrYNR"
+                )
+                if choice == 'n':
+                    resolved = None
+                elif choice == 'r':
+                    resolved = with_fields(note, replace_id=existing['id'])
+                elif choice == 'Y':
+                    allow_all = True
+                elif choice == 'N':
+                    disallow_all = True
+                    resolved = None
+                elif choice == 'R':
+                    replace_all = True
+                    resolved = with_fields(note, replace_id=existing['id'])
+            except KeyboardInterrupt:
+                print("\nImport cancelled by user")
+                return False
+            except Exception as e:
+                print(f"Error getting user input: {e}, skipping card")
+                resolved = None
+        elif disallow_all:
+            resolved = None
+        elif replace_all:
+            resolved = with_fields(note, replace_id=existing['id'])
+
+        conflicts.pop(0)
+        if resolved:
+            if interactive and not policy:
+                print(f"✔️ [{note['row']}/{total}] Add: '{note['front'][:40]}' → '{note['back'][:40]}' to {note['deck']}")
+            plan["notes"].append(resolved)
+            if on_resolved:
+                on_resolved(resolved)
+        else:
+            plan["counts"]["skipped"] += 1
+    plan["notes"].sort(key=lambda n: n["row"])
+    return True
+
+
+def plan_summary(plan):
+    counts = Counter(plan["counts"])
+    counts.update(note_action(n) for n in plan["notes"])
+    counts["delete"] = counts["replace"]
+    counts["retag"] = len(plan.get("tag_changes", ()))
+    counts["decks"] = len(plan["decks"])
+    counts["conflicts"] = len(plan["conflicts"])
+    return dict(counts)
 
-    if dry_run and cache_path:
+
+def print_plan_summary(plan):
+    counts = plan_summary(plan)
+    print("\n=== Import Plan ===")
+    for key in ("add", "update", "replace", "retag", "decks", "exact", "unchanged", "skipped", "resumed", "errors"):
+        if counts.get(key):
+            print(f"  {key}: {counts[key]}")
+
+
+def record_plan_metrics(plan):
+    for key, n in plan_summary(plan).items():
+        METRICS.count(f"plan_{key}", n)
+
+
+def save_plan(plan, path):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(dict(plan, counts=plan_summary(plan)), f, indent=2, ensure_ascii=False, default=dict)
+
+
+def load_plan(path):
+    with open(path, encoding="utf-8") as f:
+        plan = json.load(f)
+    if plan.get("version") != PLAN_VERSION:
+        raise ValueError(f"Unsupported plan version: {plan.get('version')}")
+    plan["counts"] = Counter(plan.get("counts", {}))
+    plan.setdefault("tag_changes", [])
+    plan.setdefault("failed", [])
+    return plan
+
+
+def apply_plan(plan, journal=None, id_map=None, on_written=None, on_retagged=None):
+    """Execute a plan: create missing decks, delete replaced notes in one call, then write notes.
+
+    on_written, if given, is called with each note and its note id once written;
+    on_retagged with each tag change once applied."""
+    from progress import progress_bar
+
+    with phase('write'):
+        for deck in plan["decks"]:
+            create_deck(deck)
+        if id_map:
+            for entry in plan["adopt"]:
+                id_map.set(*entry)
+        replaced = [n["replace_id"] for n in plan["notes"] if n.get("replace_id")]
+        if replaced:
+            delete_notes(replaced)
+        perform_import(plan["notes"], progress_bar, journal, id_map, on_written)
+        apply_tag_changes(plan["tag_changes"], id_map, on_retagged)
+
+
+def apply_tag_changes(changes, id_map=None, on_retagged=None):
+    """Retag notes with one addTags and/or removeTags call per distinct (add, remove) delta.
+
+    Returns the number of notes retagged."""
+    groups = {}
+    for change in changes:
+        groups.setdefault((tuple(change["add"]), tuple(change["remove"])), []).append(change)
+    retagged = 0
+    for (add, remove), group in groups.items():
+        note_ids = [change["note"] for change in group]
+        start = time.perf_counter()
+        error = None
         try:
-            with open(cache_path, "w", encoding="utf-8") as f:
-                json.dump(approved_notes, f, indent=2, ensure_ascii=False)
-            print(f"\n✅ Dry run results saved to: {cache_path}")
+            if add:
+                error = anki_request('addTags', notes=note_ids, tags=' '.join(add)).get('error')
+            if remove and not error:
+                error = anki_request('removeTags', notes=note_ids, tags=' '.join(remove)).get('error')
         except Exception as e:
-            print(f"⚠️ Could not save approved cards: {e}")
-    elif not dry_run:
-        perform_import(approved_notes, tqdm)
+            error = f"crashed: {e}"
+        latency = (time.perf_counter() - start) / len(group)
+        for change in group:
+            log_event('retag', row=change["row"], deck=change["deck"], front=change["front"], error=error,
+                      latency=latency, note=change["note"], add=change["add"], remove=change["remove"])
+            if not error and id_map:
+                if change["row_id"]:
+                    id_map.set(change["row_id"], change["note"], change["digest"], change["tags"])
+                else:
+                    id_map.set_tags(change["note"], change["tags"])
+            if not error and on_retagged:
+                on_retagged(change)
+        METRICS.count('retag_failed' if error else 'retagged', len(group))
+        if not error:
+            retagged += len(group)
+    if changes:
+        print(f"🏷️ Retagged {retagged} of {len(changes)} notes in {len(groups)} tag groups")
+    return retagged
+
+
+def import_plan_file(plan_path, journal_path=None, resume=False, id_map_path=None):
+    plan = load_plan(plan_path)
+    journal = open_journal(plan["notes"], journal_path, resume) if journal_path else None
+    id_map = IdMap(id_map_path) if id_map_path else None
+    try:
+        with run_log():
+            if journal:
+                plan["notes"] = [n for n in plan["notes"] if n["row"] not in journal]
+            print_plan_summary(plan)
+            record_plan_metrics(plan)
+            apply_plan(plan, journal, id_map)
+    finally:
+        if journal:
+            journal.close()
+        if id_map:
+            id_map.save()
+
+
+def import_from_rows(rows, base_deck=None, dry_run=False, cache_path=None, journal_path=None, resume=False,
+                     id_map_path=None, policy=None, plan_path=None, only_rows=None, plan=None):
+    """Plan rows, resolve their conflicts, then write them or (dry_run) summarize.
+
+    plan, if given, is one already made and resolved for these rows, such as
+    the dry run's, and is applied as it is. Returns the plan, or None if the
+    user cancelled while resolving conflicts."""
+    journal = open_journal(rows, journal_path, resume) if journal_path and not dry_run else None
+    id_map = IdMap(id_map_path) if id_map_path else None
+    try:
+        with contextlib.nullcontext() if dry_run else run_log():
+            if plan is None and journal:
+                # Resuming applies the interrupted run's plan instead of looking everything up again
+                plan = load_resume_plan(journal, id_map)
+            if plan is not None:
+                if journal:
+                    planned = len(plan["notes"])
+                    plan["notes"] = [n for n in plan["notes"] if n["row"] not in journal]
+                    plan["counts"]["resumed"] += planned - len(plan["notes"])
+            elif all('model' in r for r in rows):
+                plan = plan_from_notes(rows, journal)
+            else:
+                # A line per row is only worth printing for a file small enough to read
+                verbose = dry_run and progress_mode() == 'bar' and len(rows) <= PROGRESS_VERBOSE_ROWS
+                plan = plan_import(rows, base_deck, journal=journal, id_map=id_map, verbose=verbose,
+                                   only_rows=only_rows)
+                if not resolve_conflicts(plan, policy, interactive=dry_run):
+                    return None
+
+            record_plan_metrics(plan)
+
+            if plan_path:
+                save_plan(plan, plan_path)
+                print(f"\n🗺️ Import plan saved to: {plan_path}")
 
+            if dry_run:
+                print_plan_summary(plan)
+                if cache_path:
+                    try:
+                        with open(cache_path, "w", encoding="utf-8") as f:
+                            json.dump(plan["notes"], f, indent=2, ensure_ascii=False, default=dict)
+                        print(f"\n✅ Dry run results saved to: {cache_path}")
+                    except Exception as e:
+                        print(f"⚠️ Could not save approved cards: {e}")
+            elif plan["notes"] or plan["decks"] or plan["adopt"] or plan["tag_changes"]:
+                if journal:
+                    save_plan(dict(plan, source=journal.fingerprint), journal_plan_path(journal.path))
+                apply_plan(plan, journal, id_map)
+            elif plan["counts"]["resumed"] == len(rows):
+                print("\n✅ All cards were already imported.")
+    finally:
+        if journal:
+            journal.close()
+        if id_map and not dry_run:
+            id_map.save()
+    return plan
+
+
+def import_note(idx, note, journal=None, id_map=None, on_written=None):
+    """Write one approved note and log the outcome. Returns True on success."""
+    row = note.get("row", idx)
+    start = time.perf_counter()
+    try:
+        result = write_note(note)
+        error = result.get('error')
+    except Exception as e:
+        result, error = {}, f"crashed: {e}"
+    log_event(note_action(note), row=row, deck=note["deck"], front=note["front"], error=error,
+              latency=time.perf_counter() - start, note=result.get('result'))
+    if error:
+        METRICS.count('failed')
+        return False
+    METRICS.count('written')
+    remember_note(id_map, note, result.get('result'))
+    if journal:
+        journal.record(row, result.get('result'))
+    if on_written:
+        on_written(note, result.get('result'))
+    return True
 
-# TODO Rename this here and in `import_from_rows`
-def perform_import(approved_notes, tqdm):
+
+def print_import_summary(total, success_count, error_count):
+    print("\n✅ Import completed!")
+    print("========================================")
+    print(f"Total cards processed: {total}")
+    print(f"Successfully imported: {success_count}")
+    print(f"Errors encountered: {error_count}")
+    if error_count > 0:
+        print(f"\n⚠️ See '{LOG_FILE_PATH}' for error details.")
+
+
+def perform_import(approved_notes, progress_bar, journal=None, id_map=None, on_written=None):
+    """Write approved notes one by one, showing progress_bar (see progress.progress_bar), then print a summary."""
     print_user_message(
         "\n🚀 Starting actual import...",
         '📋 Total cards to process: ',
@@ -320,30 +909,13 @@ def perform_import(approved_notes, tqdm):
     )
     success_count = 0
     error_count = 0
-    with tqdm(total=len(approved_notes), desc="Importing cards", unit="card") as pbar:
+    with progress_bar(total=len(approved_notes), desc="Importing cards", unit="card") as pbar:
         for idx, note in enumerate(approved_notes, start=1):
-            try:
-                if note.get("replace_id"):
-                    delete_note(note["replace_id"])
-                result = add_note(note["deck"], note["front"], note["back"],
-                                  note["ref"], note["tags"], note["model"])
-                if result.get('error'):
-                    error_count += 1
-                    with open(LOG_FILE_PATH, "a", encoding="utf-8") as log:
-                        log.write(f"Card {idx} failed - {note['front'][:50]}...: {result['error']}\n")
-                else:
-                    success_count += 1
-                pbar.update(1)
-            except Exception as e:
+            if import_note(idx, note, journal, id_map, on_written):
+                success_count += 1
+                pbar.update(1, written=1)
+            else:
                 error_count += 1
-                with open(LOG_FILE_PATH, "a", encoding="utf-8") as log:
-                    log.write(f"Card {idx} crashed - {note['front'][:50]}...: {e}\n")
-                pbar.update(1)
+                pbar.update(1, failed=1)
 
-    print("\n✅ Import completed!")
-    print("========================================")
-    print(f"Total cards processed: {len(approved_notes)}")
-    print(f"Successfully imported: {success_count}")
-    print(f"Errors encountered: {error_count}")
-    if error_count > 0:
-        print(f"\n⚠️ See '{LOG_FILE_PATH}' for error details.")
+    print_import_summary(len(approved_notes), success_count, error_count)
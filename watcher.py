@@ -0,0 +1,320 @@
+# watcher.py
+
+import hashlib
+import os
+import select
+import struct
+import sys
+import time
+
+from compact_index import forget_note
+from config import WATCH_DEBOUNCE, WATCH_POLL_INTERVAL
+from idmap import IdMap
+from import_log import set_source
+from media import collect_media, media_uploads
+from utils import (
+    apply_plan,
+    fetch_existing_index,
+    get_deck_names,
+    plan_import,
+    preview_csv,
+    print_plan_summary,
+    record_plan_metrics,
+    resolve_conflicts,
+    suggest_base_deck,
+)
+
+IN_CLOSE_WRITE = 0x8
+IN_MOVED_TO = 0x80
+IN_CREATE = 0x100
+IN_Q_OVERFLOW = 0x4000
+IN_IGNORED = 0x8000
+IN_ISDIR = 0x40000000
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+
+_EVENT = struct.Struct('iIII')
+
+
+def is_csv(path):
+    return path.lower().endswith('.csv')
+
+
+def find_csvs(root):
+    for folder, _, files in os.walk(root):
+        for file in files:
+            if is_csv(file):
+                yield os.path.join(folder, file)
+
+
+def row_digest(row):
+    content = "\x1f".join(str(value) for value in row.values())
+    return hashlib.sha1(content.encode('utf-8')).digest()
+
+
+class PollingWatcher:
+    """Detects CSV changes by comparing (mtime, size) snapshots of the tree."""
+
+    kind = 'polling'
+
+    def __init__(self, root):
+        self.root = root
+        self.snapshot = self._scan()
+
+    def _scan(self):
+        snapshot = {}
+        stack = [self.root]
+        while stack:
+            try:
+                entries = os.scandir(stack.pop())
+            except OSError:
+                continue
+            with entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+                        elif is_csv(entry.name):
+                            stat = entry.stat()
+                            snapshot[entry.path] = (stat.st_mtime_ns, stat.st_size)
+                    except OSError:
+                        continue
+        return snapshot
+
+    def wait(self, timeout):
+        time.sleep(timeout)
+        current = self._scan()
+        changed = {path for path, signature in current.items() if self.snapshot.get(path) != signature}
+        self.snapshot = current
+        return changed
+
+    def close(self):
+        pass
+
+
+class InotifyWatcher:
+    """Linux inotify watches on every directory of the tree, via libc and ctypes."""
+
+    kind = 'inotify'
+
+    def __init__(self, root, libc):
+        self.libc = libc
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError("inotify_init1 failed")
+        self.root = root
+        self.dirs = {}
+        self._add_tree(root)
+
+    def _add_tree(self, top):
+        """Watch top and its subdirectories; returns the CSVs already inside (for newly created folders)."""
+        found = set()
+        for folder, _, files in os.walk(top):
+            wd = self.libc.inotify_add_watch(self.fd, os.fsencode(folder), WATCH_MASK)
+            if wd >= 0:
+                self.dirs[wd] = folder
+            found.update(os.path.join(folder, file) for file in files if is_csv(file))
+        return found
+
+    def wait(self, timeout):
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return set()
+        changed = set()
+        while True:
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            offset = 0
+            while offset < len(data):
+                wd, mask, _, length = _EVENT.unpack_from(data, offset)
+                name = os.fsdecode(data[offset + _EVENT.size:offset + _EVENT.size + length].rstrip(b'\0'))
+                offset += _EVENT.size + length
+                if mask & IN_Q_OVERFLOW:
+                    # Events were dropped; every CSV may have changed
+                    changed.update(find_csvs(self.root))
+                    continue
+                if mask & IN_IGNORED:
+                    self.dirs.pop(wd, None)
+                    continue
+                folder = self.dirs.get(wd)
+                if folder is None:
+                    continue
+                path = os.path.join(folder, name)
+                if mask & IN_ISDIR:
+                    changed.update(self._add_tree(path))
+                elif is_csv(name) and mask & (IN_CLOSE_WRITE | IN_MOVED_TO):
+                    changed.add(path)
+        return changed
+
+    def close(self):
+        os.close(self.fd)
+
+
+def _load_libc():
+    if not sys.platform.startswith('linux'):
+        return None
+    import ctypes
+    import ctypes.util
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        libc.inotify_init1
+    except (OSError, AttributeError):
+        return None
+    return libc
+
+
+def open_watcher(root, polling=False):
+    """inotify where the platform has it, otherwise (or when asked) polling."""
+    libc = None if polling else _load_libc()
+    if libc is not None:
+        try:
+            return InotifyWatcher(root, libc)
+        except OSError:
+            pass
+    return PollingWatcher(root)
+
+
+def watch(root, on_change, debounce=WATCH_DEBOUNCE, poll_interval=WATCH_POLL_INTERVAL, stop=None,
+          polling=False):
+    """Call on_change with the sorted CSV paths that changed, once saves have been quiet for debounce seconds.
+
+    poll_interval is how often the tree is rescanned when polling (and how
+    often stop is checked). Runs until interrupted or until the optional threading.Event stop is set."""
+    watcher = open_watcher(root, polling)
+    pending = set()
+    try:
+        while stop is None or not stop.is_set():
+            changed = watcher.wait(debounce if pending else poll_interval)
+            if changed:
+                pending |= changed
+            elif pending:
+                on_change(sorted(pending))
+                pending = set()
+    finally:
+        watcher.close()
+    return watcher.kind
+
+
+class WatchSession:
+    """Imports changed rows while keeping the existing-notes index and deck list in memory.
+
+    The index is fetched from Anki on first use and kept current from the
+    notes this session writes, so later events only cost the rows that
+    changed. It is dropped (and refetched) after an import fails. A file's
+    rows count as seen once they were written or skipped; rows that failed
+    are tried again on the next event.
+    """
+
+    def __init__(self, base_deck=None, policy=None, id_map_path=None):
+        self.base_deck = base_deck
+        self.policy = policy
+        self.id_map = IdMap(id_map_path) if id_map_path else None
+        self.index = None
+        self.decks = None
+        self.digests = {}
+        self._written = set()
+        self._retagged = set()
+
+    def warm(self):
+        if self.index is None:
+            self.index = fetch_existing_index()
+            self.decks = set(get_deck_names())
+
+    def remember(self, note, note_id):
+        model_index = self.index[note["model"]]
+        if note.get("update_id"):
+            # An id-mapped update may have changed the front, which would leave the old one behind
+            forget_note(model_index, note_id)
+        model_index[note["front"]] = {'back': note["back"], 'id': note_id, 'tags': note["tags"]}
+        self._written.add(note["row"])
+
+    def retagged(self, change):
+        model_index = self.index[change["model"]]
+        existing = model_index.get(change["front"])
+        if existing and existing['id'] == change["note"]:
+            model_index[change["front"]] = dict(existing, tags=change["tags"])
+        self._retagged.add(change["row"])
+
+    def unsettled_rows(self, plan):
+        """Rows of plan that were neither written nor skipped: unplannable, or their write or retag failed."""
+        rows = set(plan["failed"])
+        rows.update(note["row"] for note in plan["notes"] if note["row"] not in self._written)
+        rows.update(change["row"] for change in plan["tag_changes"] if change["row"] not in self._retagged)
+        return rows
+
+    def planned(self, plan):
+        print_plan_summary(plan)
+
+    def changed_rows(self, path, digests):
+        """1-based numbers of rows not seen in the last import of path, or None for a file not seen yet."""
+        previous = self.digests.get(path)
+        if previous is None:
+            return None
+        return {idx for idx, digest in enumerate(digests, start=1) if digest not in previous}
+
+    def import_file(self, path):
+        """Import whatever changed in path since it was last seen. Returns the number of rows planned."""
+        if not os.path.exists(path):
+            self.digests.pop(path, None)
+            return 0
+        _, rows = preview_csv(path)
+        if not rows:
+            return 0
+        digests = [row_digest(row) for row in rows]
+        only_rows = self.changed_rows(path, digests)
+        if only_rows is not None and not only_rows:
+            return 0
+
+        print(f"\n📝 {path}: {len(only_rows) if only_rows is not None else len(rows)} new or changed rows")
+        try:
+            with media_uploads(collect_media(rows, os.path.dirname(os.path.abspath(path)))):
+                plan = self.import_rows(rows, path, only_rows)
+        except Exception as e:
+            print(f"❌ Error importing '{path}': {e}")
+            return 0
+        unsettled = self.unsettled_rows(plan)
+        self.digests[path] = {digest for idx, digest in enumerate(digests, start=1) if idx not in unsettled}
+        return len(only_rows) if only_rows is not None else len(rows)
+
+    def import_rows(self, rows, source=None, only_rows=None, base_deck=None):
+        """Plan rows against the warm index and apply the plan; returns it. Errors are raised
+        after the cached index has been dropped."""
+        set_source(source)
+        self._written.clear()
+        self._retagged.clear()
+        try:
+            self.warm()
+            base_deck = suggest_base_deck(rows, base_deck or self.base_deck, headless=True)
+            plan = plan_import(rows, base_deck, index=self.index, id_map=self.id_map, existing_decks=self.decks,
+                               only_rows=only_rows)
+            resolve_conflicts(plan, self.policy)
+            record_plan_metrics(plan)
+            self.planned(plan)
+            if plan["notes"] or plan["decks"] or plan["adopt"] or plan["tag_changes"]:
+                apply_plan(plan, id_map=self.id_map, on_written=self.remember, on_retagged=self.retagged)
+            self.decks.update(plan["decks"])
+            return plan
+        except Exception:
+            self.index = self.decks = None
+            raise
+        finally:
+            if self.id_map:
+                self.id_map.save()
+
+    def import_files(self, paths):
+        for path in paths:
+            self.import_file(path)
+
+
+def watch_folder(root, base_deck=None, policy=None, id_map_path=None, debounce=WATCH_DEBOUNCE,
+                 poll_interval=WATCH_POLL_INTERVAL, stop=None, polling=False):
+    """Import every CSV under root once, then keep importing the rows that change."""
+    session = WatchSession(base_deck, policy, id_map_path)
+    session.import_files(sorted(find_csvs(root)))
+    print(f"\n👀 Watching '{root}' for CSV changes (Ctrl+C to stop)...")
+    try:
+        watch(root, session.import_files, debounce, poll_interval, stop, polling)
+    except KeyboardInterrupt:
+        print("\n👋 Stopped watching.")
+    return session